@@ -0,0 +1,166 @@
+"""
+Shared Anthropic API client
+
+Building an Anthropic client per reconciliation meant a new connection pool,
+and a new TCP/TLS handshake, for every extraction. get_api_client() hands out
+one client per API key and endpoint for the whole process, so Streamlit
+sessions, OCR worker threads and batch runs all reuse keep-alive
+connections. call_with_retry() retries throttling (429), overload (529) and
+transient server/connection errors with jittered exponential backoff,
+honouring any retry-after the API sends. ApiMetrics counts requests,
+retries and connection reuse for the sidebar.
+"""
+import email.utils
+import os
+import random
+import threading
+import time
+
+import anthropic
+
+API_TIMEOUT_SECONDS = 120.0
+API_CONNECT_TIMEOUT_SECONDS = 10.0
+MAX_RETRIES = 4
+BACKOFF_BASE_SECONDS = 1.0
+BACKOFF_MAX_SECONDS = 30.0  # caps the jittered backoff, not a server retry-after
+RETRY_STATUSES = {408, 409, 429, 500, 502, 503, 504, 529}
+
+
+class ApiMetrics:
+    """Thread-safe counters for API traffic"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = {
+            'requests': 0,
+            'retries': 0,
+            'throttled': 0,
+            'failures': 0,
+            'connections_opened': 0,
+        }
+
+    def incr(self, name, amount=1):
+        with self._lock:
+            self._counts[name] += amount
+
+    def trace(self, event_name, info):
+        """httpcore trace hook: count every fresh TCP connection"""
+        if event_name == 'connection.connect_tcp.complete':
+            self.incr('connections_opened')
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._counts)
+        stats['connections_reused'] = max(0, stats['requests'] - stats['connections_opened'])
+        return stats
+
+
+_metrics = ApiMetrics()
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_api_metrics() -> ApiMetrics:
+    """Return the process-wide API counters"""
+    return _metrics
+
+
+def _on_request(request):
+    _metrics.incr('requests')
+    request.extensions['trace'] = _metrics.trace
+
+
+def get_api_client(api_key: str) -> anthropic.Anthropic:
+    """
+    Return the process-wide client for this API key and endpoint
+
+    The SDK's own retries are switched off; call_with_retry does the retrying
+    so it can be counted.
+    """
+    key = (api_key, os.environ.get("ANTHROPIC_BASE_URL"))
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = anthropic.Anthropic(
+                api_key=api_key,
+                max_retries=0,
+                timeout=anthropic.Timeout(API_TIMEOUT_SECONDS, connect=API_CONNECT_TIMEOUT_SECONDS),
+                http_client=anthropic.DefaultHttpxClient(event_hooks={'request': [_on_request]}),
+            )
+            _clients[key] = client
+        return client
+
+
+def retry_after_seconds(error):
+    """Delay the API asked for in retry-after-ms / retry-after, or None"""
+    response = getattr(error, 'response', None)
+    if response is None:
+        return None
+    headers = response.headers
+    try:
+        if headers.get('retry-after-ms'):
+            return float(headers['retry-after-ms']) / 1000
+        value = headers.get('retry-after')
+        if not value:
+            return None
+        try:
+            return float(value)
+        except ValueError:
+            # HTTP-date form
+            return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def is_retryable(error) -> bool:
+    if isinstance(error, anthropic.APIConnectionError):
+        # Includes APITimeoutError
+        return True
+    if isinstance(error, anthropic.APIStatusError):
+        return error.status_code in RETRY_STATUSES
+    return False
+
+
+def backoff_delay(attempt, retry_after=None):
+    """
+    Full-jitter exponential backoff, never shorter than the server's retry-after
+
+    BACKOFF_MAX_SECONDS caps only the jitter; a longer retry-after is waited
+    out in full, since retrying earlier just earns another 429.
+    """
+    delay = random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt))
+    if retry_after is not None:
+        delay = max(delay, retry_after)
+    return delay
+
+
+def call_with_retry(func, max_retries=MAX_RETRIES, sleep=time.sleep):
+    """
+    Call func(), retrying throttling and transient failures
+
+    Args:
+        func: Zero-argument callable making one API request
+        max_retries: Retries after the first attempt
+
+    Returns:
+        Whatever func returns
+
+    Raises:
+        The last error once retries run out, or any non-retryable error
+        straight away
+    """
+    attempt = 0
+    while True:
+        try:
+            return func()
+        except Exception as e:
+            if isinstance(e, anthropic.APIStatusError) and e.status_code in (429, 529):
+                _metrics.incr('throttled')
+            if attempt >= max_retries or not is_retryable(e):
+                _metrics.incr('failures')
+                raise
+            delay = backoff_delay(attempt, retry_after_seconds(e))
+            print(f"API call failed ({type(e).__name__}), retry {attempt + 1}/{max_retries} in {delay:.1f}s")
+            _metrics.incr('retries')
+            attempt += 1
+            sleep(delay)
@@ -2,18 +2,109 @@ import streamlit as st
 import pandas as pd
 import numpy as np
 from PIL import Image
-import anthropic
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 import json
 import base64
-import re
 import cv2
 import io
+import os
+import queue
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from balance_verifier import BALANCE_KEY, verify_rows
+from api_client import call_with_retry, get_api_client, get_api_metrics
+from image_optimizer import format_report, optimize_image
+from json_stream import RowStreamParser
+from ledger import get_ledger
+from model_router import FAST_MODEL, STRONG_MODEL, estimate_complexity, get_model_router, validate_rows
+from ocr_backends import FallbackBackend
+from ocr_cache import get_ocr_cache, make_cache_key
+from reconcile_engine import reconcile_frames
+from request_scheduler import bind_session, current_session, get_request_scheduler
+from run_store import StoredRun, get_run_store, run_key
+from statement_parsers import (
+    SSBO_EXTENSIONS, STRUCTURED_UPLOAD_TYPES, is_structured_statement, parse_bank_statement, parse_ssbo_export
+)
+from table_tiling import (
+    crop_rows, encode_band, find_table_rows, merge_band_rows, merge_screenshot_rows, split_into_bands,
+)
+from tracing import bind_trace, span, start_trace
+from transactions import TransactionTable, as_transactions
+from upload_artifacts import distinct_uploads, get_upload_artifacts, sniff_media_type, uploads_hash
 
 # -------------------------------
 # Configuration
 # -------------------------------
 # You'll need to set your Anthropic API key
-ANTHROPIC_API_KEY = st.secrets.get("ANTHROPIC_API_KEY")
+def load_api_key():
+    """Read the API key from Streamlit secrets, falling back to the environment"""
+    try:
+        key = st.secrets.get("ANTHROPIC_API_KEY")
+    except Exception:
+        key = None
+    return key or os.environ.get("ANTHROPIC_API_KEY")
+
+ANTHROPIC_API_KEY = load_api_key()
+
+# Upload previews per row when several screenshots are uploaded for one side
+PREVIEW_COLUMNS = 3
+
+# Every bank and SSBO screenshot is extracted side by side, up to this many at once;
+# the request scheduler still paces the model calls they make
+EXTRACTION_MAX_WORKERS = 16
+
+# Tall screenshots are split into row bands that are extracted in parallel
+TILE_ROWS_PER_BAND = 15
+TILE_OVERLAP_ROWS = 2
+TILE_MAX_WORKERS = 4
+
+# Image optimizer applied before upload: "gray", "binary" or "quantize"
+IMAGE_OPTIMIZER_MODE = "gray"
+
+# "tool" forces the row schema through a tool call; "text" asks for a JSON array in the reply
+EXTRACTION_MODE = "tool"
+
+# Calls per table (or band) when a reply is cut off or has malformed rows
+EXTRACTION_ATTEMPTS = 2
+
+# Stream model replies and show rows as they decode; redraw at most this often (seconds)
+STREAM_EXTRACTION = True
+STREAM_RENDER_INTERVAL = 0.25
+
+# Send simple screenshots to the fast model and escalate to the strong one only when
+# the rows fail validation (see model_router); off, each side uses its fixed model
+MODEL_ROUTING = True
+
+# Check bank rows against their running balance, date order and row count, and re-read
+# only the rows that don't add up (cropped under the header) instead of the whole screenshot
+BALANCE_VERIFICATION = True
+# Leave a read as it is when more than this share of its rows is suspect
+REREAD_MAX_SHARE = 0.5
+
+# OCR backend per side, by name in OCR_BACKEND_TYPES; "a+b" reads with a and
+# hands the screenshot to b whenever a is not confident
+OCR_BACKENDS = {'bank': "claude", 'ssbo': "claude"}
+
+# Keep every extracted row in the local ledger and reconcile each bank upload
+# against all SSBO rows still outstanding, so late-posted deposits tally later.
+# Off by default: the ledger is one SQLite file shared by every session, so
+# turn it on only where one team reconciles one set of accounts
+LEDGER_ENABLED = False
+
+IMAGE_UPLOAD_TYPES = ["png", "jpg", "jpeg"]
+
+# Result tables longer than this are shown a page at a time
+RESULT_PAGE_ROWS = 500
+
+# Share of result redraws (paging, filtering, any rerun) whose trace is written to
+# TRACE_DIR; with profiling on, every redraw is. Reconcile runs are always written
+RERENDER_TRACE_SAMPLE = 0.0
+
+# Status cell colours: exact match, match within tolerance, no match
+TALLY_STYLE = 'background-color: #90EE90; color: #006400; font-weight: bold;'
+TOLERANCE_STYLE = 'background-color: #FFF3B0; color: #7A5C00; font-weight: bold;'
+NOT_TALLY_STYLE = 'background-color: #FFB6C1; color: #8B0000; font-weight: bold;'
 
 # -------------------------------
 # Custom CSS for Futuristic UI
@@ -221,23 +312,32 @@ def process_uploaded_file(uploaded_file):
         'file_object': uploaded_file  # Store the original file object
     }
 
-def display_upload_status(file, file_type):
+def display_upload_status(files, file_type):
     """Display upload status with futuristic indicators"""
-    if file is not None:
+    if files:
+        uploaded = f"{len(files)} FILES UPLOADED" if len(files) > 1 else "UPLOADED"
         st.markdown(f"""
         <div style="text-align: center; margin: 1rem 0;">
             <span class="status-indicator status-ready"></span>
             <span style="color: #00ff41; font-family: 'Rajdhani', sans-serif; font-weight: 600;">
-                {file_type} UPLOADED ✓
+                {file_type} {uploaded} ✓
             </span>
         </div>
         """, unsafe_allow_html=True)
         
-        # Display image preview
-        image = Image.open(file)
-        st.markdown('<div class="image-preview">', unsafe_allow_html=True)
-        st.image(image, use_container_width=True)
-        st.markdown('</div>', unsafe_allow_html=True)
+        # Several screenshots are previewed side by side, a few per row
+        columns = st.columns(min(len(files), PREVIEW_COLUMNS))
+        for i, file in enumerate(files):
+            with columns[i % len(columns)]:
+                if is_structured_statement(file.name):
+                    st.caption(f"📄 {file.name}: structured statement, it is read directly, no OCR needed.")
+                    continue
+                
+                # Display image preview (decoded and downscaled once per upload, reused across reruns)
+                preview = get_upload_artifacts(file).preview
+                st.markdown('<div class="image-preview">', unsafe_allow_html=True)
+                st.image(preview, caption=file.name if len(files) > 1 else None, use_container_width=True)
+                st.markdown('</div>', unsafe_allow_html=True)
         
         return True
     else:
@@ -252,21 +352,371 @@ def display_upload_status(file, file_type):
         return False
 
 def create_upload_section(title, file_uploader_key, accepted_types=["png", "jpg", "jpeg"]):
-    """Create a futuristic upload section"""
+    """Create a futuristic upload section; several files may be uploaded"""
     st.markdown(f'<div class="upload-container">', unsafe_allow_html=True)
     st.markdown(f'<div class="upload-header">{title}</div>', unsafe_allow_html=True)
     
-    uploaded_file = st.file_uploader(
-        f"Choose {title.lower()} file",
+    uploaded_files = st.file_uploader(
+        f"Choose {title.lower()} files",
         type=accepted_types,
+        accept_multiple_files=True,
         key=file_uploader_key,
         label_visibility="collapsed"
     )
     
-    file_uploaded = display_upload_status(uploaded_file, title.split()[0])
+    file_uploaded = display_upload_status(uploaded_files, title.split()[0])
     st.markdown('</div>', unsafe_allow_html=True)
     
-    return uploaded_file, file_uploaded
+    return uploaded_files, file_uploaded
+
+def display_cache_stats(container):
+    """Show OCR cache hit/miss counters in the sidebar"""
+    stats = get_ocr_cache().stats()
+    lookups = stats['hits'] + stats['misses']
+    hit_rate = f"{stats['hits'] / lookups:.0%}" if lookups else "n/a"
+    container.markdown(
+        f"Hits: **{stats['hits']}** · Misses: **{stats['misses']}** · Hit rate: **{hit_rate}**\n\n"
+        f"Entries: **{stats['entries']}** ({stats['bytes'] / 1024:.1f} KB)"
+    )
+
+def display_ledger_stats(container):
+    """Show outstanding ledger rows in the sidebar"""
+    stats = get_ledger().stats()
+    container.markdown(
+        f"Outstanding SSBO: **{stats['ssbo_outstanding']}** of {stats['ssbo_rows']} · "
+        f"Outstanding bank: **{stats['bank_outstanding']}** of {stats['bank_rows']}"
+    )
+
+def status_styles(status: pd.Series) -> np.ndarray:
+    """CSS for a whole Status column at once, instead of a Python call per cell"""
+    values = status.astype(str)
+    return np.select(
+        [values.eq("Tally"), values.str.startswith("Tally ("), values.eq("Not Tally")],
+        [TALLY_STYLE, TOLERANCE_STYLE, NOT_TALLY_STYLE],
+        default='',
+    )
+
+def paginate(frame: pd.DataFrame, key: str) -> pd.DataFrame:
+    """The rows of frame on the selected page; frames over RESULT_PAGE_ROWS get a page picker"""
+    if len(frame) <= RESULT_PAGE_ROWS:
+        return frame
+    pages = -(-len(frame) // RESULT_PAGE_ROWS)
+    # The key includes the row count so a filter change starts again at page 1
+    page = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=1, step=1,
+                           key=f"{key}_{len(frame)}")
+    start = (page - 1) * RESULT_PAGE_ROWS
+    st.caption(f"Rows {start + 1:,}–{min(start + RESULT_PAGE_ROWS, len(frame)):,} of {len(frame):,}")
+    return frame.iloc[start:start + RESULT_PAGE_ROWS]
+
+@st.fragment
+def display_raw_data(title, result, key):
+    """
+    One side's extracted rows in an expander
+    
+    Nothing inside is built or sent until the expander is opened, and the
+    raw JSON only on request; opening and paging rerun just this fragment.
+    """
+    expander = st.expander(title, expanded=False, key=key, on_change="rerun")
+    with expander:
+        if not expander.open:
+            return
+        frame = result['data'].to_frame()
+        if result.get('structured'):
+            st.write("**Parsed directly from the structured statement (no OCR).**")
+        elif st.toggle("Show raw JSON from Claude OCR", key=f"{key}_json"):
+            st.json(result['data'].to_records(), expanded=False)
+        
+        st.write("**As DataFrame:**")
+        st.dataframe(paginate(frame, f"{key}_page"), use_container_width=True)
+
+@st.fragment
+def display_comparison(df):
+    """
+    The comparison table, filtered and paged on the server
+    
+    Only the rows on the current page are styled and sent to the browser;
+    the filter and page picker rerun just this fragment.
+    """
+    not_tally_only = st.toggle("Not Tally only", key="comparison_not_tally_only")
+    view = df[df['Status'].eq("Not Tally")] if not_tally_only else df
+    page = paginate(view, "comparison_page")
+    # Amount_B holds "No match" for unmatched rows; as a number column it
+    # converts to Arrow directly instead of failing and being re-typed on
+    # every redraw (Date_B and the others still say "No match")
+    page = page.assign(Amount_B=pd.to_numeric(page['Amount_B'], errors='coerce'))
+    
+    st.dataframe(
+        page.style.apply(status_styles, subset=['Status']),
+        use_container_width=True,
+        hide_index=False,
+        column_config={
+            "Date_A": st.column_config.TextColumn("Date_A", width="medium"),
+            "Description_A": st.column_config.TextColumn("Description_A", width="large"),
+            "Type_A": st.column_config.TextColumn("Type_A", width="small"),
+            "Amount_A": st.column_config.NumberColumn("Amount_A", width="medium", format="%.2f"),
+            "Date_B": st.column_config.TextColumn("Date_B", width="medium"),
+            "Description_B": st.column_config.TextColumn("Description_B", width="large"),
+            "Type_B": st.column_config.TextColumn("Type_B", width="small"),
+            "Amount_B": st.column_config.NumberColumn("Amount_B", width="medium", format="%.2f"),
+            "Status": st.column_config.TextColumn("Status", width="small"),
+        }
+    )
+
+def display_timing_breakdown(trace):
+    """Per-stage timings of one run, plus its cProfile capture when one was taken"""
+    rows = trace.breakdown()
+    if not rows:
+        return
+    total = trace.root.duration or 0.0
+    table = pd.DataFrame({
+        'Stage': [" " * row['depth'] + row['name'] for row in rows],
+        'Start (s)': [row['start'] for row in rows],
+        'Duration (s)': [row['duration'] for row in rows],
+        'Share': [row['duration'] / total if total else 0.0 for row in rows],
+        'Bytes in': [row.get('bytes_in') for row in rows],
+        'Bytes out': [row.get('bytes_out') for row in rows],
+        'Tokens in': [row.get('tokens_in') for row in rows],
+        'Tokens out': [row.get('tokens_out') for row in rows],
+        'Model': [row.get('model') for row in rows],
+        'Cache': [row.get('cache') for row in rows],
+        'Thread': [row['thread'] for row in rows],
+    })
+    with st.expander(f"⏱️ Timing breakdown ({total:.2f}s, trace {trace.id})", expanded=False):
+        st.dataframe(
+            table, use_container_width=True, hide_index=True,
+            column_config={
+                "Start (s)": st.column_config.NumberColumn(format="%.3f"),
+                "Duration (s)": st.column_config.NumberColumn(format="%.3f"),
+                "Share": st.column_config.ProgressColumn(min_value=0.0, max_value=1.0, format="percent"),
+            }
+        )
+        if trace.profiling:
+            data = trace.profile_data()
+            if data:
+                st.download_button(
+                    "⬇️ Download cProfile (.prof)", data, file_name=f"reconcile-{trace.id}.prof",
+                    mime="application/octet-stream", on_click="ignore"
+                )
+                st.code(trace.profile_report(), language=None)
+
+def display_api_stats(container):
+    """Show shared API client and request queue counters in the sidebar"""
+    stats = get_api_metrics().stats()
+    queue_stats = get_request_scheduler().stats()
+    route_stats = get_model_router().stats()
+    container.markdown(
+        f"Requests: **{stats['requests']}** · Retries: **{stats['retries']}** · "
+        f"Throttled: **{stats['throttled']}** · Failed: **{stats['failures']}**\n\n"
+        f"Connections opened: **{stats['connections_opened']}** · Reused: **{stats['connections_reused']}**\n\n"
+        f"Queue: **{queue_stats['queue_depth']}** waiting ({queue_stats['waiting_sessions']} sessions) · "
+        f"Coalesced: **{queue_stats['coalesced']}**\n\n"
+        f"Wait: mean **{queue_stats['wait_mean']:.1f}s** · p95 **{queue_stats['wait_p95']:.1f}s** · "
+        f"max **{queue_stats['wait_max']:.1f}s**"
+        + (f"\n\nRouted: fast **{route_stats['fast']}** · strong **{route_stats['strong']}** · "
+           f"escalated **{route_stats['escalated']}**" if MODEL_ROUTING else "")
+    )
+
+def render_streaming_extraction(bank_files, ssbo_files, tolerance):
+    """
+    Extract both statements while drawing their rows into live tables
+    
+    As soon as the SSBO side is complete, a provisional comparison against
+    the bank rows received so far is drawn too, so matching starts before the
+    bank extraction finishes. The live view is removed once both sides are
+    done and the regular results take over.
+    
+    Args:
+        tolerance: Keyword arguments for reconcile_frames
+    
+    Returns:
+        Tuple of (bank_result, ssbo_result)
+    """
+    live = st.empty()
+    rows = {'bank': [], 'ssbo': []}
+    results = {}
+    
+    def side_data(side):
+        result = results.get(side)
+        if result is not None and result['success']:
+            return result['data']
+        return rows[side]
+    
+    last_draw = 0.0
+    for kind, side, payload in stream_statements(bank_files, ssbo_files):
+        if kind == 'row':
+            rows[side].append(payload)
+        else:
+            results[side] = payload
+        
+        now = time.monotonic()
+        if kind == 'row' and now - last_draw < STREAM_RENDER_INTERVAL:
+            continue
+        last_draw = now
+        
+        with live.container():
+            col1, col2 = st.columns(2)
+            for column, side, label in ((col1, 'bank', "🏦 Bank Statement"), (col2, 'ssbo', "💰 SSBO Deposits")):
+                data = side_data(side)
+                state = "done" if side in results else "receiving..."
+                with column:
+                    st.caption(f"{label}: {len(data)} rows ({state})")
+                    frame = data.to_frame() if isinstance(data, TransactionTable) else pd.DataFrame(data)
+                    st.dataframe(frame, use_container_width=True, height=240)
+            
+            queue_stats = get_request_scheduler().stats()
+            if queue_stats['queue_depth']:
+                st.caption(f"🚦 {queue_stats['queue_depth']} model calls queued across "
+                           f"{queue_stats['waiting_sessions']} sessions (rate limit)")
+            
+            ssbo_result = results.get('ssbo')
+            if ssbo_result is not None and ssbo_result['success'] and len(side_data('bank')):
+                provisional = reconcile_frames(side_data('bank'), ssbo_result['data'], **tolerance)
+                st.caption("📊 Provisional comparison (updates as bank rows arrive)")
+                st.dataframe(provisional, use_container_width=True, height=240)
+    
+    live.empty()
+    return results['bank'], results['ssbo']
+
+@st.fragment
+def reconcile_section(bank_files, ssbo_files, tolerance, profile_run):
+    """
+    The reconcile button and its results
+    
+    A fragment, so the button and the result widgets rerun only this
+    section. Finished runs go to the run store under this session and the
+    content hashes of the uploads of both sides; every later rerun of the
+    session redraws the stored run instead of extracting again.
+    """
+    st.markdown("<br>", unsafe_allow_html=True)
+    
+    # Center the button only
+    col_center = st.columns([1, 2, 1])
+    with col_center[1]:
+        process_button = st.button("🚀 INITIATE RECONCILIATION", key="process_btn")
+    
+    bank_files, ssbo_files = as_uploads(bank_files), as_uploads(ssbo_files)
+    key = run_key(uploads_hash(bank_files), uploads_hash(ssbo_files))
+    if not process_button:
+        run = get_run_store().get(key, current_session_id())
+        if run is not None:
+            display_stored_run(run, tolerance, profile_run)
+        return
+    
+    # Process results outside of the column structure for full width
+    started = time.perf_counter()
+    with start_trace("reconcile", profile=profile_run, run=key) as trace, \
+            st.spinner("🔄 Processing images with Claude AI..."):
+        try:
+            # Process bank statement and SSBO deposits with Claude at the same time
+            st.write("📊 Processing Bank Statement and 💰 SSBO Deposits...")
+            with span("extract"):
+                if STREAM_EXTRACTION:
+                    bank_result, ssbo_result = render_streaming_extraction(bank_files, ssbo_files, tolerance)
+                else:
+                    bank_result, ssbo_result = process_statements_concurrently(bank_files, ssbo_files)
+            
+            if bank_result['success'] and ssbo_result['success']:
+                with span("reconcile.match", ledger=LEDGER_ENABLED) as match_span:
+                    if LEDGER_ENABLED:
+                        df, carried = reconcile_with_ledger(bank_files, bank_result, ssbo_files, ssbo_result, tolerance)
+                    else:
+                        df, carried = reconcile_frames(bank_result['data'], ssbo_result['data'], **tolerance), None
+                    match_span.set(rows=len(df))
+                
+                run = StoredRun(key, bank_result, ssbo_result, df, carried, tolerance,
+                                duration=time.perf_counter() - started, trace_id=trace.id,
+                                session=current_session_id())
+                get_run_store().put(run)
+                display_results(run)
+                
+            else:
+                st.error("❌ Error processing images:")
+                if not bank_result['success']:
+                    st.error(f"Bank Statement: {bank_result['error']}")
+                if not ssbo_result['success']:
+                    st.error(f"SSBO Deposits: {ssbo_result['error']}")
+                    
+        except Exception as e:
+            st.error(f"❌ Unexpected error: {str(e)}")
+            st.exception(e)
+    
+    display_timing_breakdown(trace)
+
+def display_stored_run(run, tolerance, profile_run=False):
+    """Redraw a stored run, timing the redraw"""
+    notice = st.empty()
+    sample = 1.0 if profile_run else RERENDER_TRACE_SAMPLE
+    with start_trace("rerender", sample=sample, run=run.key) as trace:
+        display_results(run)
+    
+    with notice.container():
+        st.caption(
+            f"♻️ Results of the run at {time.strftime('%H:%M:%S', time.localtime(run.created))} "
+            f"(took {run.duration:.1f}s), redrawn in {trace.root.duration * 1000:.0f} ms with no model calls"
+        )
+        if run.tolerance != tolerance:
+            st.info("ℹ️ These results were matched with different tolerance settings. "
+                    "Click **Initiate Reconciliation** to match again; the extraction is reused from the cache.")
+
+def screenshots_note(result) -> str:
+    """' from N screenshots' for a side merged from several uploads, with the overlap rows dropped"""
+    if result.get('screenshots', 1) <= 1:
+        return ""
+    return (f" from {result['screenshots']} screenshots, "
+            f"{result.get('overlap_dropped', 0)} rows repeated where they overlap counted once")
+
+def overlap_warning(label, result):
+    """Warn about rows that look repeated across screenshots but were too few to be sure"""
+    if result.get('overlap_unconfirmed'):
+        st.warning(f"⚠️ {label}: {result['overlap_unconfirmed']} rows appear in more than one screenshot, "
+                   "but too few in a row to be sure they are the overlap, so they were all kept. "
+                   "Check them for double counting, or retake the screenshots with a few more rows of overlap.")
+
+def display_results(run):
+    """Extraction summary, raw data and the comparison table of a run"""
+    bank_result, ssbo_result, df, carried = run.bank_result, run.ssbo_result, run.comparison, run.carried
+    st.success("✅ Both images processed successfully!")
+    
+    # Show summary in full width
+    st.markdown("---")
+    col1, col2 = st.columns(2)
+    with col1:
+        st.info(f"🏦 **Bank Statement:** {bank_result['record_count']} records extracted{screenshots_note(bank_result)}")
+    with col2:
+        st.info(f"💰 **SSBO Deposits:** {ssbo_result['record_count']} records extracted{screenshots_note(ssbo_result)}")
+    overlap_warning("Bank Statement", bank_result)
+    overlap_warning("SSBO Deposits", ssbo_result)
+    
+    with span("render.raw"):
+        display_raw_data("🏦 Raw Bank Statement Data", bank_result, "raw_bank")
+        display_raw_data("💰 Raw SSBO Deposits Data", ssbo_result, "raw_ssbo")
+    
+    # Create and display comparison table in full width
+    st.markdown("---")
+    st.markdown("## 📊 Statement Comparison")
+    
+    if carried is not None and not carried.empty:
+        st.success(f"🕓 {len(carried)} bank record(s) from earlier uploads now tally")
+        with st.expander("🕓 Earlier bank records matched by this upload", expanded=False):
+            st.dataframe(carried, use_container_width=True)
+    
+    with span("render.comparison"):
+        if not df.empty:
+            display_comparison(df)
+        
+        # Show summary statistics in full width
+        status_counts = df['Status'].value_counts()
+        tally_count = int(status_counts[status_counts.index.str.startswith('Tally')].sum())
+        not_tally_count = int(status_counts.get('Not Tally', 0))
+        
+        st.markdown("---")
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("Total Records", len(df))
+        with col2:
+            st.metric("✅ Tally", tally_count)
+        with col3:
+            st.metric("❌ Not Tally", not_tally_count)
 
 # -------------------------------
 # Main Streamlit Application
@@ -290,7 +740,8 @@ def main():
         st.markdown(
             "1. Upload the **bank transaction screenshot** and the **SSBO transaction screenshot** at the designated sections\n"
             "2. Click on the **""Initiate Reconciliation""** button once both of the screenshots are uploaded.\n"
-            "3. The transactions that are not inside the SSBO will show as **'Not Tally'**."
+            "3. The transactions that are not inside the SSBO will show as **'Not Tally'**. Matches found only thanks to the tolerance settings below show which difference was accepted, e.g. **'Tally (date +1d)'**.\n"
+            "4. Bank exports (**CSV, XLSX, MT940, OFX**) and SSBO exports (**CSV, XLSX**) can be uploaded instead of screenshots. They are read directly, with no OCR."
         )
 
         st.markdown("### ❗ Things To Take Note ❗")
@@ -298,7 +749,39 @@ def main():
             "1. Ensure that the text in the screenshots are **readable** and the **text size is not too small**\n"
             "2. The **headers** must always be included in both the bank transaction and the SSBO transactions screenshot.\n"
             "3. The SSBO screenshot must always include columns such as **Event Time, Transaction Type, Amount**\n"
-            "4. Avoid including **more than 17 rows of transaction** in the screenshots."
+            "4. Long screenshots are fine: tables with many rows are split into bands and read in parallel.\n"
+            "5. A long statement can also be uploaded as **several screenshots** taken while scrolling. They are read in parallel, and rows repeated where the screenshots overlap are counted once. Let neighbouring screenshots share at least three rows, so the overlap can be told apart from identical transactions."
+        )
+
+        st.markdown("### 🎯 Matching Tolerance")
+        date_window_days = st.number_input(
+            "Date window (± days)", min_value=0, max_value=7, value=0, step=1,
+            help="Match SSBO records dated up to this many days before or after the bank date",
+            key="match_date_window"
+        )
+        tolerance_mode = st.radio(
+            "Amount tolerance", ["Absolute", "Percentage"], horizontal=True, key="match_tolerance_mode"
+        )
+        tolerance_value = st.number_input(
+            "Tolerance (RM)" if tolerance_mode == "Absolute" else "Tolerance (%)",
+            min_value=0.0, value=0.0, step=0.01 if tolerance_mode == "Absolute" else 0.1,
+            key="match_tolerance_value"
+        )
+
+        st.markdown("### ⚡ OCR Cache")
+        cache_stats_container = st.empty()
+
+        st.markdown("### 🔌 API Client")
+        api_stats_container = st.empty()
+
+        if LEDGER_ENABLED:
+            st.markdown("### 📒 Ledger")
+            ledger_stats_container = st.empty()
+
+        st.markdown("### ⏱️ Diagnostics")
+        profile_run = st.checkbox(
+            "Profile reconciliations (cProfile)", value=False, key="profile_run",
+            help="Capture a cProfile of each run, downloadable from the timing breakdown under the results"
         )
     
     # Main title
@@ -321,16 +804,17 @@ def main():
         st.session_state.ssbo_deposit_data = None
     
     with col1:
-        bank_file, bank_uploaded = create_upload_section(
-            "🏦 BANK TRANSACTION SCREENSHOT", 
-            "bank_statement_uploader"
+        bank_files, bank_uploaded = create_upload_section(
+            "🏦 BANK TRANSACTION SCREENSHOTS", 
+            "bank_statement_uploader",
+            IMAGE_UPLOAD_TYPES + STRUCTURED_UPLOAD_TYPES
         )
         
-        if bank_file is not None and bank_uploaded:
-            # Process the file in memory and store data in session state
-            file_data = process_uploaded_file(bank_file)
-            st.session_state.bank_statement_data = file_data
-            st.success(f"📁 Processed: {file_data['name']} ({file_data['size']} bytes)")
+        if bank_files and bank_uploaded:
+            # Process the files in memory and store data in session state
+            files_data = [process_uploaded_file(bank_file) for bank_file in bank_files]
+            st.session_state.bank_statement_data = files_data
+            st.success("📁 Processed: " + ", ".join(f"{data['name']} ({data['size']} bytes)" for data in files_data))
             
             # # Add debug button to see what Claude sees (only for bank statement)
             # st.markdown("---")
@@ -361,212 +845,204 @@ def main():
             #             st.exception(e)
     
     with col2:
-        ssbo_file, ssbo_uploaded = create_upload_section(
-            "💰 SSBO DEPOSITS SCREENSHOT ONLY", 
-            "ssbo_deposit_uploader"
+        ssbo_files, ssbo_uploaded = create_upload_section(
+            "💰 SSBO DEPOSITS SCREENSHOTS ONLY", 
+            "ssbo_deposit_uploader",
+            IMAGE_UPLOAD_TYPES + sorted({ext.lstrip('.') for ext in SSBO_EXTENSIONS})
         )
         
-        if ssbo_file is not None and ssbo_uploaded:
-            # Process the file in memory and store data in session state
-            file_data = process_uploaded_file(ssbo_file)
-            st.session_state.ssbo_deposit_data = file_data
-            st.success(f"📁 Processed: {file_data['name']} ({file_data['size']} bytes)")
+        if ssbo_files and ssbo_uploaded:
+            # Process the files in memory and store data in session state
+            files_data = [process_uploaded_file(ssbo_file) for ssbo_file in ssbo_files]
+            st.session_state.ssbo_deposit_data = files_data
+            st.success("📁 Processed: " + ", ".join(f"{data['name']} ({data['size']} bytes)" for data in files_data))
+    
+    tolerance = {
+        'date_window_days': date_window_days,
+        'amount_tolerance': tolerance_value if tolerance_mode == "Absolute" else 0.0,
+        'amount_tolerance_pct': tolerance_value if tolerance_mode == "Percentage" else 0.0,
+    }
     
     # Process button (only show when both files are uploaded)
     if bank_uploaded and ssbo_uploaded:
-        st.markdown("<br>", unsafe_allow_html=True)
+        reconcile_section(bank_files, ssbo_files, tolerance, profile_run)
+
+    # Render cache and API counters last so they include this run's calls
+    display_cache_stats(cache_stats_container)
+    display_api_stats(api_stats_container)
+    if LEDGER_ENABLED:
+        display_ledger_stats(ledger_stats_container)
+
+
+
+    
+# -------------------------------
+# Extraction Prompts
+# -------------------------------
+
+# Fixed model per side, used when MODEL_ROUTING is off
+SSBO_MODEL = FAST_MODEL
+BANK_MODEL = STRONG_MODEL
+
+SSBO_PROMPT = """
+        The attached image contains a structured table. Please extract ALL data from the table and return it as a JSON array of objects. 
         
-        # Center the button only
-        col_center = st.columns([1, 2, 1])
-        with col_center[1]:
-            process_button = st.button("🚀 INITIATE RECONCILIATION", key="process_btn")
+        Requirements:
+        1. Each row should be a JSON object
+        2. Use the column headers as JSON keys
+        3. Be extremely accurate with financial data.
+        4. Do not hallucinate or use previous memory of other images uploaded to return the result. Always return whatever that is displayed to you in the image ONLY
+        5. For event time column, convert the data into the format of YYYY-MM-DD.
+        6. Only return the rows where the "Transaction Type" is "Deposit" or "Transfer".
+        7. Only return the data of these 4 columns only: Transaction Type, Event Time, Amount, Remark.
+        8. Convert the image into grayscale before performing OCR to ensure accuracy.
+        
+        Return ONLY the JSON array, no explanations or additional text.
+        Example format:
+        [
+            {"column1": "value1", "column2": 123.45, "column3": "2025-08-14", "column4": "Deposit"},
+            {"column1": "value2", "column2": 678.90, "column3": "2025-08-15", "column4": "Transfer"}
+        ]
+        """
 
+BANK_PROMPT = """
+        Please extract ALL data from this table image and return it as a JSON array of objects.
         
+        Requirements:
+        1. Each row should be a JSON object
+        2. Use the column headers as JSON keys
+        3. Be extremely accurate with financial data.
+        4. Do not hallucinate or use previous memory of other images uploaded to return the result. Always return whatever that is displayed to you in the image ONLY
+        5. For event time column, convert the data into the format of YYYY-MM-DD.
+        6. The image may have colours. Please perform some pre-processing before you perform OCR to achieve best accuracy.
         
-        # Process results outside of the column structure for full width
-        if process_button:
-            with st.spinner("🔄 Processing images with Claude AI..."):
-                try:
-                    # Process bank statement with Claude
-                    st.write("📊 Processing Bank Statement...")
-                    bank_result = process_bank_statement_with_claude(
-                        st.session_state.bank_statement_data['file_object']
-                    )
-                    
-                    # Process SSBO deposits with Claude
-                    st.write("💰 Processing SSBO Deposits...")
-                    ssbo_result = process_ssbo_deposits_with_claude(
-                        st.session_state.ssbo_deposit_data['file_object']
-                    )
-                    
-                    # Display results
-                    if bank_result['success'] and ssbo_result['success']:
-                        st.success("✅ Both images processed successfully!")
-                        
-                        # Show summary in full width
-                        st.markdown("---")
-                        col1, col2 = st.columns(2)
-                        with col1:
-                            st.info(f"🏦 **Bank Statement:** {bank_result['record_count']} records extracted")
-                        with col2:
-                            st.info(f"💰 **SSBO Deposits:** {ssbo_result['record_count']} records extracted")
-                        
-                        # Show raw bank data
-                        with st.expander("🏦 Raw Bank Statement Data", expanded=False):
-                            st.write("**Raw JSON from Claude OCR:**")
-                            st.json(bank_result['data'])
-                            
-                            # Show as DataFrame for better readability
-                            st.write("**As DataFrame:**")
-                            bank_df = pd.DataFrame(bank_result['data'])
-                            st.dataframe(bank_df, use_container_width=True)
-                        
-                        # Show raw SSBO data
-                        with st.expander("💰 Raw SSBO Deposits Data", expanded=False):
-                            st.write("**Raw JSON from Claude OCR:**")
-                            st.json(ssbo_result['data'])
-                            
-                            # Show as DataFrame for better readability
-                            st.write("**As DataFrame:**")
-                            ssbo_df = pd.DataFrame(ssbo_result['data'])
-                            st.dataframe(ssbo_df, use_container_width=True)
-                        
-                        # Create and display comparison table in full width
-                        st.markdown("---")
-                        st.markdown("## 📊 Statement Comparison")
-                        
-                        comparison_data = create_comparison_table(bank_result['data'], ssbo_result['data'])
-                        
-                        if comparison_data:
-                            # Convert to DataFrame for better display
-                            # Convert to DataFrame for better display
-                            df = pd.DataFrame(comparison_data)
-                            
-                            # Apply conditional styling to the DataFrame
-                            def highlight_status(val):
-                                if val == "Tally":
-                                    return 'background-color: #90EE90; color: #006400; font-weight: bold;'
-                                elif val == "Not Tally":
-                                    return 'background-color: #FFB6C1; color: #8B0000; font-weight: bold;'
-                                return ''
-                            
-                            # Apply the styling
-                            styled_df = df.style.applymap(highlight_status, subset=['Status'])
-                            
-                            # Display the comparison table in full width
-                            st.dataframe(
-                                styled_df,
-                                use_container_width=True,
-                                hide_index=False,
-                                column_config={
-                                    "Date_A": st.column_config.TextColumn("Date_A", width="medium"),
-                                    "Description_A": st.column_config.TextColumn("Description_A", width="large"),
-                                    "Type_A": st.column_config.TextColumn("Type_A", width="small"),
-                                    "Amount_A": st.column_config.NumberColumn("Amount_A", width="medium", format="%.2f"),
-                                    "Date_B": st.column_config.TextColumn("Date_B", width="medium"),
-                                    "Description_B": st.column_config.TextColumn("Description_B", width="large"),
-                                    "Type_B": st.column_config.TextColumn("Type_B", width="small"),
-                                    "Amount_B": st.column_config.NumberColumn("Amount_B", width="medium", format="%.2f"),
-                                    "Status": st.column_config.TextColumn("Status", width="small"),
-
-                                }
-                            )
-                        
-                        # Show summary statistics in full width
-                        tally_count = len([row for row in comparison_data if row['Status'] == 'Tally'])
-                        not_tally_count = len([row for row in comparison_data if row['Status'] == 'Not Tally'])
-                        
-                        st.markdown("---")
-                        col1, col2, col3 = st.columns(3)
-                        with col1:
-                            st.metric("Total Records", len(comparison_data))
-                        with col2:
-                            st.metric("✅ Tally", tally_count)
-                        with col3:
-                            st.metric("❌ Not Tally", not_tally_count)
-                        
-                        # Store results in session state for further processing
-                        st.session_state.bank_ocr_result = bank_result
-                        st.session_state.ssbo_ocr_result = ssbo_result
-                        st.session_state.comparison_data = comparison_data
-                        
-                    else:
-                        st.error("❌ Error processing images:")
-                        if not bank_result['success']:
-                            st.error(f"Bank Statement: {bank_result['error']}")
-                        if not ssbo_result['success']:
-                            st.error(f"SSBO Deposits: {ssbo_result['error']}")
-                            
-                except Exception as e:
-                    st.error(f"❌ Unexpected error: {str(e)}")
-                    st.exception(e)
+        Return ONLY the JSON array, no explanations or additional text.
+        Example format:
+        [
+            {"column1": "value1", "column2": 123.45, "column3": "2025-08-14"},
+            {"column1": "value2", "column2": 678.90, "column3": "2025-08-15"}
+        ]
 
+        From the json array, separate the transactions by Deposit or Transfer. If the row has data under the Credit, Deposit or Money In column, then that row is considered as Deposit. Else, the row is considered as Transfer.
+        Help me to paraphrase the existing column headers into 3 columns only : Event Time , Amount, Description/Remarks. Then, add another column called "Transaction Type" and populate it with Deposit or Transfer according to the logic just now.
+        If the table has a running balance column, also keep it as a column called "Balance" (as a plain number); otherwise leave "Balance" out.
+        """
+
+# Tool schemas used when EXTRACTION_MODE is "tool"; keyed by the prompt they answer
+EVENT_TIME_SCHEMA = {"type": "string", "format": "date", "description": "Transaction date as YYYY-MM-DD"}
+AMOUNT_SCHEMA = {"type": "number", "description": "Amount as a plain number, without currency or thousands separators"}
+TRANSACTION_TYPE_SCHEMA = {"type": "string", "enum": ["Deposit", "Transfer"]}
+
+def rows_tool(name: str, description: str, properties: dict) -> dict:
+    """Tool definition whose input is {"rows": [row, ...]} with the given row properties"""
+    return {
+        "name": name,
+        "description": description,
+        "input_schema": {
+            "type": "object",
+            "properties": {
+                "rows": {
+                    "type": "array",
+                    "items": {"type": "object", "properties": properties, "required": list(properties)}
+                }
+            },
+            "required": ["rows"]
+        }
+    }
+
+BANK_ROWS_TOOL = rows_tool(
+    "record_bank_rows",
+    "Record every transaction row read from the bank statement table.",
+    {
+        "Event Time": EVENT_TIME_SCHEMA,
+        "Amount": AMOUNT_SCHEMA,
+        "Description/Remarks": {"type": "string"},
+        "Transaction Type": TRANSACTION_TYPE_SCHEMA,
+        BALANCE_KEY: {"type": ["number", "null"], "description": "Running balance after the row; null if the table has none"},
+    }
+)
+
+SSBO_ROWS_TOOL = rows_tool(
+    "record_ssbo_rows",
+    "Record every Deposit or Transfer row read from the SSBO table.",
+    {
+        "Transaction Type": TRANSACTION_TYPE_SCHEMA,
+        "Event Time": EVENT_TIME_SCHEMA,
+        "Amount": AMOUNT_SCHEMA,
+        "Remark": {"type": "string"},
+    }
+)
+
+ROW_TOOLS = {BANK_PROMPT: BANK_ROWS_TOOL, SSBO_PROMPT: SSBO_ROWS_TOOL}
 
 
-    
 class AnthropicOCR:
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, cache=None, scheduler=None):
         """
         Initialize Anthropic client for OCR operations
         
         Args:
             api_key: Your Anthropic API key
+            cache: Optional OCRCache used by extract_rows
+            scheduler: Optional RequestScheduler that rate-limits and queues
+                every model request and coalesces the calls made by extract_rows
         """
-        self.client = anthropic.Anthropic(api_key=api_key)
+        # Shared across instances so connections are kept alive between calls
+        self.client = get_api_client(api_key)
+        self.cache = cache
+        self.scheduler = scheduler
     
     def detect_media_type_from_content(self, file_content) -> str:
         """
         Detect media type from file content using magic bytes
+        
+        Only the header is read; file_content may be bytes or a memoryview
+        of the upload.
         """
-        # Convert memoryview to bytes if needed
-        if hasattr(file_content, 'tobytes'):
-            file_content = file_content.tobytes()
-        elif not isinstance(file_content, bytes):
-            file_content = bytes(file_content)
-        
-        # Check file headers (magic bytes)
-        if file_content.startswith(b'\xff\xd8\xff'):
-            return "image/jpeg"
-        elif file_content.startswith(b'\x89PNG\r\n\x1a\n'):
-            return "image/png"
-        elif file_content.startswith(b'GIF87a') or file_content.startswith(b'GIF89a'):
-            return "image/gif"
-        elif file_content.startswith(b'RIFF') and file_content[8:12] == b'WEBP':
-            return "image/webp"
-        else:
-            # Default to PNG if we can't detect
-            return "image/png"
+        return sniff_media_type(file_content)
 
     def encode_image_from_file(self, uploaded_file) -> str:
         try:
-            # Read file content
-            file_content = uploaded_file.getbuffer()
-            
-            if hasattr(file_content, 'tobytes'):
-                file_content = file_content.tobytes()
-            elif not isinstance(file_content, bytes):
-                file_content = bytes(file_content)
-            
-            # Open image with PIL
-            image = Image.open(io.BytesIO(file_content))
-            
-            # Convert to grayscale
-            gray_image = image.convert('L')
-            
-            # Save as PNG to buffer
-            buffer = io.BytesIO()
-            gray_image.save(buffer, format='PNG')
-            
-            # Encode to base64
-            base64_data = base64.b64encode(buffer.getvalue()).decode('utf-8')
+            with span("ocr.encode") as encode_span:
+                # The decoded image and the encoded payload are cached per file
+                # content, so repeat reconciliations of the same upload do no image work
+                with span("image.decode"):
+                    artifacts = get_upload_artifacts(uploaded_file)
+                built = []
+                report = artifacts.payload(
+                    IMAGE_OPTIMIZER_MODE,
+                    lambda image: built.append(True) or self._build_payload(image, artifacts.size, uploaded_file.name)
+                )
+                encode_span.set(bytes_in=artifacts.size, bytes_out=len(report['base64']),
+                                cache="miss" if built else "hit")
             
-            uploaded_file._detected_media_type = "image/png"
-            return base64_data
+            uploaded_file._detected_media_type = report['media_type']
+            uploaded_file._optimization_report = report
+            return report['base64']
             
         except Exception as e:
             print(f"Error in encode_image_from_file: {str(e)}")
             raise e
     
+    def _build_payload(self, image, original_bytes: int, name: str) -> dict:
+        """
+        Optimize a decoded image (PIL image or grayscale array) and
+        base64-encode the result
+        
+        Only the base64 text is kept in the report: it is what the request
+        needs, and the report stays cached with the upload.
+        """
+        # Grayscale, downsample to the model's useful resolution and pick the smallest lossless format
+        with span("image.optimize", bytes_in=original_bytes) as optimize_span:
+            report = optimize_image(image, original_bytes, mode=IMAGE_OPTIMIZER_MODE)
+            optimize_span.set(bytes_out=len(report['data']), tokens_out=report.get('optimized_tokens'))
+        print(f"Optimized {name}: {format_report(report)}")
+        
+        # Encode to base64
+        with span("image.base64", bytes_in=len(report['data'])) as base64_span:
+            report['base64'] = base64.b64encode(report.pop('data')).decode('ascii')
+            base64_span.set(bytes_out=len(report['base64']))
+        return report
  
     def extract_table_as_json(self, uploaded_file) -> str:
         """
@@ -578,66 +1054,10 @@ class AnthropicOCR:
         Returns:
             JSON string of the extracted table data
         """
-        
-        prompt = """
-        The attached image contains a structured table. Please extract ALL data from the table and return it as a JSON array of objects. 
-        
-        Requirements:
-        1. Each row should be a JSON object
-        2. Use the column headers as JSON keys
-        3. Be extremely accurate with financial data.
-        4. Do not hallucinate or use previous memory of other images uploaded to return the result. Always return whatever that is displayed to you in the image ONLY
-        5. For event time column, convert the data into the format of YYYY-MM-DD.
-        6. Only return the rows where the "Transaction Type" is "Deposit" or "Transfer".
-        7. Only return the data of these 4 columns only: Transaction Type, Event Time, Amount, Remark.
-        8. Convert the image into grayscale before performing OCR to ensure accuracy.
-        
-        Return ONLY the JSON array, no explanations or additional text.
-        Example format:
-        [
-            {"column1": "value1", "column2": 123.45, "column3": "2025-08-14", "column4": "Deposit"},
-            {"column1": "value2", "column2": 678.90, "column3": "2025-08-15", "column4": "Transfer"}
-        ]
-        """
-        
         # Encode the image properly using the file object
         base64_image = self.encode_image_from_file(uploaded_file)
-        
-        # Use the detected media type (more reliable than file extension)
-        media_type = getattr(uploaded_file, '_detected_media_type', None)
-        if not media_type:
-            media_type = uploaded_file.type if uploaded_file.type else "image/png"
-        
-        print(f"Using media type: {media_type}")
-        
-        # Create the message with image
-        message = self.client.messages.create(
-            model="claude-3-5-haiku-latest",
-            max_tokens=4000,
-            messages=[
-                {
-                    "role": "user",
-                    "content": [
-                        {
-                            "type": "text",
-                            "text": prompt
-                        },
-                        {
-                            "type": "image",
-                            "source": {
-                                "type": "base64",
-                                "media_type": media_type,
-                                "data": base64_image
-                            }
-                        }
-                    ]
-                }
-            ]
-        )
-        
-        # Extract the JSON content
-        json_content = message.content[0].text
-        return json_content
+        return self._request_table_json(SSBO_PROMPT, SSBO_MODEL, base64_image, self._media_type_for(uploaded_file),
+                                        self._token_estimate(uploaded_file, SSBO_PROMPT))
 
     def extract_bank_table_as_json(self, uploaded_file) -> str:
         """
@@ -649,43 +1069,271 @@ class AnthropicOCR:
         Returns:
             JSON string of the extracted table data
         """
+        # Encode the image properly using the file object
+        base64_image = self.encode_image_from_file(uploaded_file)
+        return self._request_table_json(BANK_PROMPT, BANK_MODEL, base64_image, self._media_type_for(uploaded_file),
+                                        self._token_estimate(uploaded_file, BANK_PROMPT))
+
+    def extract_rows(self, uploaded_file, prompt: str, model: str, on_row=None) -> list:
+        """
+        Extract table rows, serving them from the OCR cache when possible
         
-        prompt = """
-        Please extract ALL data from this table image and return it as a JSON array of objects.
+        The cache key covers the preprocessed image, the prompt and the model,
+        so a hit skips the API call entirely. On a miss every request, re-reads
+        and retries included, is admitted by the scheduler, if any, which also
+        lets identical concurrent extractions share one call.
         
-        Requirements:
-        1. Each row should be a JSON object
-        2. Use the column headers as JSON keys
-        3. Be extremely accurate with financial data.
-        4. Do not hallucinate or use previous memory of other images uploaded to return the result. Always return whatever that is displayed to you in the image ONLY
-        5. For event time column, convert the data into the format of YYYY-MM-DD.
-        6. The image may have colours. Please perform some pre-processing before you perform OCR to achieve best accuracy.
+        Args:
+            uploaded_file: Streamlit uploaded file object
+            prompt: Extraction prompt (SSBO_PROMPT or BANK_PROMPT)
+            model: Model name
+            on_row: Optional callback; when given, the reply is streamed and
+                on_row is called with each row as soon as it decodes
+            
+        Returns:
+            List of row dicts parsed from the model's JSON output
+        """
+        with span("ocr.extract", model=model) as extract_span:
+            rows = self._extract_rows(uploaded_file, prompt, model, on_row, extract_span)
+            extract_span.set(rows=len(rows))
+            return rows
+    
+    def _extract_rows(self, uploaded_file, prompt: str, model: str, on_row, extract_span) -> list:
+        base64_image = self.encode_image_from_file(uploaded_file)
+        key = make_cache_key(base64_image, prompt, model)
         
-        Return ONLY the JSON array, no explanations or additional text.
-        Example format:
-        [
-            {"column1": "value1", "column2": 123.45, "column3": "2025-08-14"},
-            {"column1": "value2", "column2": 678.90, "column3": "2025-08-15"}
-        ]
+        if self.cache is not None:
+            rows = self.cache.get(key)
+            if rows is not None:
+                print(f"OCR cache hit for {getattr(uploaded_file, 'name', 'upload')}")
+                extract_span.set(cache="hit")
+                if on_row is not None:
+                    for row in rows:
+                        on_row(row)
+                return rows
+        
+        media_type = self._media_type_for(uploaded_file)
+        tokens = self._token_estimate(uploaded_file, prompt)
+        name = getattr(uploaded_file, 'name', 'upload')
+        fetched = []
+        
+        def fetch():
+            best = None
+            for attempt in range(1, EXTRACTION_ATTEMPTS + 1):
+                # Only the first attempt streams; a re-request would repeat rows on_row has seen
+                parser = self._request_rows(prompt, model, base64_image, media_type, tokens,
+                                            on_row if attempt == 1 else None)
+                if best is None or parser.complete or len(parser.rows) > len(best.rows):
+                    best = parser
+                if parser.complete:
+                    break
+                print(f"Incomplete extraction for {name} (attempt {attempt}): {'; '.join(parser.problems())}")
+            
+            rows = best.close()
+            fetched.append(True)
+            if not best.complete:
+                # Keep the well-formed rows, but don't let a partial result stick in the cache
+                print(f"Keeping {len(rows)} well-formed rows for {name}")
+                return rows
+            
+            # Cache before the scheduler releases the call, so later identical
+            # requests hit the cache rather than re-calling the API
+            if self.cache is not None:
+                self.cache.put(key, rows)
+            return rows
+        
+        if self.scheduler is None:
+            extract_span.set(cache="miss" if self.cache is not None else None)
+            return fetch()
+        
+        rows = self.scheduler.run(key, fetch)
+        extract_span.set(cache="miss" if fetched else "coalesced")
+        if not fetched and on_row is not None:
+            # Shared another caller's request; replay its rows
+            for row in rows:
+                on_row(row)
+        return rows
 
-        From the json array, separate the transactions by Deposit or Transfer. If the row has data under the Credit, Deposit or Money In column, then that row is considered as Deposit. Else, the row is considered as Transfer.
-        Help me to paraphrase the existing column headers into 3 columns only : Event Time , Amount, Description/Remarks. Then, add another column called "Transaction Type" and populate it with Deposit or Transfer according to the logic just now.
+    def extract_rows_tiled(self, uploaded_file, prompt: str, model: str, max_workers=TILE_MAX_WORKERS,
+                           on_row=None) -> list:
+        """
+        Extract table rows, splitting tall screenshots into row bands
+        
+        Each band repeats the header row and overlaps its neighbour by
+        TILE_OVERLAP_ROWS rows. Bands are extracted concurrently and the
+        overlapping rows are removed when the results are stitched together.
+        Short tables go through extract_rows unchanged.
+        
+        on_row sees rows as each band decodes them, so it may see a seam row
+        twice; the returned list is the de-duplicated result.
         """
+        with span("image.split"):
+            band_files = self._band_files(uploaded_file)
+        if len(band_files) == 1:
+            return self.extract_rows(uploaded_file, prompt, model, on_row)
+        
+        with span("ocr.bands", bands=len(band_files)):
+            with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='ocr-band') as executor:
+                extract = bind_session(bind_trace(lambda f: self.extract_rows(f, prompt, model, on_row)))
+                band_rows = list(executor.map(extract, band_files))
+        
+        with span("ocr.merge"):
+            return merge_band_rows(band_rows, TILE_OVERLAP_ROWS)
 
+    def extract_rows_subset(self, uploaded_file, indices, prompt: str, model: str) -> list:
+        """
+        Re-read some data rows of a table, cropped under its header into one image
+        
+        indices count data rows from 0 under the header, as find_table_rows
+        sees them; the rows come back in the order of indices.
+        """
+        artifacts = get_upload_artifacts(uploaded_file)
+        crop = crop_rows(artifacts.gray, artifacts.payload('table_rows', find_table_rows), indices)
+        name = f"{uploaded_file.name}#rows{','.join(str(i) for i in indices)}"
+        return self.extract_rows(encode_band(crop, name), prompt, model)
 
-        # Encode the image properly using the file object
-        base64_image = self.encode_image_from_file(uploaded_file)
+    def batch_requests(self, uploaded_file, prompt: str, model: str) -> list:
+        """
+        Message Batches API requests covering what extract_rows_tiled would send
+        
+        Each custom_id is the OCR cache key of the request, so once the batch
+        results are stored in the cache, extract_rows_tiled answers entirely
+        from it.
+        
+        Returns:
+            List of {'custom_id', 'params'} dicts, one per row band
+        """
+        requests = []
+        for band_file in self._band_files(uploaded_file):
+            base64_image = self.encode_image_from_file(band_file)
+            requests.append({
+                'custom_id': make_cache_key(base64_image, prompt, model),
+                'params': self._table_request(prompt, model, base64_image, self._media_type_for(band_file)),
+            })
+        return requests
+
+    def _band_files(self, uploaded_file) -> list:
+        """The upload itself if the table is short, else one in-memory file per row band"""
+        gray = get_upload_artifacts(uploaded_file).gray
+        bands = split_into_bands(gray, TILE_ROWS_PER_BAND, TILE_OVERLAP_ROWS)
+        if len(bands) == 1:
+            return [uploaded_file]
+        
+        print(f"Splitting {uploaded_file.name} into {len(bands)} row bands")
+        return [encode_band(band, f"{uploaded_file.name}#band{i}") for i, band in enumerate(bands)]
+
+    def _media_type_for(self, uploaded_file) -> str:
+        """
+        Media type of the payload encode_image_from_file sends for this file
         
-        # Use the detected media type (more reliable than file extension)
+        The optimizer may re-encode the upload (e.g. as WebP), so the type the
+        browser declared for the upload can be wrong for the payload.
+        """
         media_type = getattr(uploaded_file, '_detected_media_type', None)
         if not media_type:
-            media_type = uploaded_file.type if uploaded_file.type else "image/png"
+            # Not encoded yet; the payload is cached per upload, so this is cheap afterwards
+            self.encode_image_from_file(uploaded_file)
+            media_type = uploaded_file._detected_media_type
         
         print(f"Using media type: {media_type}")
-        
+        return media_type
+
+    def _token_estimate(self, uploaded_file, prompt: str) -> int:
+        """Input tokens of one request for this file's payload: the optimized image plus the prompt"""
+        report = getattr(uploaded_file, '_optimization_report', None) or {}
+        return report.get('optimized_tokens', 0) + len(prompt) // 4
+
+    def _call_model(self, func, tokens: int):
+        """
+        call_with_retry(func), with the scheduler admitting every attempt
+
+        Each retry is another request against the shared rate limit, so it
+        queues for the buckets like the first one.
+        """
+        if self.scheduler is None:
+            return call_with_retry(func)
+
+        def admitted():
+            self.scheduler.admit(tokens)
+            return func()
+        return call_with_retry(admitted)
+
+    def _request_table_json(self, prompt: str, model: str, base64_image: str, media_type: str, tokens=0) -> str:
+        """Send one prompt + image to Claude and return the raw JSON reply"""
         # Create the message with image
-        message = self.client.messages.create(
-            model='claude-sonnet-4-20250514',
+        request = self._table_request(prompt, model, base64_image, media_type)
+        with span("model.request", model=model, bytes_out=len(base64_image) + len(prompt)) as request_span:
+            message = self._call_model(lambda: self.client.messages.create(**request), tokens)
+            reply = self._reply_json(message)
+            usage = getattr(message, 'usage', None)
+            request_span.set(bytes_in=len(reply), tokens_in=getattr(usage, 'input_tokens', None),
+                             tokens_out=getattr(usage, 'output_tokens', None))
+        return reply
+    
+    def _stream_table_json(self, prompt: str, model: str, base64_image: str, media_type: str, tokens=0):
+        """Send one prompt + image to Claude and yield the JSON reply as it arrives"""
+        request = self._table_request(prompt, model, base64_image, media_type)
+        # Only opening the stream is retried; once text has been handed out a
+        # retry would replay rows the caller has already seen
+        with span("model.stream", model=model, bytes_out=len(base64_image) + len(prompt)) as stream_span:
+            stream = self._call_model(lambda: self.client.messages.stream(**request).__enter__(), tokens)
+            with stream:
+                for event in stream:
+                    if event.type == 'message_start':
+                        stream_span.set(tokens_in=getattr(event.message.usage, 'input_tokens', None))
+                    elif event.type == 'message_delta':
+                        stream_span.set(tokens_out=getattr(event.usage, 'output_tokens', None))
+                    if event.type != 'content_block_delta':
+                        continue
+                    if event.delta.type == 'text_delta':
+                        stream_span.add(bytes_in=len(event.delta.text))
+                        yield event.delta.text
+                    elif event.delta.type == 'input_json_delta':
+                        stream_span.add(bytes_in=len(event.delta.partial_json))
+                        yield event.delta.partial_json
+    
+    def _request_rows(self, prompt: str, model: str, base64_image: str, media_type: str, tokens=0, on_row=None):
+        """
+        Make one extraction call and parse its rows in a single pass
+        
+        tokens is the input-token estimate the scheduler charges per request.
+        
+        Returns:
+            RowStreamParser holding the rows and any problems with the reply
+        """
+        parser = RowStreamParser()
+        if on_row is None:
+            text = self._request_table_json(prompt, model, base64_image, media_type, tokens)
+            with span("ocr.parse", bytes_in=len(text)) as parse_span:
+                parser.feed(text)
+                parse_span.set(rows=len(parser.rows))
+        else:
+            # Parsing is interleaved with the stream, so it is timed as part of model.stream
+            for text in self._stream_table_json(prompt, model, base64_image, media_type, tokens):
+                for row in parser.feed(text):
+                    on_row(row)
+        return parser
+    
+    def parse_reply(self, message):
+        """Parse the rows out of a complete Messages API reply"""
+        parser = RowStreamParser()
+        parser.feed(self._reply_json(message))
+        return parser
+    
+    def _reply_json(self, message) -> str:
+        """
+        The JSON part of a reply: the forced tool call's input, which wraps the
+        rows as {"rows": [...]}, or else the reply text
+        """
+        for block in message.content:
+            if block.type == 'tool_use':
+                return json.dumps(block.input)
+        return ''.join(block.text for block in message.content if block.type == 'text')
+    
+    def _table_request(self, prompt: str, model: str, base64_image: str, media_type: str) -> dict:
+        """Messages API arguments for one table extraction"""
+        request = dict(
+            model=model,
             max_tokens=4000,
             messages=[
                 {
@@ -708,22 +1356,12 @@ class AnthropicOCR:
             ]
         )
         
-        # Extract the JSON content
-        json_content = message.content[0].text
-        return json_content
-    
-
-    
-    def _clean_json_response(self, json_content: str) -> str:
-        """Clean JSON response from Claude"""
-        # Remove markdown code blocks if present
-        json_content = re.sub(r'```json\n?', '', json_content)
-        json_content = re.sub(r'```\n?', '', json_content)
-        
-        # Remove any leading/trailing whitespace
-        json_content = json_content.strip()
-        
-        return json_content
+        # Force the row schema so amounts come back as numbers and dates as YYYY-MM-DD
+        tool = ROW_TOOLS.get(prompt) if EXTRACTION_MODE == "tool" else None
+        if tool is not None:
+            request['tools'] = [tool]
+            request['tool_choice'] = {"type": "tool", "name": tool["name"]}
+        return request
 
     def debug_image_extraction(self, uploaded_file):
         """
@@ -751,33 +1389,13 @@ class AnthropicOCR:
         # Encode the image directly from the uploaded file (no processing)
         base64_image = self.encode_image_from_file(uploaded_file)
         
-        # Determine the correct media type from the file
-        media_type = uploaded_file.type if uploaded_file.type else "image/png"
+        # The payload's own media type; the optimizer may have re-encoded it
+        media_type = self._media_type_for(uploaded_file)
         
         # Create the message with image
-        message = self.client.messages.create(
-            model="claude-sonnet-4-20250514",
-            max_tokens=4000,
-            messages=[
-                {
-                    "role": "user",
-                    "content": [
-                        {
-                            "type": "text",
-                            "text": prompt
-                        },
-                        {
-                            "type": "image",
-                            "source": {
-                                "type": "base64",
-                                "media_type": media_type,
-                                "data": base64_image
-                            }
-                        }
-                    ]
-                }
-            ]
-        )
+        request = self._table_request(prompt, "claude-sonnet-4-20250514", base64_image, media_type)
+        message = self._call_model(lambda: self.client.messages.create(**request),
+                                   self._token_estimate(uploaded_file, prompt))
         
         # Extract the response
         response = message.content[0].text
@@ -788,114 +1406,123 @@ class AnthropicOCR:
 # OCR Processing Functions
 # -------------------------------
 
+class ClaudeBackend:
+    """OCR backend extracting rows with Claude, for any layout"""
+
+    name = "claude"
+    PROMPTS = {'bank': (BANK_PROMPT, BANK_MODEL), 'ssbo': (SSBO_PROMPT, SSBO_MODEL)}
+
+    def complexity(self, uploaded_file) -> dict:
+        """Local complexity estimate of a screenshot, measured once per upload"""
+        artifacts = get_upload_artifacts(uploaded_file)
+        return artifacts.payload('complexity', lambda gray: estimate_complexity(
+            gray, np.asarray(Image.open(io.BytesIO(artifacts.preview)))
+        ))
+
+    def model_for(self, uploaded_file, side) -> str:
+        """Model for the first read of a screenshot"""
+        if not MODEL_ROUTING:
+            return self.PROMPTS[side][1]
+        with span("ocr.route") as route_span:
+            complexity = self.complexity(uploaded_file)
+            model = get_model_router().choose(complexity)
+            route_span.set(model=model, **{f"table_{name}": value for name, value in complexity.items()})
+        return model
+
+    def extract(self, uploaded_file, side, on_row=None) -> list:
+        prompt = self.PROMPTS[side][0]
+        ocr = AnthropicOCR(ANTHROPIC_API_KEY, cache=get_ocr_cache(), scheduler=get_request_scheduler())
+        model = self.model_for(uploaded_file, side)
+        if not MODEL_ROUTING or model == STRONG_MODEL:
+            rows = ocr.extract_rows_tiled(uploaded_file, prompt, model, on_row=on_row)
+        else:
+            rows = self._fast_read(ocr, uploaded_file, side, prompt, model, on_row)
+        if side == 'bank' and BALANCE_VERIFICATION:
+            rows = self.verify_balances(ocr, uploaded_file, rows, prompt)
+        return rows
+
+    def _fast_read(self, ocr, uploaded_file, side, prompt, model, on_row) -> list:
+        # A fast read is held back until it validates, so an escalation
+        # never leaves its rows in a live view
+        rows = ocr.extract_rows_tiled(uploaded_file, prompt, model)
+        problems = validate_rows(rows, side, self.complexity(uploaded_file))
+        if problems:
+            print(f"Escalating {uploaded_file.name} to {STRONG_MODEL}: {'; '.join(problems)}")
+            get_model_router().record_escalation()
+            with span("ocr.escalate", problems=len(problems)):
+                return ocr.extract_rows_tiled(uploaded_file, prompt, STRONG_MODEL, on_row=on_row)
+        if on_row is not None:
+            for row in rows:
+                on_row(row)
+        return rows
+
+    def verify_balances(self, ocr, uploaded_file, rows, prompt) -> list:
+        """
+        Re-read only the bank rows that break the running balance or date order
+        
+        The suspect rows are cropped under the header into one image and read
+        with the strong model; the corrections replace them only if the
+        result verifies better than the original read.
+        """
+        table_rows = get_upload_artifacts(uploaded_file).payload('table_rows', find_table_rows)
+        expected = len(table_rows) - 1 if len(table_rows) >= 2 else None
+        with span("ocr.verify", rows=len(rows)) as verify_span:
+            report = verify_rows(rows, expected)
+            verify_span.set(problems=len(report['problems']), suspects=len(report['suspects']))
+        suspects = report['suspects']
+        if report['problems']:
+            print(f"Verifying {uploaded_file.name}: {'; '.join(report['problems'])}")
+        if not suspects or len(suspects) > len(rows) * REREAD_MAX_SHARE:
+            return rows
+        
+        with span("ocr.reread", rows=len(suspects)):
+            corrected = ocr.extract_rows_subset(uploaded_file, suspects, prompt, STRONG_MODEL)
+        if len(corrected) != len(suspects):
+            print(f"Re-read of {len(suspects)} rows of {uploaded_file.name} returned {len(corrected)}; keeping the original")
+            return rows
+        
+        fixed = list(rows)
+        for index, row in zip(suspects, corrected):
+            fixed[index] = row
+        remaining = verify_rows(fixed, expected)['suspects']
+        if len(remaining) >= len(suspects):
+            print(f"Re-read of {uploaded_file.name} did not verify better; keeping the original")
+            return rows
+        print(f"Re-read {len(suspects)} of {len(rows)} rows of {uploaded_file.name}, {len(remaining)} still suspect")
+        return fixed
+
+# Backends OCR_BACKENDS can name
+OCR_BACKEND_TYPES = {'claude': ClaudeBackend}
+
+def get_ocr_backend(side: str):
+    """Backend configured for this side in OCR_BACKENDS"""
+    names = OCR_BACKENDS.get(side, "claude").split("+")
+    backend = OCR_BACKEND_TYPES[names[-1]]()
+    for name in reversed(names[:-1]):
+        backend = FallbackBackend(OCR_BACKEND_TYPES[name](), backend)
+    return backend
+
 def create_comparison_table(bank_data, ssbo_data):
     """Create a comparison table between bank statement and SSBO deposits"""
-    comparison_rows = []
-    
-    # Helper function to standardize date format
-    def standardize_date(date_str):
-        """Convert various date formats to YYYY-MM-DD"""
-        try:
-            # Handle different date formats
-            if '/' in date_str:
-                # Format: "16/8/2025" -> "2025-08-16"
-                if len(date_str.split('/')) == 3:
-                    parts = date_str.split('/')
-                    if len(parts[2]) == 4:  # Year is 4 digits
-                        day, month, year = parts
-                    else:  # Year is 2 digits
-                        day, month, year = parts
-                        year = '20' + year
-                    return f"{year}-{month.zfill(2)}-{day.zfill(2)}"
-            elif '-' in date_str:
-                # Format: "2025-08-15 22:48:08" -> "2025-08-15"
-                if ' ' in date_str:
-                    return date_str.split(' ')[0]
-                else:
-                    return date_str
-            return date_str
-        except:
-            return date_str
-    
-    # Normalize amount for reliable matching
-    def normalize_amount(value):
-        try:
-            if isinstance(value, str):
-                value = value.replace(',', '').strip()
-            return float(value)
-        except Exception:
-            return value
-    
-    # Normalize transaction type (minimal normalization)
-    def normalize_tx_type(tx):
-        if tx is None:
-            return None
-        return str(tx).strip().lower()
-    
-    # Create a lookup dictionary for SSBO data by standardized date and amount
-    # Use a list to track multiple transactions with same date+amount
-    ssbo_lookup = {}
-    for ssbo_item in ssbo_data:
-        standardized_date = standardize_date(ssbo_item['Event Time'])
-        normalized_amount = normalize_amount(ssbo_item['Amount'])
-        normalized_type = normalize_tx_type(ssbo_item.get('Transaction Type'))
-        key = (standardized_date, normalized_amount, normalized_type)
-        if key not in ssbo_lookup:
-            ssbo_lookup[key] = []
-        ssbo_lookup[key].append(ssbo_item)
-    
-    # Process each bank statement entry
-    for bank_item in bank_data:
-        bank_date = bank_item['Event Time']
-        bank_amount = normalize_amount(bank_item['Amount'])
-        bank_description = bank_item['Description/Remarks']
-        bank_tx_type = normalize_tx_type(bank_item.get('Transaction Type'))
-        bank_tx_display = bank_item.get('Transaction Type') or (bank_tx_type.capitalize() if bank_tx_type else 'Unknown')
-        
-        # Standardize the bank date for comparison
-        standardized_bank_date = standardize_date(bank_date)
-        
-        # Check if there's a matching SSBO entry using standardized dates
-        ssbo_key = (standardized_bank_date, bank_amount, bank_tx_type)
-        if ssbo_key in ssbo_lookup and len(ssbo_lookup[ssbo_key]) > 0:
-            # Get the first available matching SSBO item
-            ssbo_item = ssbo_lookup[ssbo_key].pop(0)  # Remove from available matches
-            status = "Tally"
-            ssbo_remark = ssbo_item['Remark']
-        else:
-            status = "Not Tally"
-            ssbo_remark = "No matching record"
-        
-        comparison_rows.append({
-            'Date_A': bank_date,
-            'Description_A': bank_description,
-            'Type_A': bank_tx_display,
-            'Amount_A': bank_amount,
-            'Date_B': ssbo_item['Event Time'] if status == "Tally" else "No match",
-            'Description_B': ssbo_item['Remark'] if status == "Tally" else "No match",
-            'Type_B': ssbo_item['Transaction Type'] if status == "Tally" else "No match",
-            'Amount_B': ssbo_item['Amount'] if status == "Tally" else "No match",
-            'Status': status
-        })
-    
-    return comparison_rows
-
-def process_bank_statement_with_claude(uploaded_file) -> dict:
-    """Process bank statement image with Claude OCR"""
+    return reconcile_frames(bank_data, ssbo_data).to_dict('records')
+
+def parse_json_rows(json_content: str) -> list:
+    """Parse the JSON array returned by Claude, skipping any malformed rows"""
+    parser = RowStreamParser()
+    parser.feed(json_content)
+    return parser.close()
+
+def process_bank_statement_with_claude(uploaded_file, on_row=None) -> dict:
+    """Process bank statement image with the configured OCR backend (Claude by default)"""
     try:
-        ocr = AnthropicOCR(ANTHROPIC_API_KEY)
+        backend = get_ocr_backend('bank')
         
         # Debug info
-        print(f"Processing bank statement: {uploaded_file.name}, type: {uploaded_file.type}")
+        print(f"Processing bank statement: {uploaded_file.name}, type: {uploaded_file.type}, backend: {backend.name}")
         
-        json_content = ocr.extract_bank_table_as_json(uploaded_file)
-        json_content = ocr._clean_json_response(json_content)
-        
-        # Remove commas from numbers in the JSON string
-        fixed_json = re.sub(r'(\d),(\d)', r'\1\2', json_content)
-        
-        # Parse the JSON
-        json_data = json.loads(fixed_json)
+        with span("extract.bank", backend=backend.name, bytes_in=getattr(uploaded_file, 'size', None)) as side_span:
+            json_data = backend.extract(uploaded_file, 'bank', on_row=on_row)
+            side_span.set(rows=len(json_data))
         
         return {
             'success': True,
@@ -910,22 +1537,17 @@ def process_bank_statement_with_claude(uploaded_file) -> dict:
             'data': None
         }
 
-def process_ssbo_deposits_with_claude(uploaded_file) -> dict:
-    """Process SSBO deposits image with Claude OCR"""
+def process_ssbo_deposits_with_claude(uploaded_file, on_row=None) -> dict:
+    """Process SSBO deposits image with the configured OCR backend (Claude by default)"""
     try:
-        ocr = AnthropicOCR(ANTHROPIC_API_KEY)
+        backend = get_ocr_backend('ssbo')
         
         # Debug info
-        print(f"Processing SSBO deposits: {uploaded_file.name}, type: {uploaded_file.type}")
-        
-        json_content = ocr.extract_table_as_json(uploaded_file)
-        json_content = ocr._clean_json_response(json_content)
+        print(f"Processing SSBO deposits: {uploaded_file.name}, type: {uploaded_file.type}, backend: {backend.name}")
         
-        # Remove commas from numbers in the JSON string
-        fixed_json = re.sub(r'(\d),(\d)', r'\1\2', json_content)
-        
-        # Parse the JSON
-        json_data = json.loads(fixed_json)
+        with span("extract.ssbo", backend=backend.name, bytes_in=getattr(uploaded_file, 'size', None)) as side_span:
+            json_data = backend.extract(uploaded_file, 'ssbo', on_row=on_row)
+            side_span.set(rows=len(json_data))
         
         return {
             'success': True,
@@ -940,6 +1562,201 @@ def process_ssbo_deposits_with_claude(uploaded_file) -> dict:
             'data': None
         }
 
+def process_structured_statement(uploaded_file, parser) -> dict:
+    """Parse a CSV/XLSX/MT940/OFX upload directly, without any model call"""
+    try:
+        print(f"Parsing structured statement: {uploaded_file.name}")
+        with span("extract.structured", parser=parser.__name__, bytes_in=getattr(uploaded_file, 'size', None)) as parse_span:
+            data = parser(uploaded_file)
+            parse_span.set(rows=len(data))
+        return {
+            'success': True,
+            'data': data,
+            'record_count': len(data),
+            'structured': True
+        }
+    except Exception as e:
+        print(f"Error in process_structured_statement: {str(e)}")
+        return {
+            'success': False,
+            'error': str(e),
+            'data': None
+        }
+
+def process_bank_statement(uploaded_file, on_row=None) -> dict:
+    """Process a bank statement upload, parsing structured files and OCR-ing screenshots"""
+    if is_structured_statement(uploaded_file.name):
+        return process_structured_statement(uploaded_file, parse_bank_statement)
+    return process_bank_statement_with_claude(uploaded_file, on_row)
+
+def process_ssbo_deposits(uploaded_file, on_row=None) -> dict:
+    """Process an SSBO upload, parsing CSV/XLSX exports and OCR-ing screenshots"""
+    if is_structured_statement(uploaded_file.name):
+        return process_structured_statement(uploaded_file, parse_ssbo_export)
+    return process_ssbo_deposits_with_claude(uploaded_file, on_row)
+
+def reconcile_with_ledger(bank_files, bank_result, ssbo_files, ssbo_result, tolerance):
+    """
+    Record both uploads in the ledger and reconcile the bank rows against
+    every outstanding SSBO row, including those from earlier uploads
+
+    Returns:
+        Tuple of (comparison table for this bank upload; earlier bank rows
+        that tally now)
+    """
+    ledger = get_ledger()
+    ledger.add_rows('ssbo', ssbo_result['data'], uploads_hash(ssbo_files))
+    bank_ids = ledger.add_rows('bank', bank_result['data'], uploads_hash(bank_files))
+    return ledger.reconcile(bank_ids, **tolerance)
+
+def current_session_id() -> str:
+    """Streamlit session running this script, so the scheduler can queue sessions fairly"""
+    ctx = get_script_run_ctx(suppress_warning=True)
+    return ctx.session_id if ctx is not None else current_session()
+
+def as_uploads(uploaded_files) -> list:
+    """One upload or a list of them, as a list without byte-identical repeats"""
+    if not isinstance(uploaded_files, (list, tuple)):
+        uploaded_files = [uploaded_files]
+    return distinct_uploads(uploaded_files)
+
+def extraction_jobs(bank_files, ssbo_files) -> list:
+    """(side, index, processing function, upload) for every screenshot of both sides"""
+    return [
+        (side, index, func, uploaded_file)
+        for side, func, uploaded_files in (('bank', process_bank_statement, bank_files),
+                                           ('ssbo', process_ssbo_deposits, ssbo_files))
+        for index, uploaded_file in enumerate(as_uploads(uploaded_files))
+    ]
+
+def merge_side_results(results, side) -> dict:
+    """
+    Combine the results of every screenshot of one side into one result
+    
+    Rows repeated by overlapping screenshots are dropped when the overlap is
+    corroborated (see merge_screenshot_rows); the result counts them. A
+    failure on any screenshot fails the side: a statement reconciled with a
+    page missing would report that page's deposits as Not Tally. The side's
+    rows are parsed once into a TransactionTable here; matching, the ledger,
+    display and the run store all work from it.
+    
+    Args:
+        results: (file name, result dict) per screenshot, in upload order
+        side: 'bank' or 'ssbo'
+    """
+    if len(results) == 1:
+        result = results[0][1]
+        if not result['success']:
+            return result
+        with span("extract.table", side=side) as table_span:
+            data = as_transactions(result['data'], side)
+            table_span.set(rows=len(data), bytes_out=data.nbytes)
+        return {**result, 'data': data}
+    
+    errors = [f"{name}: {result['error']}" for name, result in results if not result['success']]
+    if errors:
+        return {
+            'success': False,
+            'error': "; ".join(errors),
+            'data': None
+        }
+    
+    pages = [result['data'].to_dict('records') if isinstance(result['data'], pd.DataFrame) else result['data']
+             for _, result in results]
+    with span("extract.merge", screenshots=len(pages), rows_in=sum(len(rows) for rows in pages)) as merge_span:
+        rows, overlap = merge_screenshot_rows(pages)
+        data = TransactionTable.from_rows(rows, side)
+        merge_span.set(rows=len(data), bytes_out=data.nbytes, **{f"overlap_{k}": v for k, v in overlap.items()})
+    print(f"Merged {len(pages)} {side} screenshots: {overlap['dropped']} overlapping rows dropped, "
+          f"{overlap['unconfirmed']} possible repeats kept")
+    return {
+        'success': True,
+        'data': data,
+        'record_count': len(data),
+        'screenshots': len(pages),
+        'overlap_dropped': overlap['dropped'],
+        'overlap_unconfirmed': overlap['unconfirmed']
+    }
+
+def process_statements_concurrently(bank_files, ssbo_files, max_workers=EXTRACTION_MAX_WORKERS):
+    """
+    Run every bank and SSBO extraction concurrently instead of back-to-back
+    
+    Each side may be one upload or a list of screenshots; all of them are
+    extracted at once, so several screenshots take about as long as one.
+    Each screenshot gets its own result dict, so a failure on one side never
+    hides the other side's result.
+    
+    Returns:
+        Tuple of (bank_result, ssbo_result)
+    """
+    jobs = extraction_jobs(bank_files, ssbo_files)
+    
+    results = {'bank': [], 'ssbo': []}
+    session = current_session_id()
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='ocr') as executor:
+        futures = [(side, uploaded_file, executor.submit(bind_session(bind_trace(func), session), uploaded_file))
+                   for side, _, func, uploaded_file in jobs]
+        for side, uploaded_file, future in futures:
+            try:
+                result = future.result()
+            except Exception as e:
+                print(f"Error in process_statements_concurrently ({side}): {str(e)}")
+                result = {
+                    'success': False,
+                    'error': str(e),
+                    'data': None
+                }
+            results[side].append((uploaded_file.name, result))
+    
+    return merge_side_results(results['bank'], 'bank'), merge_side_results(results['ssbo'], 'ssbo')
+
+def stream_statements(bank_files, ssbo_files, max_workers=EXTRACTION_MAX_WORKERS):
+    """
+    Run all extractions concurrently, streaming rows back as they decode
+    
+    Streamlit elements can only be updated from the script thread, so the
+    workers push events onto a queue and this generator hands them to the
+    caller, which redraws its placeholders. Rows of overlapping screenshots
+    are streamed as read; the side's final result has the repeats removed.
+    
+    Yields:
+        ('row', side, row_dict) for every decoded row, then
+        ('done', side, result_dict) once every screenshot of a side has
+        finished, its 'data' a TransactionTable; side is 'bank' or 'ssbo'
+    """
+    jobs = extraction_jobs(bank_files, ssbo_files)
+    events = queue.Queue()
+    
+    def run(side, index, func, uploaded_file):
+        try:
+            result = func(uploaded_file, lambda row: events.put(('row', side, row)))
+        except Exception as e:
+            print(f"Error in stream_statements ({side}): {str(e)}")
+            result = {
+                'success': False,
+                'error': str(e),
+                'data': None
+            }
+        events.put(('file', side, (index, uploaded_file.name, result)))
+    
+    pending = {'bank': 0, 'ssbo': 0}
+    finished = {'bank': [], 'ssbo': []}
+    session = current_session_id()
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='ocr') as executor:
+        for side, index, func, uploaded_file in jobs:
+            pending[side] += 1
+            executor.submit(bind_session(bind_trace(run), session), side, index, func, uploaded_file)
+        while any(pending.values()):
+            kind, side, payload = events.get()
+            if kind == 'row':
+                yield kind, side, payload
+                continue
+            finished[side].append(payload)
+            pending[side] -= 1
+            if not pending[side]:
+                yield 'done', side, merge_side_results([(name, result) for _, name, result in sorted(
+                    finished[side], key=lambda entry: entry[0])], side)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,167 @@
+"""
+Running-balance verification of extracted bank rows
+
+A bank statement's balance column ties every row to the one before it:
+balance = previous balance + deposit - transfer. One misread amount breaks
+the link into its row; one misread balance breaks the links on both sides
+of its row. verify_rows blames rows from the broken links, from dates out of
+chronological order and from unparsable values, so only those rows need to
+be read again. Indices only point at screenshot rows when the read has as
+many rows as the table, so a row count that disagrees is reported without
+suspects.
+"""
+import bisect
+from datetime import date
+
+from reconcile_engine import normalize_amount, standardize_date
+
+BALANCE_KEY = 'Balance'
+
+# Below this share of rows with a readable balance the statement is treated as having none
+MIN_BALANCE_SHARE = 0.5
+# Below this share of intact links the balances follow some other convention; don't blame rows
+MIN_INTACT_LINKS = 0.5
+# Above this share of rows out of date order the table isn't sorted by date; don't blame rows
+MAX_LATE_SHARE = 0.2
+
+
+def _cents(value):
+    """Integer cents of an amount, None when it doesn't parse"""
+    if value is None or value == "":
+        return None
+    amount = normalize_amount(value)
+    if not isinstance(amount, float) or amount != amount or abs(amount) == float('inf'):
+        return None
+    return round(amount * 100)
+
+
+def _day(value):
+    """Ordinal day of a date, None when it doesn't parse"""
+    try:
+        return date.fromisoformat(standardize_date(str(value))).toordinal()
+    except (TypeError, ValueError):
+        return None
+
+
+def _signed_cents(row):
+    cents = _cents(row.get('Amount'))
+    if cents is None:
+        return None
+    return abs(cents) if str(row.get('Transaction Type', '')).strip().lower() == 'deposit' else -abs(cents)
+
+
+def _broken_links(balances, amounts):
+    """
+    Links k (row k-1 to row k, oldest first) whose balances don't add up
+
+    Returns:
+        Tuple of (broken link indices, number of links that could be checked)
+    """
+    broken, checked = [], 0
+    for k in range(1, len(balances)):
+        if balances[k - 1] is None or balances[k] is None or amounts[k] is None:
+            continue
+        checked += 1
+        if balances[k - 1] + amounts[k] != balances[k]:
+            broken.append(k)
+    return broken, checked
+
+
+def _blame_links(broken):
+    """
+    Rows to blame for broken links, oldest first
+
+    A lone broken link k points at row k's amount; a run of broken links
+    k..m points at the balances of rows k..m-1 between them. The first row's
+    balance has no link before it, so a lone broken first link blames both
+    of its rows.
+    """
+    rows, run = [], []
+    for k in broken + [None]:
+        if run and (k is None or k != run[-1] + 1):
+            if run == [1]:
+                rows.extend([0, 1])
+            else:
+                rows.extend(run if len(run) == 1 else run[:-1])
+            run = []
+        if k is not None:
+            run.append(k)
+    return rows
+
+
+def _out_of_order(days):
+    """Indices outside the longest non-decreasing run of days (None days are skipped)"""
+    tails, tail_index, previous = [], [], {}
+    for i, day in enumerate(days):
+        if day is None:
+            continue
+        position = bisect.bisect_right(tails, day)
+        previous[i] = tail_index[position - 1] if position else None
+        if position == len(tails):
+            tails.append(day)
+            tail_index.append(i)
+        else:
+            tails[position] = day
+            tail_index[position] = i
+    kept = set()
+    i = tail_index[-1] if tail_index else None
+    while i is not None:
+        kept.add(i)
+        i = previous[i]
+    return [i for i, day in enumerate(days) if day is not None and i not in kept]
+
+
+def verify_rows(rows: list, expected_rows=None) -> dict:
+    """
+    Check extracted bank rows for balance continuity, date order and row count
+
+    Statements list rows oldest or newest first; the order in which more
+    balance links (or, without balances, more dates) agree is taken.
+
+    Args:
+        rows: Extracted bank rows, in screenshot order
+        expected_rows: Data rows seen in the screenshot, if known
+
+    Returns:
+        Dict with 'suspects' (sorted row indices to read again) and
+        'problems' (human-readable findings)
+    """
+    problems, suspects = [], set()
+    if expected_rows is not None and len(rows) != expected_rows:
+        problems.append(f"{len(rows)} rows read, {expected_rows} in the table")
+        return {'suspects': [], 'problems': problems}
+
+    n = len(rows)
+    balances = [_cents(row.get(BALANCE_KEY)) for row in rows]
+    amounts = [_signed_cents(row) for row in rows]
+    days = [_day(row.get('Event Time')) for row in rows]
+    unreadable = [i for i in range(n) if amounts[i] is None or days[i] is None]
+    if unreadable:
+        problems.append(f"{len(unreadable)} rows with an unreadable date or amount")
+        suspects.update(unreadable)
+
+    # Oldest first is order 1, newest first -1
+    order = None
+    if n >= 2 and sum(balance is not None for balance in balances) >= n * MIN_BALANCE_SHARE:
+        oldest_first = _broken_links(balances, amounts)
+        newest_first = _broken_links(balances[::-1], amounts[::-1])
+        order = 1 if len(oldest_first[0]) <= len(newest_first[0]) else -1
+        broken, checked = oldest_first if order == 1 else newest_first
+        if checked and len(broken) <= (1 - MIN_INTACT_LINKS) * checked:
+            blamed = [k if order == 1 else n - 1 - k for k in _blame_links(broken)]
+            blamed += [i for i in range(n) if balances[i] is None]
+            if blamed:
+                problems.append(f"balance continuity broken at {len(broken)} of {checked} links")
+            suspects.update(blamed)
+        elif checked:
+            problems.append(f"balances don't follow the amounts ({len(broken)} of {checked} links broken)")
+
+    if order is None:
+        ascending = len(_out_of_order(days))
+        order = 1 if ascending <= len(_out_of_order(days[::-1])) else -1
+    late = _out_of_order(days if order == 1 else days[::-1])
+    if late and len(late) <= n * MAX_LATE_SHARE:
+        problems.append(f"{len(late)} rows out of date order")
+        suspects.update(i if order == 1 else n - 1 - i for i in late)
+
+    return {'suspects': sorted(suspects), 'problems': problems}
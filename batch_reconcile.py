@@ -0,0 +1,335 @@
+"""
+Headless batch reconciliation
+
+Reconciles every bank/SSBO pair found in a directory without the Streamlit
+UI. Files are paired by name: the word ``bank`` or ``ssbo`` in the file
+name marks the side, and the rest of the name is the pair key, so
+``2025-08-01_bank.png`` and ``2025-08-01_ssbo.png`` form pair
+``2025-08-01``. Screenshots go through the same OCR path as the app, and
+CSV/XLSX/MT940/OFX exports through the structured parsers.
+
+With --message-batches the screenshots are OCR'd through the Message Batches
+API first (cheaper, slower); rerun the same command to resume if it is
+interrupted or stops at --max-wait.
+
+Usage:
+    python batch_reconcile.py statements/ --output results/ --workers 4 --format parquet
+    python batch_reconcile.py statements/ --output results/ --message-batches --max-wait 3600
+"""
+import argparse
+import mimetypes
+import os
+import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import pandas as pd
+
+import app
+from message_batches import POLL_INTERVAL_SECONDS, run_message_batches
+from ocr_cache import get_ocr_cache
+from reconcile_engine import reconcile_frames
+from statement_parsers import BANK_EXTENSIONS, SSBO_EXTENSIONS, is_structured_statement
+from table_tiling import InMemoryUpload
+
+DEFAULT_WORKERS = 4
+DEFAULT_RETRIES = 2
+RETRY_BACKOFF_SECONDS = 2.0
+OUTPUT_FORMATS = ("csv", "parquet")
+COMBINED_NAME = "combined"
+BATCH_STATE_NAME = ".message_batches.json"
+# Exit status when message batches are still running; rerun to resume
+EXIT_PENDING = 75
+
+SIDE_PATTERN = re.compile(r"(?:^|(?<=[\s._-]))(bank|ssbo)(?=$|[\s._-])", re.IGNORECASE)
+ACCEPTED_EXTENSIONS = {
+    "bank": {f".{ext}" for ext in app.IMAGE_UPLOAD_TYPES} | set(BANK_EXTENSIONS),
+    "ssbo": {f".{ext}" for ext in app.IMAGE_UPLOAD_TYPES} | set(SSBO_EXTENSIONS),
+}
+
+
+def pair_key(file_name):
+    """
+    Split a file name into (side, key), or None if it names no side
+
+    ``Aug-01 Bank.PNG`` -> ("bank", "aug-01")
+    """
+    stem, ext = os.path.splitext(file_name)
+    match = SIDE_PATTERN.search(stem)
+    if not match:
+        return None
+    side = match.group(1).lower()
+    if ext.lower() not in ACCEPTED_EXTENSIONS[side]:
+        return None
+    key = (stem[:match.start()] + " " + stem[match.end():]).strip(" ._-")
+    key = re.sub(r"[\s._-]+", "-", key).lower()
+    return side, key or "statement"
+
+
+def find_pairs(directory):
+    """
+    Pair up bank and SSBO files in a directory
+
+    Returns:
+        Tuple of (pairs, problems): pairs is a sorted list of
+        (key, bank_path, ssbo_path); problems lists files that could not be
+        paired, so the caller can report them instead of silently skipping
+    """
+    sides = {}
+    problems = []
+    for entry in sorted(os.listdir(directory)):
+        path = os.path.join(directory, entry)
+        if not os.path.isfile(path):
+            continue
+        parsed = pair_key(entry)
+        if parsed is None:
+            continue
+        side, key = parsed
+        slot = sides.setdefault(key, {})
+        if side in slot:
+            problems.append(f"{entry}: duplicate {side} file for pair '{key}' (keeping {os.path.basename(slot[side])})")
+            continue
+        slot[side] = path
+
+    pairs = []
+    for key in sorted(sides):
+        slot = sides[key]
+        if "bank" in slot and "ssbo" in slot:
+            pairs.append((key, slot["bank"], slot["ssbo"]))
+        else:
+            missing = "ssbo" if "bank" in slot else "bank"
+            problems.append(f"{os.path.basename(next(iter(slot.values())))}: no {missing} file for pair '{key}'")
+    return pairs, problems
+
+
+def load_upload(path):
+    """Read a file into an UploadedFile look-alike"""
+    with open(path, "rb") as handle:
+        data = handle.read()
+    media_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+    return InMemoryUpload(data, name=os.path.basename(path), type=media_type)
+
+
+def extract_pair(bank_path, ssbo_path, retries=DEFAULT_RETRIES, backoff=RETRY_BACKOFF_SECONDS):
+    """
+    Extract both sides of a pair, retrying only the side that failed
+
+    Returns:
+        Tuple of (bank_result, ssbo_result, attempts)
+    """
+    bank_result, ssbo_result = app.process_statements_concurrently(load_upload(bank_path), load_upload(ssbo_path))
+    attempts = 1
+    while attempts <= retries and not (bank_result['success'] and ssbo_result['success']):
+        time.sleep(backoff * 2 ** (attempts - 1))
+        attempts += 1
+        if not bank_result['success']:
+            bank_result = app.process_bank_statement(load_upload(bank_path))
+        if not ssbo_result['success']:
+            ssbo_result = app.process_ssbo_deposits(load_upload(ssbo_path))
+    return bank_result, ssbo_result, attempts
+
+
+def reconcile_pair(key, bank_path, ssbo_path, retries=DEFAULT_RETRIES, backoff=RETRY_BACKOFF_SECONDS, **tolerance):
+    """
+    Extract and reconcile one pair
+
+    Returns:
+        Dict with key, success, attempts, elapsed seconds, and either the
+        comparison DataFrame or an error message
+    """
+    start = time.perf_counter()
+    bank_result, ssbo_result, attempts = extract_pair(bank_path, ssbo_path, retries, backoff)
+    result = {'key': key, 'attempts': attempts}
+    if bank_result['success'] and ssbo_result['success']:
+        result['success'] = True
+        result['comparison'] = reconcile_frames(bank_result['data'], ssbo_result['data'], **tolerance)
+    else:
+        errors = [f"{side}: {res['error']}" for side, res in (('bank', bank_result), ('ssbo', ssbo_result))
+                  if not res['success']]
+        result['success'] = False
+        result['error'] = "; ".join(errors)
+    result['elapsed'] = time.perf_counter() - start
+    return result
+
+
+def prefetch_with_message_batches(pairs, output_dir, poll_interval=POLL_INTERVAL_SECONDS, max_wait=None,
+                                  log=print):
+    """
+    OCR every screenshot in the pairs through Message Batches, into the OCR cache
+
+    Batch ids are tracked in ``<output_dir>/.message_batches.json`` so a
+    rerun resumes them. Requests that fail inside a batch are left out of
+    the cache and fall back to a regular call when the pair is reconciled.
+    Only sides whose OCR_BACKENDS entry is "claude" are prefetched: another
+    backend never calls Claude, and a chain with Claude as the fallback only
+    does when the first engine gives up, so batch results for them would
+    mostly go unused.
+    """
+    backend = app.ClaudeBackend()
+    jobs = []
+    for key, bank_path, ssbo_path in pairs:
+        for path, side in ((bank_path, 'bank'), (ssbo_path, 'ssbo')):
+            if is_structured_statement(path) or app.OCR_BACKENDS.get(side, "claude") != "claude":
+                continue
+            upload = load_upload(path)
+            # The first read's model; an escalation is a direct call at reconcile time
+            jobs.append((upload, backend.PROMPTS[side][0], backend.model_for(upload, side)))
+
+    ocr = app.AnthropicOCR(app.ANTHROPIC_API_KEY)
+    summary = run_message_batches(
+        ocr, jobs, get_ocr_cache(), os.path.join(output_dir, BATCH_STATE_NAME),
+        poll_interval=poll_interval, max_wait=max_wait, log=log,
+    )
+    for custom_id, reason in summary['errors'].items():
+        log(f"batch request {custom_id[:12]} failed ({reason}); it will be retried directly")
+    return summary
+
+
+def write_frame(frame, path_stem, fmt):
+    """Write a comparison table as CSV or Parquet and return the file path"""
+    path = f"{path_stem}.{fmt}"
+    if fmt == "parquet":
+        # 'No match' placeholders sit next to numbers in the amount columns;
+        # Parquet needs one type per column. The nullable string dtype keeps
+        # missing values null instead of writing "None"
+        frame = frame.copy()
+        for column in frame.columns[frame.dtypes == object]:
+            frame[column] = frame[column].astype("string")
+        frame.to_parquet(path, index=False)
+    else:
+        frame.to_csv(path, index=False)
+    return path
+
+
+def run_batch(directory, output_dir, fmt="csv", workers=DEFAULT_WORKERS, retries=DEFAULT_RETRIES,
+              backoff=RETRY_BACKOFF_SECONDS, date_window_days=0, amount_tolerance=0.0, amount_tolerance_pct=0.0,
+              message_batches=False, poll_interval=POLL_INTERVAL_SECONDS, max_wait=None, log=print):
+    """
+    Reconcile every pair in a directory with a bounded worker pool
+
+    Each finished pair is written to ``<output_dir>/<key>.<fmt>`` as soon as
+    it completes; the combined table of all successful pairs, with a leading
+    ``Pair`` column, goes to ``<output_dir>/combined.<fmt>``.
+
+    With message_batches, screenshots are first OCR'd through
+    prefetch_with_message_batches. If batches are still running after
+    max_wait seconds, nothing is reconciled and the summary lists them under
+    pending_batches.
+
+    Returns:
+        Summary dict with pair counts, failures, elapsed seconds,
+        pairs_per_minute and pending_batches
+    """
+    if fmt not in OUTPUT_FORMATS:
+        raise ValueError(f"Unsupported output format '{fmt}', expected one of {OUTPUT_FORMATS}")
+
+    pairs, problems = find_pairs(directory)
+    for problem in problems:
+        log(f"skipped {problem}")
+    os.makedirs(output_dir, exist_ok=True)
+
+    tolerance = {
+        'date_window_days': date_window_days,
+        'amount_tolerance': amount_tolerance,
+        'amount_tolerance_pct': amount_tolerance_pct,
+    }
+    start = time.perf_counter()
+    comparisons = {}
+    failures = {}
+    if message_batches and pairs:
+        batches = prefetch_with_message_batches(pairs, output_dir, poll_interval, max_wait, log)
+        if batches['pending']:
+            log(f"{len(batches['pending'])} message batch(es) still running; rerun the same command to resume")
+            return {
+                'pairs': len(pairs),
+                'succeeded': 0,
+                'failed': {},
+                'skipped': problems,
+                'elapsed': time.perf_counter() - start,
+                'pairs_per_minute': 0.0,
+                'pending_batches': batches['pending'],
+            }
+
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='pair') as executor:
+        futures = [executor.submit(reconcile_pair, key, bank, ssbo, retries, backoff, **tolerance)
+                   for key, bank, ssbo in pairs]
+        for done, future in enumerate(as_completed(futures), 1):
+            result = future.result()
+            key = result['key']
+            if result['success']:
+                comparison = result['comparison']
+                comparisons[key] = comparison
+                write_frame(comparison, os.path.join(output_dir, key), fmt)
+                tally = comparison['Status'].str.startswith('Tally').sum()
+                log(f"[{done}/{len(pairs)}] {key}: {tally}/{len(comparison)} tally "
+                    f"({result['elapsed']:.1f}s, {result['attempts']} attempt(s))")
+            else:
+                failures[key] = result['error']
+                log(f"[{done}/{len(pairs)}] {key}: FAILED after {result['attempts']} attempt(s): {result['error']}")
+
+    if comparisons:
+        combined = pd.concat(
+            [frame.assign(Pair=key) for key, frame in sorted(comparisons.items())], ignore_index=True
+        )
+        combined = combined[['Pair'] + [c for c in combined.columns if c != 'Pair']]
+        write_frame(combined, os.path.join(output_dir, COMBINED_NAME), fmt)
+
+    elapsed = time.perf_counter() - start
+    return {
+        'pairs': len(pairs),
+        'succeeded': len(comparisons),
+        'failed': failures,
+        'skipped': problems,
+        'elapsed': elapsed,
+        'pairs_per_minute': len(pairs) / elapsed * 60 if elapsed > 0 else 0.0,
+        'pending_batches': [],
+    }
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Reconcile a directory of bank/SSBO statement pairs")
+    parser.add_argument("directory", help="folder holding *bank* and *ssbo* files that share a pair key")
+    parser.add_argument("-o", "--output", default="reconciliation_output", help="folder for the result tables")
+    parser.add_argument("-f", "--format", choices=OUTPUT_FORMATS, default="csv")
+    parser.add_argument("-w", "--workers", type=int, default=DEFAULT_WORKERS, help="pairs processed at once")
+    parser.add_argument("-r", "--retries", type=int, default=DEFAULT_RETRIES, help="extra attempts per failed side")
+    parser.add_argument("--backoff", type=float, default=RETRY_BACKOFF_SECONDS,
+                        help="seconds before the first retry, doubled for each further one")
+    parser.add_argument("--date-window", type=int, default=0, help="match dates up to N days apart")
+    tolerance = parser.add_mutually_exclusive_group()
+    tolerance.add_argument("--amount-tolerance", type=float, default=0.0, help="absolute amount tolerance")
+    tolerance.add_argument("--amount-tolerance-pct", type=float, default=0.0, help="amount tolerance in percent")
+    parser.add_argument("--message-batches", action="store_true",
+                        help="OCR screenshots through the Message Batches API (cheaper, not interactive)")
+    parser.add_argument("--poll-interval", type=float, default=POLL_INTERVAL_SECONDS,
+                        help="seconds between message batch status checks")
+    parser.add_argument("--max-wait", type=float, default=None,
+                        help=f"stop waiting for message batches after N seconds (exit {EXIT_PENDING}; rerun to resume)")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if not os.path.isdir(args.directory):
+        print(f"Not a directory: {args.directory}", file=sys.stderr)
+        return 2
+    if not app.ANTHROPIC_API_KEY:
+        print("Warning: ANTHROPIC_API_KEY is not set; screenshot pairs will fail", file=sys.stderr)
+
+    summary = run_batch(
+        args.directory, args.output, fmt=args.format, workers=args.workers, retries=args.retries,
+        backoff=args.backoff, date_window_days=args.date_window, amount_tolerance=args.amount_tolerance,
+        amount_tolerance_pct=args.amount_tolerance_pct, message_batches=args.message_batches,
+        poll_interval=args.poll_interval, max_wait=args.max_wait,
+    )
+    if summary['pending_batches']:
+        print(f"Message batches still running: {', '.join(summary['pending_batches'])}")
+        return EXIT_PENDING
+    print(f"{summary['succeeded']}/{summary['pairs']} pairs reconciled in {summary['elapsed']:.1f}s "
+          f"({summary['pairs_per_minute']:.1f} pairs/min), results in {args.output}")
+    return 1 if summary['failed'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
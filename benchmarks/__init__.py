@@ -0,0 +1,6 @@
+"""Benchmarks for the reconciliation pipeline.
+
+Run individual benchmarks as modules from the repository root, e.g.
+``python -m benchmarks.bench_concurrent_extraction``. None of them talk to
+the real Anthropic API; they point the client at ``stub_server``.
+"""
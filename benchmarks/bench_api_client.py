@@ -0,0 +1,86 @@
+"""Shared pooled client with retries against a throttling stub.
+
+The stub rejects a share of requests with 429 (with retry-after) or 529.
+Compares the old per-call client (new connection each time, no retries)
+with the shared client: success rate, retries and connection reuse.
+
+Usage: python -m benchmarks.bench_api_client [--calls 24] [--workers 4] [--throttle 0.3]
+"""
+import argparse
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import anthropic
+
+from benchmarks.common import load_app
+from benchmarks.stub_server import StubAnthropicServer
+
+REQUEST = {"model": "stub", "max_tokens": 16, "messages": [{"role": "user", "content": "ping"}]}
+
+
+def make_throttle(rate, seed=0):
+    rng = random.Random(seed)
+    lock = threading.Lock()
+
+    def throttle(number, payload):
+        with lock:
+            roll = rng.random()
+        if roll < rate / 2:
+            return 429, 0.2
+        if roll < rate:
+            return 529, None
+        return None
+    return throttle
+
+
+def run(label, call, calls, workers):
+    def one(_):
+        try:
+            call()
+            return True
+        except anthropic.APIError:
+            return False
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        ok = sum(executor.map(one, range(calls)))
+    print(f"{label:<10} {ok}/{calls} succeeded in {time.perf_counter() - start:.2f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=24)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--throttle", type=float, default=0.3, help="share of requests rejected")
+    parser.add_argument("--latency", type=float, default=0.05)
+    args = parser.parse_args()
+
+    with StubAnthropicServer(latency=args.latency, throttle=make_throttle(args.throttle)) as stub:
+        app = load_app(stub.url)
+        import api_client
+        api_client.BACKOFF_BASE_SECONDS = 0.1
+
+        def per_call_client():
+            client = anthropic.Anthropic(api_key="stub-key", max_retries=0)
+            try:
+                client.messages.create(**REQUEST)
+            finally:
+                client.close()
+
+        run("per-call", per_call_client, args.calls, args.workers)
+        before = stub.request_count
+
+        client = api_client.get_api_client(app.ANTHROPIC_API_KEY)
+        run("shared", lambda: api_client.call_with_retry(lambda: client.messages.create(**REQUEST)),
+            args.calls, args.workers)
+
+    stats = api_client.get_api_metrics().stats()
+    print(f"shared client: {stub.request_count - before} HTTP requests, {stats['retries']} retries, "
+          f"{stats['throttled']} throttled, {stats['connections_opened']} connections opened, "
+          f"{stats['connections_reused']} reused")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""Fixing a misread bank row: re-reading the whole screenshot vs only the suspect rows.
+
+Bank transactions (benchmarks.datasets) in date order get a running balance
+and are cut into --page-rows row screenshots. The stub answers every request
+with the rows its image shows, found by the text of each row, after
+--base + --per-row seconds for each row it has to read. The first full read of
+--misread-rate of the screenshots gets one row wrong: its amount, its balance
+or its date. Later reads are right.
+
+- none:      no verification; misreads stay in the result
+- full:      verify_rows on the result, then the whole screenshot again when it
+             finds a problem (what a user could do before)
+- targeted:  BALANCE_VERIFICATION; only the suspect rows are read again
+
+Cost is estimated from the tokens of every call (image tokens as the
+optimizer counts them, prompt and reply at four characters a token) at
+--prices dollars per million input and output tokens. Routing is off, so
+every read is on the bank model.
+
+Usage: python -m benchmarks.bench_balance_verification [--screenshots 20] [--misread-rate 0.3]
+"""
+import argparse
+import contextlib
+import hashlib
+import io
+import json
+import os
+import random
+import threading
+import time
+
+import numpy as np
+from PIL import Image
+
+from balance_verifier import verify_rows
+from benchmarks.common import SampleUpload, load_app, render_table_image
+from benchmarks.datasets import BANK_HEADER, bank_cells, generate_transactions
+from benchmarks.stub_server import StubAnthropicServer, request_image_bytes
+from reconcile_engine import standardize_date
+from table_tiling import row_fingerprint
+
+MISREADS = ("amount", "balance", "date")
+
+
+def with_balances(rows, opening=500000):
+    """Sort rows by date and add the running balance after each"""
+    rows = sorted(rows, key=lambda row: standardize_date(row["Event Time"]))
+    balance = opening
+    for row in rows:
+        cents = round(float(row["Amount"].replace(",", "")) * 100)
+        balance += cents if row["Transaction Type"] == "Deposit" else -cents
+        row["Balance"] = f"{balance / 100:,.2f}"
+    return rows
+
+
+def strips(gray):
+    """
+    Keys of the data rows an image shows, from the pixels of their text lines
+
+    Crops of a row or two are too short for find_table_rows to split, and
+    their cut boundaries differ from the full screenshot's, so each row is
+    identified by its run of text pixel rows instead.
+    """
+    ink = np.count_nonzero(gray < 200, axis=1)
+    text = (ink > 0) & (ink < gray.shape[1] * 0.5)
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], text.astype(np.int8), [0]))))
+    blocks = [gray[start:end] for start, end in zip(edges[::2], edges[1::2])]
+    return [hashlib.sha256(block.tobytes()).digest() for block in blocks[1:]]
+
+
+def misread(row, kind, rng):
+    row = dict(row)
+    if kind == "date":
+        year, month, _ = standardize_date(row["Event Time"]).split("-")
+        row["Event Time"] = f"{rng.choice([27, 28])}/{int(month)}/{year}"
+    else:
+        key = "Amount" if kind == "amount" else "Balance"
+        value = float(row[key].replace(",", ""))
+        row[key] = f"{value + rng.choice([-9, 9, 90]):,.2f}"
+    return row
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--screenshots", type=int, default=20)
+    parser.add_argument("--page-rows", type=int, default=12, help="table rows per screenshot")
+    parser.add_argument("--misread-rate", type=float, default=0.3, help="share of screenshots read wrong first")
+    parser.add_argument("--base", type=float, default=0.5, help="stub seconds per call")
+    parser.add_argument("--per-row", type=float, default=0.08, help="stub seconds per row read")
+    parser.add_argument("--prices", type=float, nargs=2, default=[3.0, 15.0], metavar=("IN", "OUT"))
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    os.environ.setdefault("ANTHROPIC_REQUESTS_PER_MINUTE", "100000")
+    os.environ.setdefault("ANTHROPIC_INPUT_TOKENS_PER_MINUTE", "100000000")
+    bank, _, _ = generate_transactions(args.screenshots * args.page_rows, seed=args.seed)
+    rows = with_balances(bank)
+    cells = [cell + [row["Balance"]] for cell, row in zip(bank_cells(rows), rows)]
+    pages, by_key = [], {}
+    for i in range(args.screenshots):
+        start = i * args.page_rows
+        image = render_table_image(BANK_HEADER + ["Balance"], cells[start:start + args.page_rows])
+        page_rows = rows[start:start + args.page_rows]
+        keys = strips(np.asarray(Image.open(io.BytesIO(image)).convert("L")))
+        assert len(keys) == len(page_rows) and len(set(keys)) == len(keys)
+        by_key.update((key, (i, j)) for j, key in enumerate(keys))
+        pages.append((SampleUpload(image, f"bank{i}.png"), page_rows))
+
+    flawed, ledger, lock = set(), [], threading.Lock()
+
+    def read(payload):
+        image = Image.open(io.BytesIO(request_image_bytes(payload)))
+        return image, [by_key[key] for key in strips(np.asarray(image.convert("L")))]
+
+    def respond(payload):
+        image, shown = read(payload)
+        reply = [pages[page][1][j] for page, j in shown]
+        page = shown[0][0]
+        rng = random.Random(args.seed * 1000 + page)
+        with lock:
+            first = len(shown) == len(pages[page][1]) and page not in flawed
+            if first:
+                flawed.add(page)
+        if first and rng.random() < args.misread_rate:
+            j = rng.randrange(len(reply))
+            reply[j] = misread(reply[j], rng.choice(MISREADS), rng)
+        text = json.dumps(reply)
+        prompt = sum(len(block.get("text", "")) for block in payload["messages"][0]["content"]) // 4
+        with lock:
+            ledger.append((image.width * image.height // 750 + prompt, len(text) // 4, len(shown)))
+        return text
+
+    with StubAnthropicServer(latency=lambda payload: args.base + args.per_row * len(read(payload)[1]),
+                             responder=respond) as stub:
+        app = load_app(stub.url)
+        app.MODEL_ROUTING = False
+        backend = app.ClaudeBackend()
+
+        def run(label):
+            app.BALANCE_VERIFICATION = label == "targeted"
+            app.get_ocr_cache().clear()
+            flawed.clear()
+            ledger.clear()
+            exact, start = 0, time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                for upload, truth in pages:
+                    result = backend.extract(upload, 'bank')
+                    if label == "full" and verify_rows(result, len(truth))['problems']:
+                        uncached = app.AnthropicOCR(app.ANTHROPIC_API_KEY)
+                        result = uncached.extract_rows_tiled(upload, app.BANK_PROMPT, app.BANK_MODEL)
+                    exact += [row_fingerprint(row) for row in result] == [row_fingerprint(row) for row in truth]
+            seconds = time.perf_counter() - start
+            cost = sum(tokens_in * args.prices[0] + tokens_out * args.prices[1]
+                       for tokens_in, tokens_out, _ in ledger) / 1e6
+            return seconds, len(ledger), sum(entry[2] for entry in ledger), cost, exact
+
+        results = {label: run(label) for label in ("none", "full", "targeted")}
+
+    misread_pages = sum(random.Random(args.seed * 1000 + page).random() < args.misread_rate for page in range(len(pages)))
+    print(f"{len(pages)} screenshots of {args.page_rows} rows, {misread_pages} misread on the first read; "
+          f"stub {args.base:.2f}s + {args.per_row:.2f}s per row")
+    base_seconds, _, _, base_cost, _ = results["none"]
+    print(f"{'mode':<9} {'time':>8} {'calls':>6} {'rows read':>10} {'cost $':>8} {'exact':>6} "
+          f"{'fix time':>9} {'fix cost':>9}")
+    for label, (seconds, calls, rows_read, cost, exact) in results.items():
+        print(f"{label:<9} {seconds:>7.2f}s {calls:>6} {rows_read:>10} {cost:>8.4f} {exact:>3}/{len(pages):<2} "
+              f"{seconds - base_seconds:>8.2f}s {cost - base_cost:>9.4f}")
+
+
+if __name__ == "__main__":
+    main()
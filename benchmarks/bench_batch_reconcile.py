@@ -0,0 +1,81 @@
+"""Batch CLI throughput against the stub API, one worker vs a pool.
+
+Every fourth screenshot gets a malformed reply on its first request, so the
+per-pair retry path is exercised too.
+
+Usage: python -m benchmarks.bench_batch_reconcile [--pairs 12] [--latency 1.0] [--workers 4]
+"""
+import argparse
+import hashlib
+import json
+import os
+import tempfile
+import threading
+
+from benchmarks.common import load_app, render_table_image
+from benchmarks.stub_server import StubAnthropicServer, request_image_bytes
+
+
+def make_pairs(directory, count):
+    for day in range(1, count + 1):
+        key = f"2025-08-{day:02d}"
+        rows = [[key, f"{day * 10 + i}.00", f"ref {i}"] for i in range(5)]
+        for side in ("bank", "ssbo"):
+            image = render_table_image(["Event Time", "Amount", side], rows)
+            with open(os.path.join(directory, f"{key}_{side}.png"), "wb") as handle:
+                handle.write(image)
+
+
+class FlakyResponder:
+    """Echo one deposit per request; fail the first request for every fourth image"""
+
+    def __init__(self):
+        self.seen = set()
+        self.failures = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, payload):
+        digest = hashlib.sha256(request_image_bytes(payload)).digest()
+        with self._lock:
+            first = digest not in self.seen
+            self.seen.add(digest)
+            if first and digest[0] % 4 == 0:
+                self.failures += 1
+                return "Sorry, I can't read this table."
+        prompt = payload["messages"][0]["content"][0]["text"]
+        remark = "Description/Remarks" if "Description/Remarks" in prompt else "Remark"
+        return json.dumps([{"Event Time": "2025-08-01", "Amount": digest[1],
+                            remark: "stub", "Transaction Type": "Deposit"}])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pairs", type=int, default=12)
+    parser.add_argument("--latency", type=float, default=1.0, help="stub latency per call (s)")
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        inputs = os.path.join(workdir, "inputs")
+        os.makedirs(inputs)
+        make_pairs(inputs, args.pairs)
+
+        for workers in (1, args.workers):
+            responder = FlakyResponder()
+            with StubAnthropicServer(latency=args.latency, responder=responder) as stub:
+                app = load_app(stub.url)
+                # The stub's rows aren't the table's, so routing would escalate every fast read
+                app.MODEL_ROUTING = False
+                import batch_reconcile
+                app.get_ocr_cache().clear()
+                summary = batch_reconcile.run_batch(
+                    inputs, os.path.join(workdir, f"out_{workers}"), fmt="parquet",
+                    workers=workers, backoff=0.1, log=lambda message: None,
+                )
+            assert summary["succeeded"] == args.pairs, summary
+            print(f"workers={workers:<2} {summary['elapsed']:.2f}s  {summary['pairs_per_minute']:.1f} pairs/min  "
+                  f"API calls {stub.request_count}, injected failures {responder.failures}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""Sequential vs concurrent bank/SSBO extraction against the stub API.
+
+Usage: python -m benchmarks.bench_concurrent_extraction [--latency 1.5] [--repeat 3]
+"""
+import argparse
+import json
+import time
+
+from benchmarks.common import SampleUpload, load_app, render_table_image
+from benchmarks.stub_server import StubAnthropicServer
+
+BANK_ROWS = [
+    {"Event Time": "2025-08-15", "Amount": 150.00, "Description/Remarks": "DUITNOW TRF", "Transaction Type": "Deposit"},
+    {"Event Time": "2025-08-15", "Amount": 80.50, "Description/Remarks": "IBG CREDIT", "Transaction Type": "Deposit"},
+]
+SSBO_ROWS = [
+    {"Event Time": "2025-08-15", "Amount": 150.00, "Remark": "ref 1", "Transaction Type": "Deposit"},
+]
+
+
+def responder(payload):
+    prompt = payload["messages"][0]["content"][0]["text"]
+    rows = BANK_ROWS if "Description/Remarks" in prompt else SSBO_ROWS
+    return json.dumps(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--latency", type=float, default=1.5, help="stub latency per call (s)")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    image = render_table_image(["Event Time", "Amount", "Remark"], [["2025-08-15", "150.00", "ref"]] * 10)
+
+    with StubAnthropicServer(latency=args.latency, responder=responder) as stub:
+        app = load_app(stub.url)
+        # The stub's rows aren't the table's, so routing would escalate every fast read
+        app.MODEL_ROUTING = False
+
+        def sequential():
+            bank = app.process_bank_statement_with_claude(SampleUpload(image, "bank.png"))
+            ssbo = app.process_ssbo_deposits_with_claude(SampleUpload(image, "ssbo.png"))
+            return bank, ssbo
+
+        def concurrent():
+            return app.process_statements_concurrently(
+                SampleUpload(image, "bank.png"), SampleUpload(image, "ssbo.png")
+            )
+
+        for label, func in (("sequential", sequential), ("concurrent", concurrent)):
+            timings = []
+            for _ in range(args.repeat):
+                # Time real round trips, not OCR cache hits
+                app.get_ocr_cache().clear()
+                start = time.perf_counter()
+                bank, ssbo = func()
+                timings.append(time.perf_counter() - start)
+                assert bank["success"] and ssbo["success"], (bank, ssbo)
+            print(f"{label:<11} best {min(timings):.3f}s  mean {sum(timings) / len(timings):.3f}s")
+
+
+if __name__ == "__main__":
+    main()
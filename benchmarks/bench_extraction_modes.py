@@ -0,0 +1,86 @@
+"""Round trips per extraction: legacy regex + json.loads vs tolerant parsing vs tool schema.
+
+The stub's text replies put one malformed row in a share of answers (as
+free-form JSON from a model occasionally does) and always include a remark
+with digits around a comma. Tool-mode replies are schema-valid JSON, as the
+API returns for a forced tool call.
+
+- legacy: the old cleanup; any malformed row fails the whole reply, so the
+  caller re-calls until one parses
+- text:   tolerant one-pass parser, re-requesting only when rows were lost
+- tool:   forced row schema through a tool call
+
+Usage: python -m benchmarks.bench_extraction_modes [--images 40] [--bad-share 0.3]
+"""
+import argparse
+import hashlib
+import json
+import re
+
+from benchmarks.common import SampleUpload, load_app, render_table_image
+from benchmarks.stub_server import StubAnthropicServer, request_image_bytes
+
+REMARK = "INV 2025/1,2 PAID"
+
+
+def legacy_parse(json_content):
+    """The pre-tolerant cleanup: strip fences, drop every digit,digit comma, json.loads"""
+    json_content = re.sub(r'```json\n?', '', json_content)
+    json_content = re.sub(r'```\n?', '', json_content).strip()
+    return json.loads(re.sub(r'(\d),(\d)', r'\1\2', json_content))
+
+
+class Responder:
+    def __init__(self, bad_share):
+        self.bad_share = bad_share
+        self.calls = {}
+
+    def __call__(self, payload):
+        digest = hashlib.sha256(request_image_bytes(payload)).digest()
+        attempt = self.calls[digest] = self.calls.get(digest, 0) + 1
+        rows = [{"Event Time": "2025-08-15", "Amount": 1000 + i, "Remark": REMARK, "Transaction Type": "Deposit"}
+                for i in range(8)]
+        text = json.dumps(rows, indent=2)
+        # Deterministic per image and attempt, so every mode sees the same replies
+        roll = hashlib.sha256(digest + bytes([attempt])).digest()[0] / 256
+        if "tools" not in payload and roll < self.bad_share:
+            text = text.replace('"Amount": 1003', '"Amount": 1,003 MYR', 1)
+        return "```json\n" + text + "\n```"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--images", type=int, default=40)
+    parser.add_argument("--bad-share", type=float, default=0.3, help="share of text replies with a broken row")
+    args = parser.parse_args()
+
+    images = [render_table_image(["Event Time", "Amount", "Remark"], [["2025-08-15", f"{i}.00", "ref"]] * 3)
+              for i in range(args.images)]
+
+    for mode in ("legacy", "text", "tool"):
+        with StubAnthropicServer(latency=0.0, responder=Responder(args.bad_share)) as stub:
+            app = load_app(stub.url)
+            app.EXTRACTION_MODE = "tool" if mode == "tool" else "text"
+            ocr = app.AnthropicOCR(app.ANTHROPIC_API_KEY)
+            rows_kept = intact_remarks = 0
+            for i, image in enumerate(images):
+                upload = SampleUpload(image, f"ssbo{i}.png")
+                if mode == "legacy":
+                    b64 = ocr.encode_image_from_file(upload)
+                    while True:
+                        try:
+                            rows = legacy_parse(ocr._request_table_json(app.SSBO_PROMPT, app.SSBO_MODEL, b64,
+                                                                        ocr._media_type_for(upload)))
+                            break
+                        except ValueError:
+                            continue
+                else:
+                    rows = ocr.extract_rows(upload, app.SSBO_PROMPT, app.SSBO_MODEL)
+                rows_kept += len(rows)
+                intact_remarks += sum(row["Remark"] == REMARK for row in rows)
+            print(f"{mode:<7} {stub.request_count / args.images:.2f} calls per image, "
+                  f"{rows_kept} rows, remarks intact {intact_remarks}/{rows_kept}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""Peak memory of the image path per screenshot size.
+
+Tall table screenshots of --rows rows each are rendered at --scale with
+--noise gray levels of pixel noise (real screenshots compress far worse than
+a clean synthetic table, so this brings the files to phone-screenshot
+sizes). Each one is run through the app in a fresh process, so no cache or
+allocator state carries over, and the peak resident memory above the
+resident size before the stage is read from /proc (Linux only):
+
+- preview:  what the upload section does (decode the upload, build the preview)
+- encode:   what a reconcile click does before the API call (optimize, base64)
+- bands:    splitting the screenshot into the row bands sent to the model
+- retained: memory still held by the caches after all three
+
+Pass --output to keep the results as JSON and --compare with an earlier file
+to see the ratio against it, e.g. between two versions of the app.
+
+Usage: python -m benchmarks.bench_image_memory [--rows 40 150 400] [--scale 3] [--output bench_image_memory.json]
+"""
+import argparse
+import contextlib
+import gc
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+import numpy as np
+from PIL import Image
+
+from benchmarks.common import REPO_ROOT, SampleUpload, load_app, render_table_image
+
+HEADER = ["Event Time", "Amount", "Description/Remarks", "Balance"]
+STAGES = ["preview", "encode", "bands", "retained"]
+
+
+def proc_status_kb(field):
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1])
+    raise RuntimeError(f"{field} not in /proc/self/status")
+
+
+def reset_peak():
+    """Restart VmHWM from the current resident size"""
+    with open("/proc/self/clear_refs", "w") as f:
+        f.write("5")
+
+
+def measure(func):
+    """MB of peak resident memory above the resident size before func"""
+    gc.collect()
+    before = proc_status_kb("VmRSS")
+    reset_peak()
+    func()
+    return (proc_status_kb("VmHWM") - before) / 1024
+
+
+def child(path):
+    """Run the stages on one screenshot file and print their peaks as JSON"""
+    app = load_app("http://127.0.0.1:9")
+    ocr = app.AnthropicOCR(app.ANTHROPIC_API_KEY)
+    with open(path, "rb") as f:
+        upload = SampleUpload(f.read(), os.path.basename(path))
+    gc.collect()
+    start = proc_status_kb("VmRSS")
+    peaks = {}
+    with contextlib.redirect_stdout(io.StringIO()):
+        peaks["preview"] = measure(lambda: app.get_upload_artifacts(upload).preview)
+        peaks["encode"] = measure(lambda: ocr.encode_image_from_file(upload))
+        peaks["bands"] = measure(lambda: ocr._band_files(upload))
+    gc.collect()
+    peaks["retained"] = (proc_status_kb("VmRSS") - start) / 1024
+    print(json.dumps(peaks))
+
+
+def screenshot(rows, scale, noise, seed):
+    """PNG bytes of a tall table screenshot and its pixel count"""
+    cells = [[f"2025-08-{i % 28 + 1:02d}", f"{i * 37.5:,.2f}", f"DUITNOW TRF {i:06d}", f"{10000 + i * 12.3:,.2f}"]
+             for i in range(rows)]
+    image = np.asarray(Image.open(io.BytesIO(render_table_image(HEADER, cells, scale=scale, striped=True))))
+    if noise:
+        jitter = np.random.default_rng(seed).integers(-noise, noise + 1, size=image.shape, dtype=np.int16)
+        image = np.clip(image + jitter, 0, 255).astype(np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(image).save(buffer, format="PNG")
+    return buffer.getvalue(), image.shape[0] * image.shape[1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[40, 150, 400], help="table rows per screenshot")
+    parser.add_argument("--scale", type=int, default=3, help="pixel scale (3 mimics a retina phone)")
+    parser.add_argument("--noise", type=int, default=6, help="+/- gray levels of pixel noise")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="where to write the JSON results")
+    parser.add_argument("--compare", help="earlier JSON results to compare against")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(args.child)
+        return
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix="image_memory_") as directory:
+        for rows in args.rows:
+            data, pixels = screenshot(rows, args.scale, args.noise, args.seed)
+            path = os.path.join(directory, f"statement_{rows}.png")
+            with open(path, "wb") as f:
+                f.write(data)
+            output = subprocess.run([sys.executable, "-m", "benchmarks.bench_image_memory", "--child", path],
+                                    cwd=REPO_ROOT, capture_output=True, text=True, check=True).stdout
+            results.append({"rows": rows, "file_mb": len(data) / 2 ** 20, "megapixels": pixels / 1e6,
+                            "peak_mb": json.loads(output.strip().splitlines()[-1])})
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"benchmark": "image_memory", "config": vars(args), "results": results}, f, indent=2)
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = {entry["rows"]: entry["peak_mb"] for entry in json.load(f)["results"]}
+
+    print(f"{'rows':>5} {'file MB':>8} {'MP':>6} " + " ".join(f"{stage:>9}" for stage in STAGES)
+          + ("  (MB; vs base)" if baseline else "  (MB)"))
+    for entry in results:
+        cells = []
+        for stage in STAGES:
+            cell = f"{entry['peak_mb'][stage]:>9.1f}"
+            base = baseline.get(entry["rows"], {}).get(stage)
+            if base:
+                cell += f" {entry['peak_mb'][stage] / base:>5.2f}x"
+            cells.append(cell)
+        print(f"{entry['rows']:>5} {entry['file_mb']:>8.1f} {entry['megapixels']:>6.1f} " + " ".join(cells))
+
+
+if __name__ == "__main__":
+    main()
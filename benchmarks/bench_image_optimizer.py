@@ -0,0 +1,69 @@
+"""Payload size, estimated tokens and stub round-trip time with and without the image optimizer.
+
+Usage: python -m benchmarks.bench_image_optimizer [--rows 15]
+"""
+import argparse
+import base64
+import io
+import time
+
+from PIL import Image
+
+from benchmarks.common import load_app, render_table_image
+from benchmarks.stub_server import StubAnthropicServer
+
+HEADER = ["Event Time", "Amount", "Description/Remarks", "Balance"]
+
+
+def legacy_payload(png_bytes):
+    """The pre-optimizer encoding: full-resolution grayscale PNG"""
+    buffer = io.BytesIO()
+    Image.open(io.BytesIO(png_bytes)).convert("L").save(buffer, format="PNG")
+    return "image/png", buffer.getvalue()
+
+
+def round_trip(ocr, media_type, data, prompt, model, repeat=5):
+    """Best-of-n time to base64 the payload and send it to the stub"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        ocr._request_table_json(prompt, model, base64.b64encode(data).decode("utf-8"), media_type)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=15)
+    args = parser.parse_args()
+
+    rows = [[f"2025-08-{i % 28 + 1:02d}", f"{i * 37.5:,.2f}", f"DUITNOW TRF {i:06d}", f"{10000 + i * 12.3:,.2f}"]
+            for i in range(args.rows)]
+    samples = {
+        f"{scale}x{' striped' if striped else ''}": render_table_image(HEADER, rows, scale=scale, striped=striped)
+        for scale in (1, 2, 3) for striped in (False, True)
+    }
+
+    with StubAnthropicServer(latency=0.0) as stub:
+        app = load_app(stub.url)
+        import image_optimizer as optimizer
+        ocr = app.AnthropicOCR(app.ANTHROPIC_API_KEY)
+
+        print(f"{'sample':<12} {'variant':<10} {'size':>11} {'bytes':>9} {'~tokens':>8} {'rtt ms':>8}")
+        for label, png in samples.items():
+            image = Image.open(io.BytesIO(png))
+            media_type, data = legacy_payload(png)
+            rtt = round_trip(ocr, media_type, data, app.BANK_PROMPT, app.BANK_MODEL)
+            tokens = optimizer.estimate_image_tokens(*image.size)
+            print(f"{label:<12} {'legacy':<10} {image.width:>5}x{image.height:<5} {len(data):>9} {tokens:>8} {rtt * 1000:>8.1f}")
+
+            for mode in optimizer.OPTIMIZER_MODES:
+                report = optimizer.optimize_image(image, len(png), mode=mode)
+                rtt = round_trip(ocr, report["media_type"], report["data"], app.BANK_PROMPT, app.BANK_MODEL)
+                size = "{}x{}".format(*report["optimized_size"])
+                print(f"{label:<12} {mode:<10} {size:>11} {report['optimized_bytes']:>9} "
+                      f"{report['optimized_tokens']:>8} {rtt * 1000:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Incremental reconciliation through the ledger vs per-upload and full re-reconciliation.
+
+Simulates one bank and one SSBO upload per day. Some deposits are posted to
+the SSBO a day late: they show up in the next day's SSBO upload, dated either
+the bank day or the day after. Three ways to reconcile each day:
+
+- per-upload: reconcile_frames on the day's two uploads only (no history)
+- full:       reconcile_frames on every upload so far (re-uploading history)
+- ledger:     record the day's rows and reconcile against all outstanding rows
+
+Reports rows left unmatched after the last day and the time per day.
+
+Usage: python -m benchmarks.bench_ledger [--days 60] [--rows 500] [--late 0.15] [--window 1]
+"""
+import argparse
+import random
+import tempfile
+import time
+from datetime import date, timedelta
+
+from benchmarks.common import add_repo_to_path
+
+add_repo_to_path()
+from ledger import ReconciliationLedger  # noqa: E402
+from reconcile_engine import reconcile_frames  # noqa: E402
+
+
+def generate(days, rows, late, seed=0):
+    """Per day (bank rows, SSBO rows); late SSBO rows land in the next day's upload"""
+    rng = random.Random(seed)
+    start = date(2025, 1, 1)
+    bank = [[] for _ in range(days)]
+    ssbo = [[] for _ in range(days + 1)]
+    for d in range(days):
+        day = start + timedelta(days=d)
+        for i in range(rows):
+            cents = rng.randint(100, 500000) if rng.random() > 0.2 else rng.choice([1000, 5000, 10000])
+            tx = rng.choice(["Deposit", "Transfer"])
+            bank[d].append({"Event Time": f"{day.day}/{day.month}/{day.year}", "Amount": f"{cents / 100:,.2f}",
+                            "Description/Remarks": f"TRF {d}-{i}", "Transaction Type": tx})
+            roll = rng.random()
+            if roll < 0.03:
+                continue  # never posted
+            posted = d + 1 if roll < 0.03 + late else d
+            dated = day + timedelta(days=rng.randint(0, 1)) if posted > d else day
+            ssbo[posted].append({"Event Time": f"{dated.isoformat()} {rng.randint(0, 23):02d}:00:00",
+                                 "Amount": cents / 100, "Remark": f"ref {d}-{i}", "Transaction Type": tx})
+    return bank, ssbo[:days]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--days", type=int, default=60)
+    parser.add_argument("--rows", type=int, default=500, help="bank rows per day")
+    parser.add_argument("--late", type=float, default=0.15, help="share of deposits posted to the SSBO a day late")
+    parser.add_argument("--window", type=int, default=1, help="date window (± days)")
+    args = parser.parse_args()
+
+    bank, ssbo = generate(args.days, args.rows, args.late)
+    tolerance = {'date_window_days': args.window}
+    print(f"{args.days} days x {args.rows} bank rows, {args.late:.0%} posted late, window ±{args.window}d")
+
+    per_upload_open, per_upload_time = 0, 0.0
+    for b, s in zip(bank, ssbo):
+        start = time.perf_counter()
+        df = reconcile_frames(b, s, **tolerance)
+        per_upload_time += time.perf_counter() - start
+        per_upload_open += int((df['Status'] == "Not Tally").sum())
+
+    all_bank = [row for day in bank for row in day]
+    all_ssbo = [row for day in ssbo for row in day]
+    start = time.perf_counter()
+    df = reconcile_frames(all_bank, all_ssbo, **tolerance)
+    full_last = time.perf_counter() - start
+    full_open = int((df['Status'] == "Not Tally").sum())
+
+    with tempfile.TemporaryDirectory() as tmp:
+        ledger = ReconciliationLedger(tmp)
+        times, carried_total = [], 0
+        for d, (b, s) in enumerate(zip(bank, ssbo)):
+            start = time.perf_counter()
+            # Each day's uploads are different files
+            ledger.add_rows('ssbo', s, f"ssbo-{d}")
+            ids = ledger.add_rows('bank', b, f"bank-{d}")
+            _, carried = ledger.reconcile(ids, **tolerance)
+            times.append(time.perf_counter() - start)
+            carried_total += len(carried)
+        stats = ledger.stats()
+
+    print(f"{'mode':<11} {'unmatched':>10} {'time/day':>10} {'last day':>10}")
+    print(f"{'per-upload':<11} {per_upload_open:>10} {per_upload_time / args.days:>9.3f}s {'':>10}")
+    print(f"{'full':<11} {full_open:>10} {'':>10} {full_last:>9.3f}s")
+    print(f"{'ledger':<11} {stats['bank_outstanding']:>10} {sum(times) / len(times):>9.3f}s {times[-1]:>9.3f}s")
+    print(f"ledger: {carried_total} earlier bank rows tallied by later uploads; "
+          f"{stats['ssbo_outstanding']} SSBO rows outstanding")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""Message Batches mode against the stub batch endpoint, including a resume.
+
+The first run stops waiting before the batch ends (as if the process were
+killed); the second run resumes the same batch from the state file, submits
+nothing new and reconciles every pair from the results, with no
+synchronous model calls.
+
+Usage: python -m benchmarks.bench_message_batches [--pairs 20] [--batch-delay 2]
+"""
+import argparse
+import os
+import tempfile
+
+from benchmarks.bench_batch_reconcile import make_pairs
+from benchmarks.common import load_app
+from benchmarks.stub_server import StubAnthropicServer
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pairs", type=int, default=20)
+    parser.add_argument("--batch-delay", type=float, default=2.0, help="seconds until a stub batch ends")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        inputs, outputs = os.path.join(workdir, "inputs"), os.path.join(workdir, "out")
+        os.makedirs(inputs)
+        make_pairs(inputs, args.pairs)
+
+        with StubAnthropicServer(latency=0.5, batch_delay=args.batch_delay) as stub:
+            app = load_app(stub.url)
+            # The stub answers "[]", so routing would escalate every fast read
+            app.MODEL_ROUTING = False
+            import batch_reconcile
+
+            quiet = lambda message: None
+            first = batch_reconcile.run_batch(inputs, outputs, message_batches=True, poll_interval=0.1,
+                                              max_wait=args.batch_delay / 4, log=quiet)
+            print(f"run 1: stopped with {len(first['pending_batches'])} batch(es) pending, "
+                  f"{len(stub.batches)} submitted")
+
+            second = batch_reconcile.run_batch(inputs, outputs, message_batches=True, poll_interval=0.1,
+                                               log=quiet)
+            requests = sum(len(batch["requests"]) for batch in stub.batches.values())
+            print(f"run 2: {second['succeeded']}/{second['pairs']} pairs reconciled in {second['elapsed']:.2f}s; "
+                  f"{len(stub.batches)} batch(es) / {requests} batched requests in total, "
+                  f"{stub.request_count} synchronous calls")
+            assert second["succeeded"] == args.pairs and len(stub.batches) == 1 and stub.request_count == 0
+
+
+if __name__ == "__main__":
+    main()
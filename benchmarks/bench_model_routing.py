@@ -0,0 +1,184 @@
+"""Latency and cost of routing screenshots by complexity vs always using the strong model.
+
+Bank and SSBO transactions (benchmarks.datasets) are cut into --page-rows
+row screenshots. A --complex-share of them are made harder than the router
+lets the fast model read: bank pages with four extra columns, or pages with
+tinted rows. The stub answers with the rows a screenshot shows after a
+model-dependent delay; the fast model gets --fast-error-rate of its pages
+wrong (a dropped row or a blank amount), which validation has to catch.
+
+Each screenshot goes through ClaudeBackend.extract in turn, with:
+
+- strong:  MODEL_ROUTING off and both sides on the strong model
+- fixed:   MODEL_ROUTING off, the per-side models the app shipped with
+- routed:  MODEL_ROUTING on
+
+Cost is estimated from the tokens of every call (image tokens as the
+optimizer counts them, the prompt at four characters a token, the reply at
+four characters a token) at --prices dollars per million tokens. The
+"exact" column counts screenshots read exactly right: a fast read that
+drops SSBO rows passes validation, since the SSBO prompt itself leaves rows
+out, so those are the misses routing shares with the fixed setup.
+
+Usage: python -m benchmarks.bench_model_routing [--screenshots 40] [--complex-share 0.3] [--fast-error-rate 0.1]
+"""
+import argparse
+import base64
+import contextlib
+import hashlib
+import io
+import json
+import os
+import random
+import threading
+import time
+
+import numpy as np
+from PIL import Image
+
+from benchmarks.common import SampleUpload, load_app, render_table_image
+from benchmarks.datasets import BANK_HEADER, SSBO_HEADER, bank_cells, generate_transactions, ssbo_cells
+from benchmarks.stub_server import StubAnthropicServer, request_image_bytes
+from model_router import FAST_MODEL, STRONG_MODEL
+from table_tiling import row_fingerprint
+
+WIDE_COLUMNS = ["Balance", "Reference", "Channel", "Branch"]
+TINT = np.array([205, 225, 255])
+
+
+def tinted(image_bytes):
+    """Tint every other table row light blue, like a highlighted statement"""
+    image = np.asarray(Image.open(io.BytesIO(image_bytes)).convert("RGB")).copy()
+    for top in range(28 * 1, image.shape[0], 28 * 2):
+        band = image[top:top + 28]
+        light = band.min(axis=-1) > 200
+        band[light] = TINT
+    buffer = io.BytesIO()
+    Image.fromarray(image).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def wide_cells(cells, rng):
+    return [row + [f"{rng.randint(1000, 99999):,}.00", f"REF{rng.randint(10 ** 7, 10 ** 8)}",
+                   rng.choice(["FPX", "IBG", "ATM", "DuitNow"]), rng.choice(["KL01", "PJ02", "JB03"])]
+            for row in cells]
+
+
+def flawed(rows, rng):
+    """A plausible fast-model mistake: a dropped row or a blank amount"""
+    rows = [dict(row) for row in rows]
+    if rng.random() < 0.5 and len(rows) > 3:
+        del rows[rng.randrange(len(rows))]
+        del rows[rng.randrange(len(rows))]
+    else:
+        rows[rng.randrange(len(rows))]['Amount'] = ""
+    return rows
+
+
+def screenshots(args, rng):
+    """(side, kind, upload, rows) for every screenshot"""
+    bank, ssbo, _ = generate_transactions(args.screenshots * args.page_rows, seed=args.seed)
+    sources = {'bank': (bank, BANK_HEADER, bank_cells(bank)), 'ssbo': (ssbo, SSBO_HEADER, ssbo_cells(ssbo, args.seed))}
+    pages = []
+    for i in range(args.screenshots):
+        side = ('bank', 'ssbo')[i % 2]
+        rows, header, cells = sources[side]
+        start = (i // 2) * args.page_rows
+        page_rows, page_cells = rows[start:start + args.page_rows], cells[start:start + args.page_rows]
+        kind = "plain"
+        if rng.random() < args.complex_share:
+            kind = "wide" if side == 'bank' and rng.random() < 0.5 else "tinted"
+        if kind == "wide":
+            image = render_table_image(header + WIDE_COLUMNS, wide_cells(page_cells, rng), col_width=150)
+        else:
+            image = render_table_image(header, page_cells)
+            if kind == "tinted":
+                image = tinted(image)
+        pages.append((side, kind, SampleUpload(image, f"{side}{i}.png"), page_rows))
+    return pages
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--screenshots", type=int, default=40)
+    parser.add_argument("--page-rows", type=int, default=12, help="table rows per screenshot")
+    parser.add_argument("--complex-share", type=float, default=0.3, help="share of wide or tinted screenshots")
+    parser.add_argument("--fast-error-rate", type=float, default=0.1, help="share of fast reads that are wrong")
+    parser.add_argument("--fast-latency", type=float, default=0.6, help="stub seconds per fast-model call")
+    parser.add_argument("--strong-latency", type=float, default=1.8, help="stub seconds per strong-model call")
+    parser.add_argument("--prices", type=float, nargs=4, default=[0.8, 4.0, 3.0, 15.0],
+                        metavar=("FAST_IN", "FAST_OUT", "STRONG_IN", "STRONG_OUT"))
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    # The three modes make ~3x the calls of one; keep the rate limiter out of the timings
+    os.environ.setdefault("ANTHROPIC_REQUESTS_PER_MINUTE", "100000")
+    os.environ.setdefault("ANTHROPIC_INPUT_TOKENS_PER_MINUTE", "100000000")
+    rng = random.Random(args.seed)
+    pages = screenshots(args, rng)
+    prices = {FAST_MODEL: args.prices[:2], STRONG_MODEL: args.prices[2:]}
+    latency = {FAST_MODEL: args.fast_latency, STRONG_MODEL: args.strong_latency}
+    replies, ledger, lock = {}, [], threading.Lock()
+
+    def respond(payload):
+        digest = hashlib.sha256(request_image_bytes(payload)).digest()
+        rows, tokens_in = replies[digest]
+        if payload["model"] == FAST_MODEL and random.Random(digest).random() < args.fast_error_rate:
+            rows = flawed(rows, random.Random(digest))
+        text = json.dumps(rows)
+        prompt = sum(len(block.get("text", "")) for block in payload["messages"][0]["content"]) // 4
+        with lock:
+            ledger.append((payload["model"], tokens_in + prompt, len(text) // 4))
+        return text
+
+    with StubAnthropicServer(latency=lambda payload: latency[payload["model"]], responder=respond) as stub:
+        app = load_app(stub.url)
+        ocr = app.AnthropicOCR(app.ANTHROPIC_API_KEY)
+        with contextlib.redirect_stdout(io.StringIO()):
+            for _, _, upload, rows in pages:
+                sent = base64.b64decode(ocr.encode_image_from_file(upload))
+                width, height = Image.open(io.BytesIO(sent)).size
+                replies[hashlib.sha256(sent).digest()] = (rows, width * height // 750)
+        backend = app.ClaudeBackend()
+        fixed_prompts = dict(backend.PROMPTS)
+
+        def run(routing, prompts):
+            app.MODEL_ROUTING = routing
+            app.ClaudeBackend.PROMPTS = prompts
+            app.get_ocr_cache().clear()
+            router = app.get_model_router().stats()
+            ledger.clear()
+            exact, start = 0, time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                for side, _, upload, rows in pages:
+                    read = backend.extract(upload, side)
+                    exact += [row_fingerprint(row) for row in read] == [row_fingerprint(row) for row in rows]
+            seconds = time.perf_counter() - start
+            calls = {model: sum(1 for entry in ledger if entry[0] == model) for model in prices}
+            cost = sum(tokens_in * prices[model][0] + tokens_out * prices[model][1]
+                       for model, tokens_in, tokens_out in ledger) / 1e6
+            escalated = app.get_model_router().stats()['escalated'] - router['escalated']
+            return seconds, calls, cost, exact, escalated
+
+        start = time.perf_counter()
+        for _, _, upload, _ in pages:
+            backend.complexity(upload)
+        estimate_ms = (time.perf_counter() - start) * 1000 / len(pages)
+
+        strong = run(False, {side: (prompt, STRONG_MODEL) for side, (prompt, _) in fixed_prompts.items()})
+        fixed = run(False, fixed_prompts)
+        routed = run(True, fixed_prompts)
+
+    kinds = {kind: sum(1 for page in pages if page[1] == kind) for kind in ("plain", "wide", "tinted")}
+    print(f"{len(pages)} screenshots ({', '.join(f'{count} {kind}' for kind, count in kinds.items())}); "
+          f"stub latency fast {args.fast_latency:.1f}s, strong {args.strong_latency:.1f}s; "
+          f"complexity estimate {estimate_ms:.1f} ms per screenshot")
+    print(f"{'mode':<7} {'time':>8} {'fast':>5} {'strong':>7} {'escalated':>9} {'cost $':>9} {'exact':>6}"
+          f" {'time saved':>11} {'cost saved':>11}")
+    for label, (seconds, calls, cost, exact, escalated) in (("strong", strong), ("fixed", fixed), ("routed", routed)):
+        print(f"{label:<7} {seconds:>7.2f}s {calls[FAST_MODEL]:>5} {calls[STRONG_MODEL]:>7} {escalated:>9} "
+              f"{cost:>9.4f} {exact:>3}/{len(pages):<2} {1 - seconds / strong[0]:>10.0%} {1 - cost / strong[2]:>10.0%}")
+
+
+if __name__ == "__main__":
+    main()
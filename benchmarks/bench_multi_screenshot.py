@@ -0,0 +1,125 @@
+"""Reconciling a statement uploaded as several overlapping screenshots.
+
+Synthetic bank and SSBO transactions (benchmarks.datasets) are cut into
+--screenshots pages per side, each overlapping the previous one by a random
+--min-overlap..--max-overlap rows as when scrolling, and each rendered as an
+image. Some bank rows are exact copies of the row above (--identical-rate),
+like two identical transfers on one day, which must survive the merge. The
+stub server answers every screenshot with the rows it shows.
+
+Times, per side pair:
+
+- one:        extracting the first screenshot of each side
+- sequential: extracting the screenshots one pair after another
+- concurrent: process_statements_concurrently on all screenshots at once
+
+and checks the merged rows against the statement, next to what dropping
+every repeated row (a set) would have kept, with the overlap rows the merge
+dropped and the repeats it kept unconfirmed. An overlap shorter than
+MIN_SCREENSHOT_OVERLAP_ROWS is kept in full, so --min-overlap 1 shows
+duplicates.
+
+Usage: python -m benchmarks.bench_multi_screenshot [--size 50] [--screenshots 5] [--latency 1.0]
+"""
+import argparse
+import base64
+import contextlib
+import hashlib
+import io
+import json
+import random
+import time
+
+from benchmarks.common import SampleUpload, load_app, render_table_image
+from benchmarks.datasets import BANK_HEADER, SSBO_HEADER, bank_cells, generate_transactions, ssbo_cells
+from benchmarks.stub_server import StubAnthropicServer, request_image_bytes
+from table_tiling import row_fingerprint
+from transactions import as_transactions
+
+
+def add_identical_rows(rows, rate, rng):
+    """Copy a share of rows over the row after them, so identical neighbours exist"""
+    for i in range(1, len(rows)):
+        if rng.random() < rate:
+            rows[i] = dict(rows[i - 1])
+    return rows
+
+
+def overlapping_pages(rows, screenshots, min_overlap, max_overlap, rng):
+    """Cut rows into screenshots that each repeat the last min_overlap..max_overlap rows of the previous one"""
+    page_rows = -(-len(rows) // screenshots) + max_overlap
+    pages, start = [], 0
+    while True:
+        end = min(start + page_rows, len(rows))
+        pages.append((start, end))
+        if end == len(rows):
+            return pages
+        start = end - rng.randint(min_overlap, max_overlap)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=50, help="bank rows in the statement")
+    parser.add_argument("--screenshots", type=int, default=5, help="screenshots per side")
+    parser.add_argument("--min-overlap", type=int, default=3, help="fewest rows shared by consecutive screenshots")
+    parser.add_argument("--max-overlap", type=int, default=5, help="most rows shared by consecutive screenshots")
+    parser.add_argument("--identical-rate", type=float, default=0.1, help="share of bank rows copying the row above")
+    parser.add_argument("--latency", type=float, default=1.0, help="stub seconds per model call")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    bank, ssbo, _ = generate_transactions(args.size, seed=args.seed)
+    truth = {'bank': add_identical_rows(bank, args.identical_rate, rng), 'ssbo': ssbo}
+    cells = {'bank': bank_cells(bank), 'ssbo': ssbo_cells(ssbo, args.seed)}
+    headers = {'bank': BANK_HEADER, 'ssbo': SSBO_HEADER}
+    uploads = {}
+    for side, rows in truth.items():
+        uploads[side] = []
+        for i, (start, end) in enumerate(overlapping_pages(rows, args.screenshots, args.min_overlap, args.max_overlap, rng)):
+            image = render_table_image(headers[side], cells[side][start:end])
+            uploads[side].append((SampleUpload(image, f"{side}{i}.png"), rows[start:end]))
+
+    replies = {}
+    with StubAnthropicServer(latency=args.latency,
+                             responder=lambda payload: replies[hashlib.sha256(request_image_bytes(payload)).digest()]
+                             ) as stub:
+        app = load_app(stub.url)
+        ocr = app.AnthropicOCR(app.ANTHROPIC_API_KEY)
+        with contextlib.redirect_stdout(io.StringIO()):
+            for pages in uploads.values():
+                for upload, rows in pages:
+                    sent = ocr.encode_image_from_file(upload)
+                    replies[hashlib.sha256(base64.b64decode(sent)).digest()] = json.dumps(rows)
+        files = {side: [upload for upload, _ in pages] for side, pages in uploads.items()}
+
+        def timed(func):
+            app.get_ocr_cache().clear()
+            calls = stub.request_count
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                result = func()
+            return time.perf_counter() - start, stub.request_count - calls, result
+
+        one = timed(lambda: app.process_statements_concurrently(files['bank'][0], files['ssbo'][0]))
+        sequential = timed(lambda: [app.process_statements_concurrently(bank_file, ssbo_file)
+                                    for bank_file, ssbo_file in zip(files['bank'], files['ssbo'])])
+        concurrent = timed(lambda: app.process_statements_concurrently(files['bank'], files['ssbo']))
+
+    print(f"stub latency {args.latency:.1f}s; {len(files['bank'])} bank and {len(files['ssbo'])} SSBO screenshots")
+    print(f"{'step':<11} {'time':>8} {'calls':>6}")
+    for label, (seconds, calls, _) in (("one", one), ("sequential", sequential), ("concurrent", concurrent)):
+        print(f"{label:<11} {seconds:>7.3f}s {calls:>6}")
+
+    print(f"{'side':<5} {'statement':>9} {'read':>6} {'merged':>7} {'as set':>7} {'dropped':>8} {'kept':>5}  exact")
+    for side, result in zip(('bank', 'ssbo'), concurrent[2]):
+        assert result['success'], result
+        read = sum(len(rows) for _, rows in uploads[side])
+        as_set = len({row_fingerprint(row) for row in truth[side]})
+        exact = as_transactions(truth[side], side).equals(result['data'])
+        print(f"{side:<5} {len(truth[side]):>9} {read:>6} {result['record_count']:>7} {as_set:>7} "
+              f"{result['overlap_dropped']:>8} {result['overlap_unconfirmed']:>5}  {exact}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""Time every stage of the reconciliation pipeline and write the results as JSON.
+
+For each size, synthetic bank and SSBO transactions (benchmarks.datasets) are
+rendered as screenshots of --page-rows rows each. Every page then goes through
+the app's own code for each stage:
+
+- image_encode:    decode, optimize and base64-encode the screenshot
+- api_round_trip:  one Messages API call to the stub server
+- json_parse:      parse the rows out of the reply
+- comparison:      create_comparison_table on all extracted rows
+- dataframe_build: the DataFrame the comparison table is displayed from
+
+Stage times are totals per run (all pages of both sides); the JSON keeps the
+median, min and max over --repeat runs. expected_tally counts the SSBO rows
+dated on their bank row's day; with --date-skew a skewed row can occasionally
+still find an exact partner among the other rows. Pass --compare with an earlier output
+file to see the ratio against it, e.g. between two versions of the app.
+
+Usage: python -m benchmarks.bench_pipeline [--sizes 50 200 1000] [--latency 0.2] [--output bench_pipeline.json]
+"""
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import platform
+import statistics
+import subprocess
+import time
+import warnings
+
+import pandas as pd
+from PIL import Image
+
+from benchmarks.common import REPO_ROOT, load_app, render_table_image
+from benchmarks.datasets import BANK_HEADER, SSBO_HEADER, bank_cells, generate_transactions, ssbo_cells
+from benchmarks.stub_server import StubAnthropicServer
+
+STAGES = ["image_encode", "api_round_trip", "json_parse", "comparison", "dataframe_build"]
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def pages(rows, cells, header, page_rows):
+    """(PNG bytes, rows on the page) per screenshot"""
+    return [(render_table_image(header, cells[i:i + page_rows]), rows[i:i + page_rows])
+            for i in range(0, len(rows), page_rows)]
+
+
+def run_once(app, ocr, current, sides):
+    """One pass through the pipeline; returns seconds per stage and the comparison table"""
+    timings = dict.fromkeys(STAGES, 0.0)
+    extracted = {}
+    for side, (prompt, model, side_pages) in sides.items():
+        extracted[side] = []
+        for i, (image_bytes, truth) in enumerate(side_pages):
+            current["reply"] = json.dumps(truth)
+
+            start = time.perf_counter()
+            image = Image.open(io.BytesIO(image_bytes))
+            image.load()
+            report = ocr._build_payload(image, len(image_bytes), f"{side}{i}.png")
+            timings["image_encode"] += time.perf_counter() - start
+
+            request = ocr._table_request(prompt, model, report['base64'], report['media_type'])
+            start = time.perf_counter()
+            message = app.call_with_retry(lambda: ocr.client.messages.create(**request))
+            timings["api_round_trip"] += time.perf_counter() - start
+
+            start = time.perf_counter()
+            extracted[side].extend(ocr.parse_reply(message).close())
+            timings["json_parse"] += time.perf_counter() - start
+
+    start = time.perf_counter()
+    records = app.create_comparison_table(extracted['bank'], extracted['ssbo'])
+    timings["comparison"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    df = pd.DataFrame(records)
+    timings["dataframe_build"] = time.perf_counter() - start
+    return timings, df
+
+
+def summarize(runs):
+    return {stage: {"median": statistics.median(run[stage] for run in runs),
+                    "min": min(run[stage] for run in runs),
+                    "max": max(run[stage] for run in runs)} for stage in STAGES}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[50, 200, 1000], help="bank rows per run")
+    parser.add_argument("--duplicate-rate", type=float, default=0.05)
+    parser.add_argument("--date-skew", type=float, default=0.0, help="share of SSBO rows dated off their bank row")
+    parser.add_argument("--unmatched-rate", type=float, default=0.05)
+    parser.add_argument("--page-rows", type=int, default=40, help="rows per screenshot")
+    parser.add_argument("--latency", type=float, default=0.2, help="stub seconds per model call")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="bench_pipeline.json", help="where to write the JSON results")
+    parser.add_argument("--compare", help="earlier JSON results to compare against")
+    args = parser.parse_args()
+
+    # The stub answers for whatever model the app names, retired or not
+    warnings.filterwarnings("ignore", category=DeprecationWarning)
+    current = {}
+    results = []
+    with StubAnthropicServer(latency=args.latency, responder=lambda payload: current["reply"]) as stub:
+        app = load_app(stub.url)
+        ocr = app.AnthropicOCR(app.ANTHROPIC_API_KEY)
+        for size in args.sizes:
+            bank, ssbo, expected = generate_transactions(
+                size, duplicate_rate=args.duplicate_rate, date_skew=args.date_skew,
+                unmatched_rate=args.unmatched_rate, seed=args.seed
+            )
+            sides = {
+                'bank': (app.BANK_PROMPT, app.BANK_MODEL, pages(bank, bank_cells(bank), BANK_HEADER, args.page_rows)),
+                'ssbo': (app.SSBO_PROMPT, app.SSBO_MODEL,
+                         pages(ssbo, ssbo_cells(ssbo, args.seed), SSBO_HEADER, args.page_rows)),
+            }
+            runs = []
+            # The app logs every optimized image; keep the report readable
+            with contextlib.redirect_stdout(io.StringIO()):
+                for _ in range(args.repeat):
+                    timings, df = run_once(app, ocr, current, sides)
+                    runs.append(timings)
+            results.append({
+                "size": size,
+                "ssbo_rows": len(ssbo),
+                "pages": sum(len(side_pages) for _, _, side_pages in sides.values()),
+                "tally": int((df['Status'] == "Tally").sum()),
+                "expected_tally": expected,
+                "stages": summarize(runs),
+            })
+
+    output = {
+        "benchmark": "pipeline",
+        "created": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "platform": platform.platform(),
+        "config": vars(args),
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(output, f, indent=2)
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = {entry["size"]: entry["stages"] for entry in json.load(f)["results"]}
+
+    print(f"{'rows':>6} {'pages':>6} {'stage':<16} {'median':>9} {'min':>9} {'max':>9}"
+          f"{' vs base' if baseline else ''}")
+    for entry in results:
+        for stage in STAGES:
+            times = entry["stages"][stage]
+            line = (f"{entry['size']:>6} {entry['pages']:>6} {stage:<16} {times['median']:>8.4f}s "
+                    f"{times['min']:>8.4f}s {times['max']:>8.4f}s")
+            base = baseline.get(entry["size"], {}).get(stage)
+            if base and base["median"]:
+                line += f" {times['median'] / base['median']:>7.2f}x"
+            print(line)
+        print(f"{'':>6} {'':>6} tally {entry['tally']} (expected {entry['expected_tally']})")
+    print(f"wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
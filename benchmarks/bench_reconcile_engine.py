@@ -0,0 +1,165 @@
+"""Original per-row create_comparison_table vs the columnar reconcile engine.
+
+The engine is timed from lists of dicts and from DataFrames (parsing
+included) and from TransactionTables parsed beforehand, as the app holds
+them. "equal" checks that every bank row gets the same partner and Status
+as the per-row implementation; amounts are compared by value, since the
+engine shows them as floats. The tolerance pass is then timed on one day of
+distinct amounts that all fall inside each other's tolerance.
+
+Usage: python -m benchmarks.bench_reconcile_engine [--sizes 1000 100000 1000000]
+"""
+import argparse
+import random
+import time
+
+import pandas as pd
+
+from benchmarks.common import add_repo_to_path
+
+add_repo_to_path()
+from reconcile_engine import normalize_amount, normalize_tx_type, reconcile_frames, standardize_date  # noqa: E402
+from transactions import TransactionTable  # noqa: E402
+
+
+def legacy_create_comparison_table(bank_data, ssbo_data):
+    """The per-row implementation the engine replaced, kept for comparison"""
+    comparison_rows = []
+    ssbo_lookup = {}
+    for ssbo_item in ssbo_data:
+        key = (standardize_date(ssbo_item['Event Time']), normalize_amount(ssbo_item['Amount']),
+               normalize_tx_type(ssbo_item.get('Transaction Type')))
+        ssbo_lookup.setdefault(key, []).append(ssbo_item)
+
+    for bank_item in bank_data:
+        bank_date = bank_item['Event Time']
+        bank_amount = normalize_amount(bank_item['Amount'])
+        bank_tx_type = normalize_tx_type(bank_item.get('Transaction Type'))
+        bank_tx_display = bank_item.get('Transaction Type') or (bank_tx_type.capitalize() if bank_tx_type else 'Unknown')
+        ssbo_key = (standardize_date(bank_date), bank_amount, bank_tx_type)
+        if ssbo_key in ssbo_lookup and len(ssbo_lookup[ssbo_key]) > 0:
+            ssbo_item = ssbo_lookup[ssbo_key].pop(0)
+            status = "Tally"
+        else:
+            status = "Not Tally"
+        comparison_rows.append({
+            'Date_A': bank_date,
+            'Description_A': bank_item['Description/Remarks'],
+            'Type_A': bank_tx_display,
+            'Amount_A': bank_amount,
+            'Date_B': ssbo_item['Event Time'] if status == "Tally" else "No match",
+            'Description_B': ssbo_item['Remark'] if status == "Tally" else "No match",
+            'Type_B': ssbo_item['Transaction Type'] if status == "Tally" else "No match",
+            'Amount_B': ssbo_item['Amount'] if status == "Tally" else "No match",
+            'Status': status
+        })
+    return comparison_rows
+
+
+def generate(n, seed=0):
+    """Bank and SSBO rows with mixed date/amount formats, duplicate keys and ~10% unmatched"""
+    rng = random.Random(seed)
+    bank, ssbo = [], []
+    for i in range(n):
+        day = rng.randint(1, 28)
+        cents = rng.randint(100, 500000) if rng.random() > 0.2 else rng.choice([1000, 5000, 10000])
+        tx = rng.choice(["Deposit", "Transfer"])
+        bank.append({
+            "Event Time": f"{day}/8/2025",
+            "Amount": f"{cents / 100:,.2f}",
+            "Description/Remarks": f"TRF {i}",
+            "Transaction Type": tx,
+        })
+        if rng.random() < 0.9:
+            ssbo.append({
+                "Event Time": f"2025-08-{day:02d} {rng.randint(0, 23):02d}:00:00",
+                "Amount": cents / 100,
+                "Remark": f"ref {i}",
+                "Transaction Type": tx.lower(),
+            })
+    rng.shuffle(ssbo)
+    return bank, ssbo
+
+
+def same_rows(expected, frame):
+    if len(expected) != len(frame):
+        return False
+    records = frame.to_dict('records')
+    for a, b in zip(expected, records):
+        if (a['Status'], a['Description_A'], a['Description_B']) != (b['Status'], b['Description_A'], b['Description_B']):
+            return False
+        if a['Date_A'] != b['Date_A'] or round(a['Amount_A'] * 100) != round(b['Amount_A'] * 100):
+            return False
+        if a['Status'] == "Tally" and (a['Date_B'] != b['Date_B']
+                                       or round(normalize_amount(a['Amount_B']) * 100) != round(b['Amount_B'] * 100)):
+            return False
+    return True
+
+
+def check_duplicate_keys():
+    """More SSBO rows share a key than there are bank rows: the extras stay unclaimed"""
+    bank = [{"Event Time": "1/8/2025", "Amount": "100.00", "Description/Remarks": "TRF", "Transaction Type": "Deposit"}]
+    ssbo = [{"Event Time": "2025-08-01", "Amount": 100.0, "Remark": f"ref {i}", "Transaction Type": "deposit"}
+            for i in range(3)]
+    expected = legacy_create_comparison_table(bank, ssbo)
+    for tolerance in ({}, {"date_window_days": 1}):
+        frame = reconcile_frames(bank, ssbo, **tolerance)
+        assert same_rows(expected, frame), frame
+
+
+def crowded_tolerance(n):
+    """n bank and n SSBO rows on one day, every amount within tolerance of every other"""
+    bank = [{"Event Time": "1/8/2025", "Amount": f"{1000 + i / 50:.2f}", "Description/Remarks": f"TRF {i}",
+             "Transaction Type": "Deposit"} for i in range(n)]
+    ssbo = [{"Event Time": "2025-08-01", "Amount": round(1000 + i / 50 + 0.01, 2), "Remark": f"ref {i}",
+             "Transaction Type": "deposit"} for i in range(n)]
+    return bank, ssbo
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 100000, 1000000])
+    args = parser.parse_args()
+    check_duplicate_keys()
+
+    print(f"{'rows':>9} {'legacy s':>9} {'engine s':>9} {'speedup':>8} {'frames s':>9} {'speedup':>8} "
+          f"{'tables s':>9} {'speedup':>8}  equal")
+    for n in args.sizes:
+        bank, ssbo = generate(n)
+
+        start = time.perf_counter()
+        expected = legacy_create_comparison_table(bank, ssbo)
+        legacy = time.perf_counter() - start
+
+        start = time.perf_counter()
+        frame = reconcile_frames(bank, ssbo)
+        engine = time.perf_counter() - start
+
+        # Columnar input, as produced by exports/structured parsers
+        bank_df, ssbo_df = pd.DataFrame(bank), pd.DataFrame(ssbo)
+        start = time.perf_counter()
+        frame_from_frames = reconcile_frames(bank_df, ssbo_df)
+        frames = time.perf_counter() - start
+
+        bank_table = TransactionTable.from_rows(bank, 'bank')
+        ssbo_table = TransactionTable.from_rows(ssbo, 'ssbo')
+        start = time.perf_counter()
+        frame_from_tables = reconcile_frames(bank_table, ssbo_table)
+        tables = time.perf_counter() - start
+
+        equal = (same_rows(expected, frame) and frame.equals(frame_from_frames)
+                 and frame.equals(frame_from_tables))
+        print(f"{n:>9} {legacy:>9.3f} {engine:>9.3f} {legacy / engine:>7.1f}x "
+              f"{frames:>9.3f} {legacy / frames:>7.1f}x {tables:>9.3f} {legacy / tables:>7.1f}x  {equal}")
+
+    print(f"\n{'rows':>9} {'tolerance pass s':>17} {'matched':>8}")
+    for n in args.sizes:
+        bank, ssbo = crowded_tolerance(min(n, 100000))
+        start = time.perf_counter()
+        frame = reconcile_frames(bank, ssbo, amount_tolerance=len(bank) / 50)
+        seconds = time.perf_counter() - start
+        print(f"{len(bank):>9} {seconds:>17.3f} {int((frame['Status'] != 'Not Tally').sum()):>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Request coalescing and fair queuing across sessions, against the stub API.
+
+1. Four sessions extract the same screenshot at once: one API call.
+2. Under a 120 requests/min budget, session A queues 12 calls and session B
+   then asks for 2. Round-robin admission finishes B's calls long before A's
+   backlog clears; with everyone on one session B waits behind all of A.
+3. The stub throttles the first two requests: the retries are admitted
+   like any other request, so the scheduler grants every API call made.
+
+Usage: python -m benchmarks.bench_request_scheduler [--latency 0.3]
+"""
+import argparse
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.common import SampleUpload, load_app, render_table_image
+from benchmarks.stub_server import StubAnthropicServer
+
+
+def image(ref):
+    return render_table_image(["Event Time", "Amount", "Remark"], [["2025-08-15", "100.00", ref]] * 3)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--latency", type=float, default=0.3, help="stub latency per call (s)")
+    args = parser.parse_args()
+
+    with StubAnthropicServer(latency=args.latency) as stub:
+        app = load_app(stub.url)
+        from request_scheduler import RequestScheduler, bind_session
+
+        def extract(scheduler, data, session):
+            ocr = app.AnthropicOCR(app.ANTHROPIC_API_KEY, scheduler=scheduler)
+            return bind_session(ocr.extract_rows, session)(SampleUpload(data), app.SSBO_PROMPT, app.SSBO_MODEL)
+
+        scheduler = RequestScheduler()
+        shared = image("shared")
+        before = stub.request_count
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            list(executor.map(lambda s: extract(scheduler, shared, s), ["s1", "s2", "s3", "s4"]))
+        print(f"same screenshot from 4 sessions: {stub.request_count - before} API call(s), "
+              f"{scheduler.stats()['coalesced']} coalesced")
+
+        for label, b_session in (("one queue", "A"), ("fair", "B")):
+            scheduler = RequestScheduler(requests_per_minute=120)
+            scheduler.requests.level = 0  # start with the burst allowance spent
+            finished = {}
+            lock = threading.Lock()
+            start = time.perf_counter()
+
+            def job(session, i, tag):
+                # Distinct screenshots per run, so nothing is coalesced
+                extract(scheduler, image(f"{label} {tag} {i}"), session)
+                with lock:
+                    finished.setdefault(tag, []).append(time.perf_counter() - start)
+
+            with ThreadPoolExecutor(max_workers=16) as executor:
+                for i in range(12):
+                    executor.submit(job, "A", i, "A")
+                time.sleep(0.1)
+                for i in range(2):
+                    executor.submit(job, b_session, i, "B")
+            stats = scheduler.stats()
+            print(f"{label:<9} B done after {max(finished['B']):.2f}s, A done after {max(finished['A']):.2f}s; "
+                  f"wait mean {stats['wait_mean']:.2f}s p95 {stats['wait_p95']:.2f}s max {stats['wait_max']:.2f}s")
+
+    with StubAnthropicServer(latency=args.latency, throttle=lambda n, body: (429, 0) if n <= 2 else None) as stub:
+        app = load_app(stub.url)
+        scheduler = RequestScheduler()
+        extract(scheduler, image("throttled"), "A")
+        print(f"throttled twice: {stub.request_count} API calls, {scheduler.stats()['granted']} admitted")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""Cost of a Streamlit rerun after a reconciliation, with and without the run store.
+
+Before the run store, getting results back after any widget interaction
+meant clicking reconcile again: a full extraction (served from the OCR cache
+at best, two model calls at worst) plus matching. Now every rerun redraws the
+stored run. This measures, under AppTest:
+
+- reconcile:  clicking the button (stub latency per model call)
+- again:      clicking it a second time (OCR cache warm)
+- rerun:      any later rerun, which redraws the stored run
+- large:      redrawing a stored run with --rows comparison rows
+
+Usage: python -m benchmarks.bench_run_store [--latency 1.0] [--rows 20000] [--reruns 5]
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+from streamlit.testing.v1 import AppTest
+
+from benchmarks.bench_streaming import make_responder
+from benchmarks.common import load_app
+from benchmarks.stub_server import StubAnthropicServer
+
+
+def reconcile_script():
+    import streamlit as st
+
+    import app
+    from benchmarks.common import SampleUpload, render_table_image
+    image = render_table_image(["Event Time", "Amount", "Remark"], [["2025-08-15", "150.00", "ref"]] * 12)
+    tolerance = {'date_window_days': 0, 'amount_tolerance': 0.0, 'amount_tolerance_pct': 0.0}
+    app.reconcile_section(SampleUpload(image, "bank.png"), SampleUpload(image, "ssbo.png"), tolerance, False)
+    st.session_state.setdefault("redraws", [])
+
+
+def large_script():
+    import streamlit as st
+
+    import app
+    from benchmarks.bench_reconcile_engine import generate
+    from reconcile_engine import reconcile_frames
+    from run_store import StoredRun
+    from transactions import TransactionTable
+
+    if "large_run" not in st.session_state:
+        bank, ssbo = generate(st.session_state.rows)
+        bank, ssbo = TransactionTable.from_rows(bank, 'bank'), TransactionTable.from_rows(ssbo, 'ssbo')
+        result = {'success': True, 'data': bank, 'record_count': len(bank)}
+        st.session_state.large_run = StoredRun("large", result, {'success': True, 'data': ssbo,
+                                                                  'record_count': len(ssbo)},
+                                               reconcile_frames(bank, ssbo), None, {}, duration=0.0)
+    app.display_stored_run(st.session_state.large_run, {})
+
+
+def timed_run(at):
+    start = time.perf_counter()
+    at.run()
+    return time.perf_counter() - start
+
+
+def redraw_ms(at):
+    """The redraw time display_stored_run reports in its caption"""
+    for caption in at.caption:
+        if "redrawn in" in caption.value:
+            return float(caption.value.split("redrawn in ")[1].split(" ms")[0])
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--latency", type=float, default=1.0, help="stub seconds per model call")
+    parser.add_argument("--rows", type=int, default=20000, help="comparison rows of the large stored run")
+    parser.add_argument("--reruns", type=int, default=5)
+    args = parser.parse_args()
+
+    os.environ.setdefault("LEDGER_DIR", tempfile.mkdtemp(prefix="ledger_bench_"))
+    os.environ.setdefault("TRACE_DIR", tempfile.mkdtemp(prefix="traces_bench_"))
+    with StubAnthropicServer(latency=args.latency, responder=make_responder(12), chunk_interval=0.01) as stub:
+        load_app(stub.url)
+        at = AppTest.from_function(reconcile_script, default_timeout=120).run()
+
+        at.button(key="process_btn").click()
+        first, calls = timed_run(at), stub.request_count
+        at.button(key="process_btn").click()
+        again = timed_run(at)
+        reruns, redraws = [], []
+        for _ in range(args.reruns):
+            reruns.append(timed_run(at))
+            redraws.append(redraw_ms(at))
+        calls_after = stub.request_count
+
+    large = AppTest.from_function(large_script, default_timeout=300)
+    large.session_state["rows"] = args.rows
+    large.run()
+    large_runs, large_redraws = [], []
+    for _ in range(args.reruns):
+        large_runs.append(timed_run(large))
+        large_redraws.append(redraw_ms(large))
+
+    print(f"stub latency {args.latency:.1f}s; {calls} model calls on the first click, "
+          f"{calls_after - calls} after it")
+    print(f"{'step':<10} {'rerun':>9} {'redraw':>9}")
+    print(f"{'reconcile':<10} {first:>8.3f}s {'':>9}")
+    print(f"{'again':<10} {again:>8.3f}s {'':>9}")
+    print(f"{'rerun':<10} {statistics.median(reruns):>8.3f}s {statistics.median(redraws):>7.0f}ms")
+    print(f"{'large':<10} {statistics.median(large_runs):>8.3f}s {statistics.median(large_redraws):>7.0f}ms"
+          f"  ({args.rows} rows)")
+
+
+if __name__ == "__main__":
+    main()
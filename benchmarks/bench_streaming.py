@@ -0,0 +1,73 @@
+"""Time to first row: blocking vs streamed extraction against the stub API.
+
+The stub generates the reply in chunks, so a blocking request waits for the
+whole array while a streamed one can hand over the first row after roughly
+the time to first token.
+
+Usage: python -m benchmarks.bench_streaming [--rows 40] [--latency 0.5] [--chunk-interval 0.02]
+"""
+import argparse
+import json
+import time
+
+from benchmarks.common import SampleUpload, load_app, render_table_image
+from benchmarks.stub_server import StubAnthropicServer
+
+
+def make_responder(count):
+    def responder(payload):
+        prompt = payload["messages"][0]["content"][0]["text"]
+        remark = "Description/Remarks" if "Description/Remarks" in prompt else "Remark"
+        rows = [{"Event Time": f"2025-08-{i % 28 + 1:02d}", "Amount": f"{1000 + i:,}.00",
+                 remark: f"DUITNOW TRF REF {i:06d}", "Transaction Type": "Deposit"} for i in range(count)]
+        return "```json\n" + json.dumps(rows, indent=2) + "\n```"
+    return responder
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=40)
+    parser.add_argument("--latency", type=float, default=0.5, help="stub time to first token (s)")
+    parser.add_argument("--chunk-interval", type=float, default=0.02, help="stub seconds per 16-char chunk")
+    args = parser.parse_args()
+
+    image = render_table_image(["Event Time", "Amount", "Remark"], [["2025-08-15", "150.00", "ref"]] * 10)
+
+    with StubAnthropicServer(latency=args.latency, responder=make_responder(args.rows),
+                             chunk_interval=args.chunk_interval) as stub:
+        app = load_app(stub.url)
+        ocr = app.AnthropicOCR(app.ANTHROPIC_API_KEY)
+
+        start = time.perf_counter()
+        rows = ocr.extract_rows(SampleUpload(image, "ssbo.png"), app.SSBO_PROMPT, app.SSBO_MODEL)
+        blocking = time.perf_counter() - start
+        assert len(rows) == args.rows
+
+        first = []
+        start = time.perf_counter()
+        rows = ocr.extract_rows(SampleUpload(image, "ssbo.png"), app.SSBO_PROMPT, app.SSBO_MODEL,
+                                on_row=lambda row: first or first.append(time.perf_counter() - start))
+        streamed = time.perf_counter() - start
+        assert len(rows) == args.rows
+
+        # Both sides through the app's event stream: when can matching start?
+        start = time.perf_counter()
+        ssbo_done = first_match = None
+        bank_rows = 0
+        for kind, side, payload in app.stream_statements(SampleUpload(image, "bank.png"),
+                                                         SampleUpload(image, "ssbo.png")):
+            if kind == "done" and side == "ssbo":
+                ssbo_done = time.perf_counter() - start
+            bank_rows += kind == "row" and side == "bank"
+            if first_match is None and ssbo_done is not None and bank_rows:
+                first_match = time.perf_counter() - start
+        both = time.perf_counter() - start
+
+    print(f"{args.rows} rows, {stub.request_count} API calls")
+    print(f"blocking   first row {blocking:.2f}s  all rows {blocking:.2f}s")
+    print(f"streamed   first row {first[0]:.2f}s  all rows {streamed:.2f}s")
+    print(f"bank+ssbo  first provisional match {first_match:.2f}s  both sides done {both:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""Reconcile structured bank/SSBO exports end to end, with no model calls.
+
+Usage: python -m benchmarks.bench_structured_ingestion [--rows 50000]
+"""
+import argparse
+import csv
+import io
+import random
+import time
+
+from benchmarks.common import SampleUpload, load_app
+from benchmarks.stub_server import StubAnthropicServer
+
+
+def make_exports(n, seed=0):
+    """A bank CSV with a preamble and Debit/Credit columns, and the matching SSBO CSV"""
+    rng = random.Random(seed)
+    bank, ssbo = io.StringIO(), io.StringIO()
+    bank.write("Account: 123-456-789\nStatement period: 01/08/2025 - 31/08/2025\n\n")
+    bank_writer, ssbo_writer = csv.writer(bank), csv.writer(ssbo)
+    bank_writer.writerow(["Date", "Description", "Debit", "Credit", "Balance"])
+    ssbo_writer.writerow(["Event Time", "Transaction Type", "Amount", "Remark", "Operator"])
+    for i in range(n):
+        day = rng.randint(1, 28)
+        amount = f"{rng.randint(100, 500000) / 100:,.2f}"
+        deposit = rng.random() < 0.7
+        bank_writer.writerow([f"{day:02d}/08/2025", f"TRF {i}", "" if deposit else amount, amount if deposit else "", "0.00"])
+        if rng.random() < 0.95:
+            ssbo_writer.writerow([f"2025-08-{day:02d} 12:00:00", "Deposit" if deposit else "Transfer", amount, f"ref {i}", "op"])
+        if rng.random() < 0.05:
+            ssbo_writer.writerow([f"2025-08-{day:02d} 12:00:00", "Withdraw", amount, "ignored", "op"])
+    return bank.getvalue().encode("utf-8"), ssbo.getvalue().encode("utf-8")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=50000)
+    args = parser.parse_args()
+
+    bank_csv, ssbo_csv = make_exports(args.rows)
+    with StubAnthropicServer(latency=5.0) as stub:
+        app = load_app(stub.url)
+
+        start = time.perf_counter()
+        bank, ssbo = app.process_statements_concurrently(
+            SampleUpload(bank_csv, "bank.csv", "text/csv"), SampleUpload(ssbo_csv, "ssbo.csv", "text/csv")
+        )
+        parsed = time.perf_counter()
+        assert bank["success"] and ssbo["success"], (bank.get("error"), ssbo.get("error"))
+        comparison = app.reconcile_frames(bank["data"], ssbo["data"])
+        done = time.perf_counter()
+
+    counts = comparison["Status"].value_counts().to_dict()
+    print(f"bank rows {bank['record_count']}, ssbo rows {ssbo['record_count']}, statuses {counts}")
+    print(f"parse {parsed - start:.3f}s + reconcile {done - parsed:.3f}s = {done - start:.3f}s, "
+          f"API calls: {stub.request_count}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""Single-image vs row-band tiled extraction of a tall table against the stub API.
+
+The stub's latency grows with the image height, approximating a model whose
+response time scales with the number of rows it has to read.
+
+Usage: python -m benchmarks.bench_tiling [--rows 120] [--per-row 0.02]
+"""
+import argparse
+import io
+import time
+
+from PIL import Image
+
+from benchmarks.common import SampleUpload, load_app, render_table_image
+from benchmarks.stub_server import StubAnthropicServer, request_image_bytes
+
+ROW_HEIGHT = 28
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=120)
+    parser.add_argument("--base", type=float, default=0.2, help="fixed stub latency per call (s)")
+    parser.add_argument("--per-row", type=float, default=0.02, help="extra stub latency per table row (s)")
+    args = parser.parse_args()
+
+    def latency(payload):
+        # The optimizer may send WebP, so read the height from the decoded image
+        height = Image.open(io.BytesIO(request_image_bytes(payload))).height
+        return args.base + args.per_row * height / ROW_HEIGHT
+
+    rows = [[f"2025-08-{i % 28 + 1:02d}", f"{i * 10 + 5}.00", f"ref {i}"] for i in range(args.rows)]
+    image = render_table_image(["Event Time", "Amount", "Remark"], rows, row_height=ROW_HEIGHT)
+
+    with StubAnthropicServer(latency=latency) as stub:
+        app = load_app(stub.url)
+        ocr = app.AnthropicOCR(app.ANTHROPIC_API_KEY)
+
+        start = time.perf_counter()
+        ocr.extract_rows(SampleUpload(image), app.SSBO_PROMPT, app.SSBO_MODEL)
+        single = time.perf_counter() - start
+
+        calls_before = stub.request_count
+        start = time.perf_counter()
+        ocr.extract_rows_tiled(SampleUpload(image), app.SSBO_PROMPT, app.SSBO_MODEL)
+        tiled = time.perf_counter() - start
+        bands = stub.request_count - calls_before
+
+    print(f"rows={args.rows} bands={bands} workers={app.TILE_MAX_WORKERS}")
+    print(f"single image {single:.3f}s")
+    print(f"tiled        {tiled:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Memory per row of extracted transactions: lists of dicts, DataFrames and TransactionTables.
+
+Bank and SSBO rows (benchmarks.bench_reconcile_engine.generate) are decoded
+from JSON, as the model's reply is, then held as:
+
+- rows:   the lists of dicts the app kept before
+- frame:  pd.DataFrame of those rows
+- table:  TransactionTable (int32 days, int64 cents, int8 type codes,
+          Arrow-backed text and dates as read)
+
+Rows are measured with tracemalloc (what they keep allocated), frames with
+memory_usage(deep=True) and tables with nbytes, since Arrow buffers are
+allocated outside tracemalloc's view. Matching is then timed from the rows
+(parsing included, as before) and from the tables, with the tracemalloc
+peak of each.
+
+Usage: python -m benchmarks.bench_transaction_store [--sizes 1000 100000 1000000]
+"""
+import argparse
+import gc
+import json
+import time
+import tracemalloc
+
+import pandas as pd
+
+from benchmarks.bench_reconcile_engine import generate
+from reconcile_engine import reconcile_frames
+from transactions import TEXT_DTYPE, TransactionTable
+
+
+def retained(build):
+    """(result of build, bytes it keeps allocated)"""
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, size
+
+
+def timed_peak(func):
+    """(seconds, tracemalloc peak bytes) of one call"""
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    func()
+    seconds = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return seconds, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 100000, 1000000])
+    args = parser.parse_args()
+
+    print(f"text dtype: {TEXT_DTYPE or 'interned Python strings'}; bytes per row, bank and SSBO together")
+    print(f"{'rows':>9} {'rows B':>8} {'frame B':>8} {'table B':>8} {'saved':>6} "
+          f"{'match rows s':>13} {'peak MB':>8} {'match table s':>14} {'peak MB':>8}")
+    for n in args.sizes:
+        replies = {side: json.dumps(rows) for side, rows in zip(('bank', 'ssbo'), generate(n))}
+        count = sum(len(json.loads(reply)) for reply in replies.values())
+
+        rows, rows_bytes = retained(lambda: {side: json.loads(reply) for side, reply in replies.items()})
+        frame_bytes = sum(int(pd.DataFrame(data).memory_usage(deep=True).sum()) for data in rows.values())
+        tables = {side: TransactionTable.from_rows(data, side) for side, data in rows.items()}
+        table_bytes = sum(table.nbytes for table in tables.values())
+
+        from_rows = timed_peak(lambda: reconcile_frames(rows['bank'], rows['ssbo']))
+        from_tables = timed_peak(lambda: reconcile_frames(tables['bank'], tables['ssbo']))
+        print(f"{n:>9} {rows_bytes / count:>8.1f} {frame_bytes / count:>8.1f} {table_bytes / count:>8.1f} "
+              f"{rows_bytes / table_bytes:>5.1f}x {from_rows[0]:>13.3f} {from_rows[1] / 2 ** 20:>8.1f} "
+              f"{from_tables[0]:>14.3f} {from_tables[1] / 2 ** 20:>8.1f}")
+        del rows, tables
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Per-rerun image work for an upload, before and after the artifact cache.
+
+"preview" is what display_upload_status does on every Streamlit rerun;
+"encode" is what each reconcile click does before the API call.
+
+Usage: python -m benchmarks.bench_upload_rerun [--scale 3] [--rows 40] [--reruns 20]
+"""
+import argparse
+import base64
+import io
+import time
+
+from PIL import Image
+
+from benchmarks.common import SampleUpload, load_app, render_table_image
+
+
+def legacy_preview(upload):
+    # Image.open + st.image(PIL image), which re-encodes the full image each run
+    image = Image.open(upload)
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    upload.seek(0)
+
+
+def legacy_encode(upload):
+    image = Image.open(io.BytesIO(upload.getbuffer().tobytes()))
+    buffer = io.BytesIO()
+    image.convert("L").save(buffer, format="PNG")
+    base64.b64encode(buffer.getvalue()).decode("utf-8")
+
+
+def timed(func, reruns):
+    start = time.perf_counter()
+    func()
+    first = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(reruns):
+        func()
+    return first, (time.perf_counter() - start) / reruns
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", type=int, default=3)
+    parser.add_argument("--rows", type=int, default=40)
+    parser.add_argument("--reruns", type=int, default=20)
+    args = parser.parse_args()
+
+    rows = [[f"2025-08-{i % 28 + 1:02d}", f"{i * 37.5:,.2f}", f"DUITNOW TRF {i:06d}"] for i in range(args.rows)]
+    png = render_table_image(["Event Time", "Amount", "Description/Remarks"], rows, scale=args.scale, striped=True)
+    upload = SampleUpload(png, "bank.png")
+    upload.file_id = "bench-upload"
+
+    app = load_app("http://127.0.0.1:9")
+    ocr = app.AnthropicOCR(app.ANTHROPIC_API_KEY)
+
+    print(f"upload {len(png)} bytes, {Image.open(io.BytesIO(png)).size}")
+    print(f"{'stage':<8} {'variant':<8} {'first ms':>9} {'rerun ms':>9}")
+    for stage, legacy, cached in (
+        ("preview", legacy_preview, lambda: app.get_upload_artifacts(upload).preview),
+        ("encode", legacy_encode, lambda: ocr.encode_image_from_file(upload)),
+    ):
+        first, rerun = timed(lambda: legacy(upload), args.reruns)
+        print(f"{stage:<8} {'legacy':<8} {first * 1000:>9.1f} {rerun * 1000:>9.3f}")
+        first, rerun = timed(cached, args.reruns)
+        print(f"{stage:<8} {'cached':<8} {first * 1000:>9.1f} {rerun * 1000:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Shared helpers for the benchmark scripts"""
+import io
+import os
+import sys
+import tempfile
+
+from PIL import Image, ImageDraw, ImageFont
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def add_repo_to_path():
+    """Make the top-level app modules importable from a benchmark"""
+    if REPO_ROOT not in sys.path:
+        sys.path.insert(0, REPO_ROOT)
+
+
+def load_app(stub_url):
+    """Import app.py with the Anthropic client pointed at a stub server"""
+    os.environ["ANTHROPIC_BASE_URL"] = stub_url
+    os.environ.setdefault("ANTHROPIC_API_KEY", "stub-key")
+    # Keep benchmark cache entries out of the working tree
+    os.environ.setdefault("OCR_CACHE_DIR", tempfile.mkdtemp(prefix="ocr_cache_bench_"))
+    add_repo_to_path()
+    import app
+    app.ANTHROPIC_API_KEY = app.ANTHROPIC_API_KEY or "stub-key"
+    return app
+
+
+class SampleUpload(io.BytesIO):
+    """Minimal stand-in for Streamlit's UploadedFile"""
+
+    def __init__(self, data, name="sample.png", type="image/png"):
+        super().__init__(data)
+        self.name = name
+        self.type = type
+        self.size = len(data)
+
+
+def render_table_image(header, rows, row_height=28, col_width=180, scale=1, striped=False):
+    """
+    Draw a plain grid table and return it as PNG bytes
+    
+    scale multiplies every dimension (2 or 3 mimics a retina phone
+    screenshot); striped shades alternate rows like many banking apps.
+    """
+    row_height *= scale
+    col_width *= scale
+    font = ImageFont.load_default(size=12 * scale)
+    width = col_width * len(header)
+    height = row_height * (len(rows) + 1)
+    image = Image.new("RGB", (width, height), "white")
+    draw = ImageDraw.Draw(image)
+    for r, values in enumerate([header] + list(rows)):
+        y = r * row_height
+        if striped and r % 2:
+            draw.rectangle([(0, y), (width, y + row_height)], fill=(232, 240, 254))
+        draw.line([(0, y), (width, y)], fill="black", width=scale)
+        for c, value in enumerate(values):
+            draw.text((c * col_width + 6 * scale, y + 8 * scale), str(value), fill="black", font=font)
+    draw.line([(0, height - 1), (width, height - 1)], fill="black", width=scale)
+
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
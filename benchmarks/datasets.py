@@ -0,0 +1,78 @@
+"""Synthetic bank/SSBO transaction sets for the benchmarks"""
+import random
+from datetime import date, timedelta
+
+BANK_HEADER = ["Date", "Description", "Type", "Amount"]
+SSBO_HEADER = ["Event Time", "Transaction Type", "Amount", "Remark", "Operator"]
+TYPES = ["Deposit", "Transfer"]
+OPERATORS = ["ops01", "Alice", "jay_b", "Wong Li"]
+
+
+def generate_transactions(size, duplicate_rate=0.05, date_skew=0.0, max_skew_days=1, unmatched_rate=0.05,
+                          start=date(2025, 8, 1), days=28, seed=0):
+    """
+    Bank rows and the SSBO rows recording them
+
+    Bank rows look like the model's bank extraction (d/m/yyyy dates, amounts
+    as "1,234.50" strings); SSBO rows like its SSBO extraction (timestamps,
+    float amounts). Every SSBO row records one bank row.
+
+    Args:
+        size: Number of bank rows
+        duplicate_rate: Share of bank rows repeating an earlier row's date,
+            amount and type (e.g. two identical transfers on one day)
+        date_skew: Share of SSBO rows dated up to max_skew_days away from
+            their bank row, as when deposits are posted late
+        max_skew_days: Largest date difference of a skewed row
+        unmatched_rate: Share of bank rows with no SSBO row
+        start: First transaction date
+        days: Number of days the transactions are spread over
+        seed: Random seed
+
+    Returns:
+        Tuple of (bank rows, SSBO rows, number of exact matches expected)
+    """
+    rng = random.Random(seed)
+    bank, ssbo, keys = [], [], []
+    exact = 0
+    for i in range(size):
+        if keys and rng.random() < duplicate_rate:
+            day, cents, kind = rng.choice(keys)
+        else:
+            day = start + timedelta(days=rng.randrange(days))
+            cents = rng.randint(100, 500000) if rng.random() > 0.2 else rng.choice([1000, 5000, 10000])
+            kind = rng.choice(TYPES)
+            keys.append((day, cents, kind))
+        bank.append({
+            "Event Time": f"{day.day}/{day.month}/{day.year}",
+            "Amount": f"{cents / 100:,.2f}",
+            "Description/Remarks": f"DUITNOW TRF {i:06d}",
+            "Transaction Type": kind,
+        })
+        if rng.random() < unmatched_rate:
+            continue
+        posted = day
+        if rng.random() < date_skew:
+            posted += timedelta(days=rng.choice([-1, 1]) * rng.randint(1, max_skew_days))
+        else:
+            exact += 1
+        ssbo.append({
+            "Event Time": f"{posted.isoformat()} {rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}:00",
+            "Amount": cents / 100,
+            "Remark": f"ref {i}",
+            "Transaction Type": kind,
+        })
+    rng.shuffle(ssbo)
+    return bank, ssbo, exact
+
+
+def bank_cells(rows):
+    """Table cells for rendering bank rows under BANK_HEADER"""
+    return [[row["Event Time"], row["Description/Remarks"], row["Transaction Type"], row["Amount"]] for row in rows]
+
+
+def ssbo_cells(rows, seed=0):
+    """Table cells for rendering SSBO rows under SSBO_HEADER"""
+    rng = random.Random(seed)
+    return [[row["Event Time"], row["Transaction Type"], f"{row['Amount']:,.2f}", row["Remark"],
+             rng.choice(OPERATORS)] for row in rows]
@@ -0,0 +1,268 @@
+"""Local stand-in for the Anthropic Messages API.
+
+Answers ``POST /v1/messages`` after a configurable delay with a canned
+assistant message, so the OCR pipeline can be timed without network access
+or API cost. Requests with ``"stream": true`` get the reply as server-sent
+events, paced like a model generating tokens. ``/v1/messages/batches``
+stands in for the Message Batches API: a batch ends ``batch_delay`` seconds
+after it is created and its results come from the same responder.
+"""
+import base64
+import datetime
+import itertools
+import json
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def default_responder(payload):
+    """Return an empty JSON array for every request"""
+    return "[]"
+
+
+def request_image_bytes(payload) -> bytes:
+    """Decode the first base64 image block of a Messages API request"""
+    for block in payload["messages"][0]["content"]:
+        if block.get("type") == "image":
+            return base64.b64decode(block["source"]["data"])
+    return b""
+
+
+def _forced_tool(payload):
+    """Name of the tool a request forces with tool_choice, if any"""
+    choice = payload.get("tool_choice") or {}
+    return choice.get("name") if choice.get("type") == "tool" else None
+
+
+def _tool_input(text):
+    """Wrap the JSON array in a responder's text as a rows tool input"""
+    try:
+        return {"rows": json.loads(text[text.index("["):text.rindex("]") + 1])}
+    except ValueError:
+        return {"note": text}
+
+
+def _message(payload, text):
+    tool = _forced_tool(payload)
+    if tool:
+        content = [{"type": "tool_use", "id": "toolu_stub", "name": tool, "input": _tool_input(text)}]
+    else:
+        content = [{"type": "text", "text": text}]
+    return {
+        "id": "msg_stub",
+        "type": "message",
+        "role": "assistant",
+        "model": payload.get("model", "stub"),
+        "content": content,
+        "stop_reason": "tool_use" if tool else "end_turn",
+        "stop_sequence": None,
+        "usage": {"input_tokens": 0, "output_tokens": len(text) // 4},
+    }
+
+
+def _timestamp(seconds):
+    return datetime.datetime.fromtimestamp(seconds, datetime.timezone.utc).isoformat()
+
+
+class StubAnthropicServer:
+    def __init__(self, latency=1.0, responder=default_responder, host="127.0.0.1", port=0,
+                 chunk_chars=16, chunk_interval=0.0, throttle=None, batch_delay=1.0):
+        """
+        Args:
+            latency: Seconds to wait before answering each request, or a
+                callable taking the decoded request body and returning seconds
+            responder: Callable taking the decoded request body and returning
+                the assistant text for the reply
+            host: Interface to bind
+            port: Port to bind (0 picks a free one)
+            chunk_chars: Characters of reply text per generated "token" chunk
+            chunk_interval: Seconds spent generating each chunk. Streamed
+                replies send each chunk as it is generated; plain replies
+                wait for all of them, as the real API does
+            throttle: Optional callable taking the 1-based request number and
+                the decoded request body, returning None to answer normally or
+                (status, retry_after_seconds) to reject the request, e.g.
+                (429, 1) or (529, None)
+            batch_delay: Seconds from creating a message batch until it ends
+        """
+        self.latency = latency
+        self.responder = responder
+        self.chunk_chars = chunk_chars
+        self.chunk_interval = chunk_interval
+        self.throttle = throttle
+        self.throttled_count = 0
+        self.batch_delay = batch_delay
+        self.batches = {}
+        self._batch_ids = itertools.count(1)
+        self.request_count = 0
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _batch_object(self, batch_id):
+        batch = self.batches[batch_id]
+        ended = time.time() >= batch["created"] + self.batch_delay
+        count = len(batch["requests"])
+        return {
+            "id": batch_id,
+            "type": "message_batch",
+            "processing_status": "ended" if ended else "in_progress",
+            "request_counts": {"processing": 0 if ended else count, "succeeded": count if ended else 0,
+                               "errored": 0, "canceled": 0, "expired": 0},
+            "created_at": _timestamp(batch["created"]),
+            "ended_at": _timestamp(batch["created"] + self.batch_delay) if ended else None,
+            "expires_at": _timestamp(batch["created"] + 86400),
+            "archived_at": None,
+            "cancel_initiated_at": None,
+            "results_url": f"{self.url}/v1/messages/batches/{batch_id}/results" if ended else None,
+        }
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                # Headers and body go out in separate writes; don't let Nagle delay the body
+                self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                payload = json.loads(self.rfile.read(length) or b"{}")
+                if self.path.startswith("/v1/messages/batches"):
+                    with server._lock:
+                        batch_id = f"msgbatch_stub_{next(server._batch_ids)}"
+                        server.batches[batch_id] = {"created": time.time(), "requests": payload["requests"]}
+                    self._send_json(server._batch_object(batch_id))
+                    return
+
+                with server._lock:
+                    server.request_count += 1
+                    number = server.request_count
+
+                rejection = server.throttle(number, payload) if server.throttle else None
+                if rejection is not None:
+                    with server._lock:
+                        server.throttled_count += 1
+                    self._send_error(*rejection)
+                    return
+
+                latency = server.latency(payload) if callable(server.latency) else server.latency
+                reply = server.responder(payload)
+                # A forced tool call streams its input as JSON instead of text
+                text = json.dumps(_tool_input(reply)) if _forced_tool(payload) else reply
+                chunks = [text[i:i + server.chunk_chars] for i in range(0, len(text), server.chunk_chars)] or [""]
+                if payload.get("stream"):
+                    time.sleep(latency)
+                    self._send_stream(payload, chunks, server.chunk_interval)
+                    return
+
+                time.sleep(latency + server.chunk_interval * len(chunks))
+                self._send_json(_message(payload, reply))
+
+            def do_GET(self):
+                parts = self.path.split("?")[0].strip("/").split("/")
+                # v1/messages/batches/<id>[/results]
+                batch_id = parts[3] if len(parts) >= 4 and parts[:3] == ["v1", "messages", "batches"] else None
+                if batch_id not in server.batches:
+                    self._send_error(404, None)
+                    return
+                if parts[4:] != ["results"]:
+                    self._send_json(server._batch_object(batch_id))
+                    return
+
+                lines = []
+                for request in server.batches[batch_id]["requests"]:
+                    message = _message(request["params"], server.responder(request["params"]))
+                    lines.append(json.dumps({"custom_id": request["custom_id"],
+                                             "result": {"type": "succeeded", "message": message}}))
+                body = ("\n".join(lines) + "\n").encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/binary")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _send_json(self, obj, status=200):
+                body = json.dumps(obj).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _send_error(self, status, retry_after):
+                kind = "overloaded_error" if status == 529 else "rate_limit_error" if status == 429 else "api_error"
+                kind = "not_found_error" if status == 404 else kind
+                body = json.dumps({"type": "error", "error": {"type": kind, "message": "stub rejection"}}).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                if retry_after is not None:
+                    self.send_header("retry-after", str(retry_after))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _send_event(self, event):
+                self.wfile.write(f"event: {event['type']}\ndata: {json.dumps(event)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+
+            def _send_stream(self, payload, chunks, interval):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                self.close_connection = True
+
+                self._send_event({"type": "message_start", "message": {
+                    "id": "msg_stub", "type": "message", "role": "assistant",
+                    "model": payload.get("model", "stub"), "content": [],
+                    "stop_reason": None, "stop_sequence": None,
+                    "usage": {"input_tokens": 0, "output_tokens": 0},
+                }})
+                tool = _forced_tool(payload)
+                if tool:
+                    block = {"type": "tool_use", "id": "toolu_stub", "name": tool, "input": {}}
+                else:
+                    block = {"type": "text", "text": ""}
+                self._send_event({"type": "content_block_start", "index": 0, "content_block": block})
+                for chunk in chunks:
+                    time.sleep(interval)
+                    delta = ({"type": "input_json_delta", "partial_json": chunk} if tool
+                             else {"type": "text_delta", "text": chunk})
+                    self._send_event({"type": "content_block_delta", "index": 0, "delta": delta})
+                self._send_event({"type": "content_block_stop", "index": 0})
+                self._send_event({"type": "message_delta",
+                                  "delta": {"stop_reason": "tool_use" if tool else "end_turn", "stop_sequence": None},
+                                  "usage": {"output_tokens": sum(len(c) for c in chunks) // 4}})
+                self._send_event({"type": "message_stop"})
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,163 @@
+"""
+Token-budget-aware image optimizer for OCR payloads
+
+Screenshots from high-DPI phones are far larger than the resolution the model
+actually reads at. This module downsamples to the model's useful ceiling while
+keeping text above a readable glyph height, optionally binarizes or quantizes,
+and picks the smallest lossless encoding.
+"""
+import io
+import math
+
+import cv2
+import numpy as np
+from PIL import Image, features
+
+# Claude downsizes anything beyond roughly these limits before reading it
+MAX_LONG_EDGE = 1568
+MAX_PIXELS = 1_150_000
+# Approximate image token cost: width * height / 750
+PIXELS_PER_TOKEN = 750
+# Smallest character height (px) that still OCRs reliably
+MIN_GLYPH_HEIGHT = 12
+
+OPTIMIZER_MODES = ("gray", "binary", "quantize")
+QUANTIZE_LEVELS = 16
+
+
+def estimate_image_tokens(width: int, height: int) -> int:
+    """Estimate input tokens for an image, after the model's own downscaling"""
+    scale = min(1.0, MAX_LONG_EDGE / max(width, height, 1), math.sqrt(MAX_PIXELS / max(width * height, 1)))
+    return math.ceil((width * scale) * (height * scale) / PIXELS_PER_TOKEN)
+
+
+def estimate_glyph_height(gray: np.ndarray):
+    """
+    Estimate the typical character height in pixels
+    
+    Uses the median height of text-sized connected components. Returns None
+    when no text-like components are found.
+    """
+    _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    count, _, stats, _ = cv2.connectedComponentsWithStats(binary, connectivity=8)
+    heights = stats[1:count, cv2.CC_STAT_HEIGHT]
+    widths = stats[1:count, cv2.CC_STAT_WIDTH]
+    
+    # Ignore specks, table rules and large graphics
+    max_height = max(gray.shape[0] // 10, 5)
+    mask = (heights >= 4) & (heights <= max_height) & (widths <= heights * 3)
+    if not mask.any():
+        return None
+    return float(np.median(heights[mask]))
+
+
+def choose_scale(width: int, height: int, glyph_height=None, min_glyph_height=MIN_GLYPH_HEIGHT) -> float:
+    """
+    Pick a downscale factor (<= 1) for an image
+    
+    Shrinks to the model's resolution ceiling and no further. The glyph floor
+    only limits that: when the ceiling would push text under
+    min_glyph_height, the image is shrunk just to the floor instead (or not
+    at all, if the text is already under it).
+    """
+    scale = min(1.0, MAX_LONG_EDGE / max(width, height), math.sqrt(MAX_PIXELS / (width * height)))
+    if glyph_height and glyph_height * scale < min_glyph_height:
+        scale = min(1.0, min_glyph_height / glyph_height)
+    return scale
+
+
+def _resize(gray: np.ndarray, scale: float) -> np.ndarray:
+    height, width = gray.shape
+    return cv2.resize(gray, (max(1, round(width * scale)), max(1, round(height * scale))),
+                      interpolation=cv2.INTER_AREA)
+
+
+def _encode_candidates(image: Image.Image):
+    """Yield (media_type, bytes) for every lossless encoding available"""
+    buffer = io.BytesIO()
+    image.save(buffer, format='PNG', optimize=True)
+    yield "image/png", buffer.getvalue()
+    
+    if features.check('webp'):
+        buffer = io.BytesIO()
+        image.save(buffer, format='WEBP', lossless=True, method=6)
+        yield "image/webp", buffer.getvalue()
+
+
+def optimize_image(image, original_bytes=None, mode="gray", min_glyph_height=MIN_GLYPH_HEIGHT) -> dict:
+    """
+    Shrink an image for OCR without losing legibility
+    
+    The glyph height is measured on the image already shrunk to the model's
+    resolution ceiling, so the connected-component pass never runs at full
+    size on a large screenshot; the full-size pixels are only read by the
+    final resize.
+    
+    Args:
+        image: Decoded PIL image, or a 2-D uint8 grayscale array (used
+            without a copy)
+        original_bytes: Size of the uploaded file, for the report
+        mode: "gray" (grayscale only), "binary" (Otsu black/white) or
+            "quantize" (QUANTIZE_LEVELS gray levels)
+        min_glyph_height: Readable glyph height floor in pixels
+        
+    Returns:
+        Dict with the encoded 'data', its 'media_type', and a size/token
+        report; 'glyph_floor' is True when the glyph floor kept the image
+        above the resolution ceiling
+    """
+    if mode not in OPTIMIZER_MODES:
+        raise ValueError(f"Unknown optimizer mode: {mode}")
+    
+    gray = image if isinstance(image, np.ndarray) else np.asarray(image.convert('L'))
+    height, width = gray.shape
+    
+    # Glyph heights scale with the image, so measure them at the ceiling
+    ceiling = choose_scale(width, height)
+    measured = _resize(gray, ceiling) if ceiling < 1.0 else gray
+    glyph_height = estimate_glyph_height(measured)
+    if glyph_height is not None:
+        glyph_height /= ceiling
+    scale = choose_scale(width, height, glyph_height, min_glyph_height)
+    if scale == ceiling:
+        gray = measured
+    elif scale < 1.0:
+        gray = _resize(gray, scale)
+    del measured
+    
+    if mode == "binary":
+        _, gray = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        optimized = Image.fromarray(gray).convert('1')
+    elif mode == "quantize":
+        step = 256 // QUANTIZE_LEVELS
+        optimized = Image.fromarray((gray // step * step + step // 2).astype(np.uint8))
+    else:
+        optimized = Image.fromarray(gray)
+    
+    media_type, data = min(_encode_candidates(optimized), key=lambda candidate: len(candidate[1]))
+    
+    return {
+        'data': data,
+        'media_type': media_type,
+        'mode': mode,
+        'scale': scale,
+        'glyph_height': glyph_height,
+        'glyph_floor': scale > ceiling,
+        'original_size': (width, height),
+        'optimized_size': optimized.size,
+        'original_bytes': original_bytes,
+        'optimized_bytes': len(data),
+        'original_tokens': estimate_image_tokens(width, height),
+        'optimized_tokens': estimate_image_tokens(*optimized.size),
+    }
+
+
+def format_report(report: dict) -> str:
+    """One-line summary of an optimize_image report"""
+    return (
+        f"{report['original_size'][0]}x{report['original_size'][1]} -> "
+        f"{report['optimized_size'][0]}x{report['optimized_size'][1]} ({report['mode']}, {report['media_type']}), "
+        f"bytes {report['original_bytes']} -> {report['optimized_bytes']}, "
+        f"~tokens {report['original_tokens']} -> {report['optimized_tokens']}"
+        + (", kept above the resolution ceiling for small text" if report.get('glyph_floor') else "")
+    )
@@ -0,0 +1,155 @@
+"""
+Tolerant, incremental JSON row parsing
+
+The extraction prompts ask for a JSON array of flat row objects, either as
+reply text or as the ``rows`` array of a tool call. RowStreamParser makes a
+single pass over that output, in whatever chunks it arrives: each object is
+decoded as soon as its closing brace is seen, so streamed rows can be shown
+and matched before the array is complete. Markdown fences, prose and the
+tool input's ``{"rows":`` wrapper before the array are skipped. The array is
+the first ``[`` whose next non-blank character opens a row (or closes an
+empty array), so a bracket in prose such as "[Note]" is not mistaken for it.
+
+A malformed row is recorded and skipped instead of failing the whole reply,
+and a reply cut off mid-array keeps the rows that did arrive. The caller
+decides from ``complete`` / ``problems()`` whether a re-request is worth it.
+"""
+import json
+
+
+def strip_thousands_separators(text: str) -> str:
+    """
+    Drop commas between digits outside string literals (1,234.00 -> 1234.00)
+
+    A comma directly between two digits is never valid JSON outside a
+    string, so it can only be a thousands separator. Text inside strings,
+    such as a remark reading "REF 1,2", is left alone.
+    """
+    if ',' not in text:
+        return text
+    out = []
+    in_string = escape = False
+    last = len(text) - 1
+    for i, char in enumerate(text):
+        if in_string:
+            if escape:
+                escape = False
+            elif char == '\\':
+                escape = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char == ',' and 0 < i < last and text[i - 1].isdigit() and text[i + 1].isdigit():
+            continue
+        out.append(char)
+    return ''.join(out)
+
+
+def parse_row(text: str):
+    """Decode one JSON object, tolerating thousands separators in numbers"""
+    return json.loads(strip_thousands_separators(text))
+
+
+class RowStreamParser:
+    """Feed text chunks in, get complete row dicts out"""
+
+    def __init__(self):
+        self.rows = []
+        self.errors = []
+        self.started = False
+        self.finished = False
+        self._opened = False  # "[" seen, waiting to see if a row follows
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._current = []
+
+    def feed(self, text: str) -> list:
+        """
+        Consume the next piece of the reply
+
+        Returns:
+            Rows completed by this chunk, in order (also appended to self.rows)
+        """
+        completed = []
+        start = 0
+        for i, char in enumerate(text):
+            if self.finished:
+                break
+            if self._depth:
+                if self._in_string:
+                    if self._escape:
+                        self._escape = False
+                    elif char == '\\':
+                        self._escape = True
+                    elif char == '"':
+                        self._in_string = False
+                elif char == '"':
+                    self._in_string = True
+                elif char in '{[':
+                    self._depth += 1
+                elif char in '}]':
+                    self._depth -= 1
+                    if not self._depth:
+                        self._current.append(text[start:i + 1])
+                        self._complete_row(''.join(self._current), completed)
+                        self._current = []
+            elif not self.started:
+                if not self._opened:
+                    self._opened = char == '['
+                elif not char.isspace():
+                    self._opened = char == '['
+                    if char == '{':
+                        self.started = True
+                        self._depth = 1
+                        start = i
+                    elif char == ']':
+                        self.started = self.finished = True
+            elif char == '{':
+                self._depth = 1
+                start = i
+            elif char == ']':
+                self.finished = True
+
+        if self._depth:
+            # Object still open at the end of the chunk; keep its text so far
+            self._current.append(text[start:])
+        self.rows.extend(completed)
+        return completed
+
+    def _complete_row(self, text, completed):
+        try:
+            row = parse_row(text)
+        except ValueError as e:
+            self.errors.append(f"row {len(self.rows) + len(completed) + len(self.errors) + 1}: {e}")
+            return
+        completed.append(row)
+
+    @property
+    def complete(self) -> bool:
+        """True when the whole array arrived and every row decoded"""
+        return self.started and self.finished and not self.errors
+
+    def problems(self) -> list:
+        """Human-readable reasons the reply is not complete"""
+        problems = list(self.errors)
+        if not self.started:
+            problems.append("no JSON array found in the reply")
+        elif not self.finished:
+            problems.append(f"array cut off after {len(self.rows)} rows")
+        return problems
+
+    def close(self) -> list:
+        """
+        Finish parsing
+
+        Returns:
+            Every well-formed row received
+
+        Raises:
+            ValueError: If the reply held no JSON array at all
+        """
+        if not self.started:
+            raise ValueError("No JSON array found in the model's reply")
+        return self.rows
@@ -0,0 +1,298 @@
+"""
+Persistent reconciliation ledger
+
+Every extracted SSBO and bank row is kept in a local SQLite file together with
+its match state, indexed on the matching key (date, amount in cents,
+normalized type). A new bank screenshot is then reconciled against every SSBO
+row still outstanding from earlier uploads, and bank rows left unmatched by
+earlier uploads get another try against newly arrived SSBO rows, so a
+late-posted deposit tallies without re-uploading or re-reading history.
+
+Rows are identified by the content hash of their upload and their position
+in it, not by what OCR read: uploading the same files again maps onto the
+same rows even when the text is read slightly differently, and the new read
+replaces the old one for rows still outstanding.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+from reconcile_engine import (
+    BANK_FIELDS, SSBO_FIELDS, comparison_frame, normalize_amount, normalize_tx_type, pair_rows, standardize_date
+)
+from transactions import TransactionTable
+
+DEFAULT_LEDGER_DIR = os.environ.get(
+    "LEDGER_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".ledger")
+)
+CARRY_OVER_DAYS = 31  # unmatched bank rows older than this are no longer retried
+
+# Per side: table, text column, and the row field it is read from
+_SIDES = {
+    'bank': ('bank_rows', 'description', 'Description/Remarks'),
+    'ssbo': ('ssbo_rows', 'remark', 'Remark'),
+}
+
+
+def amount_cents(value):
+    """Amount as integer cents, or None when it is not a number"""
+    try:
+        return int(round(float(normalize_amount(value)) * 100))
+    except (TypeError, ValueError):
+        return None
+
+
+def _text(value) -> str:
+    return "" if value is None or value != value else str(value)
+
+
+def _row_records(side: str, data, source: str) -> list:
+    """(row_key, event_date, amount_cents, tx_type, event_time, amount, tx_label, text) per row"""
+    if isinstance(data, TransactionTable):
+        frame = data.to_frame()
+    else:
+        frame = data if isinstance(data, pd.DataFrame) else pd.DataFrame(list(data or []))
+    fields = BANK_FIELDS if side == 'bank' else SSBO_FIELDS
+    columns = [frame[name].tolist() if name in frame else [None] * len(frame) for name in fields]
+    records = []
+    for position, (event_time, amount, text, tx) in enumerate(zip(*columns)):
+        event_time, text = _text(event_time), _text(text).strip()
+        event_date = standardize_date(event_time)
+        cents = amount_cents(amount)
+        tx_type = normalize_tx_type(tx) or ""
+        row_key = hashlib.sha256(f"{side}\x1f{source}\x1f{position}".encode("utf-8")).hexdigest()
+        amount = normalize_amount(amount)
+        records.append((row_key, event_date, cents, tx_type, event_time,
+                        amount if isinstance(amount, float) else None, _text(tx) or None, text))
+    return records
+
+
+def _day(value):
+    try:
+        return date.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class ReconciliationLedger:
+    def __init__(self, ledger_dir=DEFAULT_LEDGER_DIR):
+        """
+        Open (or create) the on-disk ledger
+
+        Args:
+            ledger_dir: Directory holding the SQLite file
+        """
+        os.makedirs(ledger_dir, exist_ok=True)
+        self.path = os.path.join(ledger_dir, "ledger.sqlite3")
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        for table, text, _ in _SIDES.values():
+            partner = 'bank_id' if table == 'ssbo_rows' else 'ssbo_id'
+            self._conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} ("
+                " id INTEGER PRIMARY KEY,"
+                " row_key TEXT UNIQUE NOT NULL,"
+                " source TEXT NOT NULL,"
+                " event_date TEXT,"
+                " amount_cents INTEGER,"
+                " tx_type TEXT,"
+                " event_time TEXT,"
+                " amount REAL,"
+                " tx_label TEXT,"
+                f" {text} TEXT,"
+                " added REAL NOT NULL,"
+                f" {partner} INTEGER,"
+                " status TEXT,"
+                " matched REAL)"
+            )
+            self._conn.execute(
+                f"CREATE INDEX IF NOT EXISTS {table}_key ON {table} (event_date, amount_cents, tx_type)"
+            )
+            # Only outstanding rows are ever searched by date range
+            self._conn.execute(
+                f"CREATE INDEX IF NOT EXISTS {table}_outstanding ON {table} (event_date) WHERE {partner} IS NULL"
+            )
+        self._conn.execute("CREATE TEMP TABLE IF NOT EXISTS wanted (id INTEGER PRIMARY KEY)")
+        self._conn.execute(
+            "CREATE TEMP TABLE IF NOT EXISTS wanted_keys (event_date TEXT, amount_cents INTEGER, tx_type TEXT)"
+        )
+        self._conn.commit()
+
+    def add_rows(self, side: str, data, source: str) -> list:
+        """
+        Record the rows of one upload
+
+        A row already in the ledger (same upload, same position) takes the
+        new read while it is outstanding and is kept as it is once matched.
+
+        Args:
+            side: 'bank' or 'ssbo'
+            data: Extracted rows (TransactionTable, list of dicts or DataFrame)
+            source: Content hash of the upload's files
+
+        Returns:
+            Ledger ids of the rows, in input order
+        """
+        table, text, _ = _SIDES[side]
+        partner = 'bank_id' if table == 'ssbo_rows' else 'ssbo_id'
+        records = _row_records(side, data, source)
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                f"INSERT INTO {table} (row_key, event_date, amount_cents, tx_type, event_time, amount,"
+                f" tx_label, {text}, source, added) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+                " ON CONFLICT (row_key) DO UPDATE SET event_date = excluded.event_date,"
+                " amount_cents = excluded.amount_cents, tx_type = excluded.tx_type,"
+                " event_time = excluded.event_time, amount = excluded.amount, tx_label = excluded.tx_label,"
+                f" {text} = excluded.{text} WHERE {partner} IS NULL",
+                [record + (source, now) for record in records],
+            )
+            ids = {}
+            keys = [record[0] for record in records]
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                ids.update(self._conn.execute(
+                    f"SELECT row_key, id FROM {table} WHERE row_key IN ({','.join('?' * len(chunk))})", chunk
+                ).fetchall())
+        return [ids[key] for key in keys]
+
+    def _fetch(self, side: str, where: str, params=()) -> pd.DataFrame:
+        table, text, field = _SIDES[side]
+        rows = self._conn.execute(
+            f"SELECT id, event_date, event_time, amount, {text}, tx_label FROM {table} {where}", params
+        ).fetchall()
+        return pd.DataFrame(rows, columns=['id', 'event_date', 'Event Time', 'Amount', field, 'Transaction Type'],
+                            dtype=object)
+
+    def _set_wanted(self, ids):
+        self._conn.execute("DELETE FROM wanted")
+        self._conn.executemany("INSERT OR IGNORE INTO wanted (id) VALUES (?)", ((int(i),) for i in ids))
+
+    def _candidates(self, bank: pd.DataFrame, window: int, fuzzy: bool) -> pd.DataFrame:
+        """Outstanding SSBO rows that could pair with any of the bank rows, oldest first"""
+        self._set_wanted(bank['id'])
+        self._conn.execute("DELETE FROM wanted_keys")
+        self._conn.execute(
+            "INSERT INTO wanted_keys SELECT DISTINCT event_date, amount_cents, tx_type FROM bank_rows"
+            " WHERE id IN (SELECT id FROM wanted)"
+        )
+        # Exact keys go through the (date, cents, type) index
+        exact = ("SELECT s.id FROM wanted_keys k JOIN ssbo_rows s ON s.event_date = k.event_date"
+                 " AND s.amount_cents = k.amount_cents AND s.tx_type = k.tx_type WHERE s.bank_id IS NULL")
+        params = []
+        days = [day for day in map(_day, bank['event_date']) if day is not None]
+        if fuzzy and days:
+            exact += (" UNION SELECT id FROM ssbo_rows WHERE bank_id IS NULL"
+                      " AND event_date BETWEEN ? AND ?")
+            params = [(min(days) - timedelta(days=window)).isoformat(),
+                      (max(days) + timedelta(days=window)).isoformat()]
+        return self._fetch(
+            'ssbo', f"WHERE id IN ({exact}) ORDER BY event_date, id", params
+        )
+
+    def reconcile(self, bank_ids, date_window_days=0, amount_tolerance=0.0, amount_tolerance_pct=0.0,
+                  carry_over_days=CARRY_OVER_DAYS):
+        """
+        Match one upload's bank rows, plus bank rows still outstanding from
+        earlier uploads, against every outstanding SSBO row
+
+        Matches previously recorded for this upload's rows are released first,
+        so reconciling the same upload again (say, with another tolerance)
+        starts from a clean slate. Tolerance arguments are as for
+        reconcile_frames.
+
+        Args:
+            bank_ids: Ledger ids of the upload's bank rows, from add_rows
+            carry_over_days: How far before this upload's earliest date
+                unmatched bank rows are retried
+
+        Returns:
+            Tuple of (comparison table for bank_ids, in their order;
+            comparison table of earlier bank rows that tally now)
+        """
+        bank_ids = [int(i) for i in bank_ids]
+        fuzzy = bool(date_window_days or amount_tolerance or amount_tolerance_pct)
+        with self._lock, self._conn:
+            self._set_wanted(bank_ids)
+            self._conn.execute(
+                "UPDATE ssbo_rows SET bank_id = NULL, status = NULL, matched = NULL"
+                " WHERE bank_id IN (SELECT id FROM wanted)"
+            )
+            self._conn.execute(
+                "UPDATE bank_rows SET ssbo_id = NULL, status = NULL, matched = NULL WHERE id IN (SELECT id FROM wanted)"
+            )
+            current = self._fetch('bank', "WHERE id IN (SELECT id FROM wanted)").set_index('id', drop=False)
+            current = current.loc[bank_ids].reset_index(drop=True)
+
+            days = [day for day in map(_day, current['event_date']) if day is not None]
+            cutoff = (min(days) - timedelta(days=carry_over_days)).isoformat() if days else ""
+            earlier = self._fetch(
+                'bank', "WHERE ssbo_id IS NULL AND id NOT IN (SELECT id FROM wanted) AND event_date >= ?"
+                " ORDER BY event_date, id", (cutoff,)
+            )
+            bank = pd.concat([current, earlier], ignore_index=True)
+            ssbo = self._candidates(bank, int(date_window_days), fuzzy)
+
+            position, status = pair_rows(bank, ssbo, date_window_days, amount_tolerance, amount_tolerance_pct)
+            matched = np.flatnonzero(position >= 0)
+            bank_id = bank['id'].to_numpy()
+            ssbo_id = ssbo['id'].to_numpy()
+            now = time.time()
+            self._conn.executemany(
+                "UPDATE bank_rows SET ssbo_id = ?, status = ?, matched = ? WHERE id = ?",
+                [(int(ssbo_id[position[i]]), status[i], now, int(bank_id[i])) for i in matched],
+            )
+            self._conn.executemany(
+                "UPDATE ssbo_rows SET bank_id = ?, status = ?, matched = ? WHERE id = ?",
+                [(int(bank_id[i]), status[i], now, int(ssbo_id[position[i]])) for i in matched],
+            )
+            # This upload's misses are recorded; earlier ones stay untouched
+            self._conn.executemany(
+                "UPDATE bank_rows SET status = ? WHERE id = ?",
+                [(status[i], int(bank_id[i])) for i in np.flatnonzero(position[:len(current)] < 0)],
+            )
+
+        n = len(current)
+        df = comparison_frame(current, ssbo, position[:n], status[:n])
+        late = np.flatnonzero(position[n:] >= 0)
+        carried = comparison_frame(earlier.iloc[late], ssbo, position[n:][late], status[n:][late])
+        return df, carried.reset_index(drop=True)
+
+    def clear(self):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM bank_rows")
+            self._conn.execute("DELETE FROM ssbo_rows")
+
+    def stats(self) -> dict:
+        with self._lock:
+            bank_rows, bank_open = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(ssbo_id IS NULL), 0) FROM bank_rows"
+            ).fetchone()
+            ssbo_rows, ssbo_open = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(bank_id IS NULL), 0) FROM ssbo_rows"
+            ).fetchone()
+        return {
+            'bank_rows': bank_rows,
+            'bank_outstanding': bank_open,
+            'ssbo_rows': ssbo_rows,
+            'ssbo_outstanding': ssbo_open,
+        }
+
+
+_ledger = None
+_ledger_lock = threading.Lock()
+
+
+def get_ledger() -> ReconciliationLedger:
+    """Return the process-wide ledger, shared by every Streamlit session"""
+    global _ledger
+    with _ledger_lock:
+        if _ledger is None:
+            _ledger = ReconciliationLedger()
+        return _ledger
@@ -0,0 +1,162 @@
+"""
+Message Batches mode for bulk reconciliations
+
+Month-end reruns care about throughput and cost, not latency. Instead of one
+synchronous call per image (or row band), run_message_batches() packs every
+uncached extraction request into Message Batches, polls until they end and
+stores each complete result in the OCR cache under its cache key, which is
+also the request's custom_id. The normal extraction path then answers every
+pair from the cache.
+
+Submitted batch ids are written to a small JSON state file before polling,
+so an interrupted run picks up the same batches on restart instead of
+paying for the requests again.
+"""
+import json
+import os
+import time
+
+from api_client import call_with_retry
+
+POLL_INTERVAL_SECONDS = 30.0
+# API limits are 100,000 requests and 256 MB per batch; stay well inside them
+BATCH_MAX_REQUESTS = 10_000
+BATCH_MAX_BYTES = 200 * 1024 * 1024
+
+
+class BatchState:
+    """Submitted batches and their custom_ids, persisted between runs"""
+
+    def __init__(self, path):
+        self.path = path
+        self.batches = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as handle:
+                self.batches = json.load(handle).get("batches", {})
+
+    def save(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as handle:
+            json.dump({"batches": self.batches}, handle, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def add(self, batch_id, custom_ids):
+        self.batches[batch_id] = {"custom_ids": list(custom_ids), "ingested": False, "errors": {}}
+        self.save()
+
+    def pending(self) -> list:
+        return [batch_id for batch_id, batch in self.batches.items() if not batch["ingested"]]
+
+    def pending_ids(self) -> set:
+        return {custom_id for batch_id in self.pending() for custom_id in self.batches[batch_id]["custom_ids"]}
+
+
+def pack_batches(requests, max_requests=BATCH_MAX_REQUESTS, max_bytes=BATCH_MAX_BYTES):
+    """Split requests into lists that fit the per-batch count and size limits"""
+    batch, size = [], 0
+    for request in requests:
+        request_size = len(json.dumps(request))
+        if batch and (len(batch) >= max_requests or size + request_size > max_bytes):
+            yield batch
+            batch, size = [], 0
+        batch.append(request)
+        size += request_size
+    if batch:
+        yield batch
+
+
+def collect_requests(ocr, jobs, cache):
+    """
+    Batch requests for every (uploaded_file, prompt, model) job, minus those
+    already answered by the cache; identical requests are sent once
+    """
+    requests = {}
+    for uploaded_file, prompt, model in jobs:
+        for request in ocr.batch_requests(uploaded_file, prompt, model):
+            if request["custom_id"] not in requests and cache.get(request["custom_id"]) is None:
+                requests[request["custom_id"]] = request
+    return list(requests.values())
+
+
+def ingest_results(client, ocr, batch_id, cache):
+    """
+    Store a finished batch's successful results in the OCR cache
+
+    Returns:
+        Dict of custom_id -> error description for requests that did not succeed
+    """
+    errors = {}
+    for response in call_with_retry(lambda: client.messages.batches.results(batch_id)):
+        result = response.result
+        if result.type != "succeeded":
+            errors[response.custom_id] = result.type
+            continue
+        parser = ocr.parse_reply(result.message)
+        if not parser.complete:
+            errors[response.custom_id] = "; ".join(parser.problems())
+            continue
+        cache.put(response.custom_id, parser.rows)
+    return errors
+
+
+def run_message_batches(ocr, jobs, cache, state_path, poll_interval=POLL_INTERVAL_SECONDS, max_wait=None,
+                        log=print):
+    """
+    Fill the OCR cache for all jobs through the Message Batches API
+
+    Args:
+        ocr: AnthropicOCR providing the client and request building
+        jobs: Iterable of (uploaded_file, prompt, model)
+        cache: OCRCache the results are written to
+        state_path: JSON file recording submitted batches, for resuming
+        poll_interval: Seconds between status checks
+        max_wait: Stop polling after this many seconds (None waits for all);
+            unfinished batches are picked up by the next run
+
+    Returns:
+        Summary dict: submitted (new batch ids), resumed (batch ids from an
+        earlier run), requests (newly submitted), pending (batch ids still
+        running), errors (custom_id -> reason)
+    """
+    client = ocr.client
+    state = BatchState(state_path)
+    resumed = state.pending()
+    if resumed:
+        log(f"Resuming {len(resumed)} message batch(es) from {state_path}")
+
+    in_flight = state.pending_ids()
+    requests = [r for r in collect_requests(ocr, jobs, cache) if r["custom_id"] not in in_flight]
+    submitted = []
+    for chunk in pack_batches(requests):
+        batch = call_with_retry(lambda: client.messages.batches.create(requests=chunk))
+        state.add(batch.id, [r["custom_id"] for r in chunk])
+        submitted.append(batch.id)
+        log(f"Submitted message batch {batch.id} with {len(chunk)} requests")
+
+    errors = {}
+    start = time.monotonic()
+    while True:
+        for batch_id in state.pending():
+            batch = call_with_retry(lambda: client.messages.batches.retrieve(batch_id))
+            if batch.processing_status != "ended":
+                continue
+            batch_errors = ingest_results(client, ocr, batch_id, cache)
+            state.batches[batch_id].update(ingested=True, errors=batch_errors)
+            state.save()
+            errors.update(batch_errors)
+            counts = batch.request_counts
+            log(f"Message batch {batch_id} ended: {counts.succeeded} succeeded, {counts.errored} errored, "
+                f"{counts.expired} expired, {counts.canceled} canceled")
+
+        pending = state.pending()
+        if not pending or (max_wait is not None and time.monotonic() - start >= max_wait):
+            break
+        time.sleep(poll_interval)
+
+    return {
+        'submitted': submitted,
+        'resumed': resumed,
+        'requests': len(requests),
+        'pending': pending,
+        'errors': errors,
+    }
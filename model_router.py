@@ -0,0 +1,185 @@
+"""
+Model routing by local table complexity
+
+Most screenshots are short, clean tables that the fastest model reads as
+well as the strongest. Each screenshot is measured locally with OpenCV (row
+and column counts, colour, background noise, text density) and simple ones
+are sent to FAST_MODEL, the rest to STRONG_MODEL. A fast read is accepted
+only when its rows pass validation: the keys matching relies on, amounts and
+dates that parse, and a row count that agrees with the local estimate.
+Otherwise the screenshot is read again with STRONG_MODEL, so routing can
+cost a second call but never a worse result than the strong model alone.
+"""
+import math
+import threading
+from datetime import date
+
+import cv2
+import numpy as np
+
+from reconcile_engine import normalize_amount, standardize_date
+from table_tiling import find_table_rows
+
+FAST_MODEL = "claude-3-5-haiku-latest"
+STRONG_MODEL = "claude-sonnet-4-20250514"
+
+# A table is simple when every measure is at or below its bound
+SIMPLE_MAX_ROWS = 40
+SIMPLE_MAX_COLUMNS = 6
+SIMPLE_MAX_COLOUR = 0.05  # share of clearly coloured pixels
+SIMPLE_MAX_NOISE = 10.0  # gray-level standard deviation of the background
+SIMPLE_MAX_DENSITY = 0.15  # share of ink pixels
+
+COLOUR_CHROMA = 40  # max - min channel difference of a clearly coloured pixel
+COLUMN_GAP_FRACTION = 0.025  # blank run, as a share of the width, that separates columns
+RULE_FRACTION = 0.9  # pixel columns inked over this share of the height are vertical rules
+ROW_COUNT_TOLERANCE = 0.1  # share of the estimated rows a read may be off by (at least one row)
+
+# Keys matching relies on; remarks may legitimately be blank
+REQUIRED_KEYS = ('Event Time', 'Amount', 'Transaction Type')
+
+
+def _count_columns(ink: np.ndarray) -> int:
+    """Text columns: runs of inked pixel columns separated by wide blank gaps"""
+    height, width = ink.shape
+    # Horizontal rules cross every column; only text should count
+    rules = cv2.morphologyEx(ink, cv2.MORPH_OPEN, cv2.getStructuringElement(cv2.MORPH_RECT, (max(width // 4, 1), 1)))
+    per_column = np.count_nonzero(cv2.subtract(ink, rules), axis=0)
+    inked = (per_column > 0) & (per_column < height * RULE_FRACTION)
+    gap = max(int(width * COLUMN_GAP_FRACTION), 4)
+    columns, blank = 0, gap
+    for has_ink in inked:
+        if has_ink:
+            if blank >= gap:
+                columns += 1
+            blank = 0
+        else:
+            blank += 1
+    return columns
+
+
+def estimate_complexity(gray: np.ndarray, colour=None) -> dict:
+    """
+    Measure how hard a table screenshot is to read
+
+    Args:
+        gray: 2-D uint8 grayscale array of the screenshot
+        colour: Optional array of the same screenshot at any size (e.g. the
+            upload preview), for the colour measure; 2-D arrays are gray
+
+    Returns:
+        Dict with 'rows' (data rows, None when no table rows were found),
+        'columns', 'colour', 'noise' and 'density'
+    """
+    if np.median(gray) < 128:
+        gray = 255 - gray  # dark theme: make the text dark on light
+    rows = find_table_rows(gray)
+    _, ink = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    # Background away from the (anti-aliased) edges of text and rules
+    near_ink = cv2.dilate(ink, np.ones((5, 5), np.uint8))
+    _, noise = cv2.meanStdDev(gray, mask=cv2.bitwise_not(near_ink))
+    del near_ink
+
+    share = 0.0
+    if colour is not None and np.ndim(colour) == 3:
+        rgb = np.asarray(colour)[..., :3].astype(np.int16)
+        share = float(np.count_nonzero(rgb.max(axis=-1) - rgb.min(axis=-1) > COLOUR_CHROMA)) / rgb[..., 0].size
+
+    return {
+        'rows': len(rows) - 1 if len(rows) >= 2 else None,
+        'columns': _count_columns(ink),
+        'colour': share,
+        'noise': float(noise[0][0]),
+        'density': cv2.countNonZero(ink) / ink.size,
+    }
+
+
+def is_simple(complexity: dict) -> bool:
+    """Whether the fast model can be trusted with a table of this complexity"""
+    return (
+        complexity['rows'] is not None
+        and complexity['rows'] <= SIMPLE_MAX_ROWS
+        and complexity['columns'] <= SIMPLE_MAX_COLUMNS
+        and complexity['colour'] <= SIMPLE_MAX_COLOUR
+        and complexity['noise'] <= SIMPLE_MAX_NOISE
+        and complexity['density'] <= SIMPLE_MAX_DENSITY
+    )
+
+
+def _parses_amount(value) -> bool:
+    amount = normalize_amount(value)
+    return isinstance(amount, float) and math.isfinite(amount)
+
+
+def _parses_date(value) -> bool:
+    try:
+        date.fromisoformat(standardize_date(str(value)))
+        return True
+    except (TypeError, ValueError):
+        return False
+
+
+def validate_rows(rows: list, side: str, complexity: dict) -> list:
+    """
+    Problems that make a fast read untrustworthy
+
+    The SSBO prompt keeps only Deposit and Transfer rows, so an SSBO read may
+    have fewer rows than the table, never more; a bank read should have
+    them all.
+
+    Returns:
+        List of problem descriptions, empty when the rows can be accepted
+    """
+    if not rows:
+        return ["no rows extracted"]
+
+    problems = []
+    missing = sum(1 for row in rows if any(row.get(key) in (None, "") for key in REQUIRED_KEYS))
+    if missing:
+        problems.append(f"{missing} rows missing {', '.join(REQUIRED_KEYS)}")
+    amounts = sum(1 for row in rows if row.get('Amount') not in (None, "") and not _parses_amount(row['Amount']))
+    if amounts:
+        problems.append(f"{amounts} unparsable amounts")
+    dates = sum(1 for row in rows if row.get('Event Time') not in (None, "") and not _parses_date(row['Event Time']))
+    if dates:
+        problems.append(f"{dates} unparsable dates")
+
+    expected = complexity['rows']
+    if expected is not None:
+        slack = max(1, round(expected * ROW_COUNT_TOLERANCE))
+        if len(rows) > expected + slack or (side == 'bank' and len(rows) < expected - slack):
+            problems.append(f"{len(rows)} rows read, about {expected} in the table")
+    return problems
+
+
+class ModelRouter:
+    """Routing decisions and their counters, shared by every session"""
+
+    def __init__(self, fast_model=FAST_MODEL, strong_model=STRONG_MODEL):
+        self.fast_model = fast_model
+        self.strong_model = strong_model
+        self._counts = {'fast': 0, 'strong': 0, 'escalated': 0}
+        self._lock = threading.Lock()
+
+    def choose(self, complexity: dict) -> str:
+        """Model for the first read of a screenshot"""
+        simple = is_simple(complexity)
+        with self._lock:
+            self._counts['fast' if simple else 'strong'] += 1
+        return self.fast_model if simple else self.strong_model
+
+    def record_escalation(self):
+        with self._lock:
+            self._counts['escalated'] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._counts)
+
+
+_router = ModelRouter()
+
+
+def get_model_router() -> ModelRouter:
+    """Return the process-wide model router"""
+    return _router
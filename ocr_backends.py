@@ -0,0 +1,58 @@
+"""
+Pluggable OCR backends
+
+An OCR backend turns one uploaded screenshot into the row dicts the
+comparison table consumes, for one side of the reconciliation ('bank' or
+'ssbo'). The app picks a backend per side by name; FallbackBackend chains
+two of them, so an engine that raises LowConfidenceError on images it cannot
+read reliably hands them to the next one instead of returning wrong rows.
+"""
+from typing import Callable, Optional, Protocol
+
+SIDES = ('bank', 'ssbo')
+
+
+class LowConfidenceError(ValueError):
+    """A backend could not read the image reliably; another backend may"""
+
+
+class OCRBackend(Protocol):
+    name: str
+
+    def extract(self, uploaded_file, side: str, on_row: Optional[Callable] = None) -> list:
+        """
+        Read the rows of one screenshot
+
+        Args:
+            uploaded_file: Streamlit UploadedFile (or anything with read/seek/name)
+            side: 'bank' or 'ssbo'
+            on_row: Called with each row dict as soon as it is known
+
+        Returns:
+            List of row dicts
+        """
+        ...
+
+
+class FallbackBackend:
+    """Try primary first; hand the image to fallback when primary is not confident"""
+
+    def __init__(self, primary: OCRBackend, fallback: OCRBackend, log=print):
+        self.primary = primary
+        self.fallback = fallback
+        self.name = f"{primary.name}+{fallback.name}"
+        self._log = log
+
+    def extract(self, uploaded_file, side, on_row=None):
+        try:
+            # Rows are only released once the whole read is accepted, so a
+            # rejected read never leaks half a table into a live view
+            rows = self.primary.extract(uploaded_file, side)
+        except LowConfidenceError as e:
+            self._log(f"{self.primary.name} OCR not confident ({e}); using {self.fallback.name}")
+            uploaded_file.seek(0)
+            return self.fallback.extract(uploaded_file, side, on_row=on_row)
+        if on_row is not None:
+            for row in rows:
+                on_row(row)
+        return rows
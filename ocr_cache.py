@@ -0,0 +1,147 @@
+"""
+Persistent, content-addressed cache for OCR extraction results
+
+Entries are keyed by a hash of the preprocessed image payload, the prompt
+text and the model name, and hold the parsed JSON rows. The store is a single
+SQLite file with size-bounded LRU eviction and a TTL, so re-uploading the same
+screenshot skips the model call entirely.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+DEFAULT_CACHE_DIR = os.environ.get(
+    "OCR_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".ocr_cache")
+)
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024  # 64 MB of stored rows
+DEFAULT_TTL_SECONDS = 7 * 24 * 60 * 60  # one week
+
+
+def make_cache_key(image_data, prompt: str, model: str) -> str:
+    """
+    Build a content hash for one extraction request
+    
+    Args:
+        image_data: The preprocessed image payload sent to the model (str or bytes)
+        prompt: Prompt text
+        model: Model name
+    """
+    if isinstance(image_data, str):
+        image_data = image_data.encode("ascii")
+    digest = hashlib.sha256()
+    for part in (model.encode("utf-8"), prompt.encode("utf-8"), image_data):
+        digest.update(len(part).to_bytes(8, "big"))
+        digest.update(part)
+    return digest.hexdigest()
+
+
+class OCRCache:
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES, ttl_seconds=DEFAULT_TTL_SECONDS):
+        """
+        Open (or create) the on-disk cache
+        
+        Args:
+            cache_dir: Directory holding the SQLite file
+            max_bytes: Upper bound on the total size of stored rows
+            ttl_seconds: Entries older than this are treated as misses
+        """
+        os.makedirs(cache_dir, exist_ok=True)
+        self.path = os.path.join(cache_dir, "ocr_cache.sqlite3")
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " key TEXT PRIMARY KEY,"
+            " rows TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " created REAL NOT NULL,"
+            " last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access)")
+        self._conn.commit()
+
+    def get(self, key):
+        """Return the cached rows for key, or None on a miss"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT rows, created FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[1] > self.ttl_seconds:
+                if row is not None:
+                    self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                    self._conn.commit()
+                self.misses += 1
+                return None
+
+            self._conn.execute("UPDATE entries SET last_access = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, key, rows):
+        """Store parsed rows under key and evict least-recently-used entries over budget"""
+        payload = json.dumps(rows)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (key, rows, size, created, last_access) VALUES (?, ?, ?, ?, ?)",
+                (key, payload, len(payload), now, now),
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        cutoff = time.time() - self.ttl_seconds
+        self.evictions += self._conn.execute("DELETE FROM entries WHERE created < ?", (cutoff,)).rowcount
+
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self._conn.execute(
+            "SELECT key, size FROM entries ORDER BY last_access ASC"
+        ).fetchall():
+            self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            self.evictions += 1
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM entries")
+            self._conn.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries, total = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries"
+            ).fetchone()
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'entries': entries,
+            'bytes': total,
+        }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_ocr_cache() -> OCRCache:
+    """Return the process-wide cache, shared by every Streamlit session"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = OCRCache()
+        return _cache
@@ -0,0 +1,306 @@
+"""
+Columnar reconciliation engine
+
+Matches bank rows to SSBO rows on (date, amount, transaction type) with the
+same first-come semantics as the original per-row loop: the k-th bank row with
+a given key is paired with the k-th SSBO row with that key. Both sides are
+TransactionTables (rows and DataFrames are parsed into one), so the keys are
+already integers: day numbers, cents and type codes. Duplicate keys are
+numbered with a per-key occurrence counter, and the pairing is a single merge.
+"""
+import numpy as np
+import pandas as pd
+
+# The scalar normalizers live with the table now; they are still imported from here
+from transactions import (  # noqa: F401
+    MISSING_CENTS, MISSING_DAY, as_transactions, cents_to_float, normalize_amount, normalize_tx_type,
+    standardize_date,
+)
+
+COMPARISON_COLUMNS = [
+    'Date_A', 'Description_A', 'Type_A', 'Amount_A',
+    'Date_B', 'Description_B', 'Type_B', 'Amount_B',
+    'Status',
+]
+
+BANK_FIELDS = ['Event Time', 'Amount', 'Description/Remarks', 'Transaction Type']
+SSBO_FIELDS = ['Event Time', 'Amount', 'Remark', 'Transaction Type']
+
+
+def _shared_types(bank, ssbo):
+    """Type codes of both sides in one code space (normalized labels), -1 where missing"""
+    labels = list(bank.type_labels)
+    index = {label: i for i, label in enumerate(labels)}
+    for label in ssbo.type_labels:
+        if label not in index:
+            index[label] = len(labels)
+            labels.append(label)
+    ssbo_map = np.array([index[label] for label in ssbo.type_labels] + [-1], dtype=np.int64)
+    return bank.type_codes.astype(np.int64), ssbo_map[ssbo.type_codes], len(labels)
+
+
+def _combine(codes_a, codes_b, size_b):
+    """Fold two code arrays into one, re-factorizing so values stay small"""
+    combined = codes_a.astype(np.int64) * size_b + codes_b
+    codes, uniques = pd.factorize(combined)
+    return codes, len(uniques)
+
+
+def _occurrence(keys):
+    """0 for the first row with each key, 1 for the second, and so on"""
+    return pd.Series(keys).groupby(keys, sort=False).cumcount().to_numpy()
+
+
+def _tolerance_match(bank_rows, ssbo_rows, bank_keys, ssbo_keys, window, tolerance, tolerance_pct):
+    """
+    Pair bank rows with SSBO rows of the same type within a date window and amount tolerance
+    
+    Free SSBO rows are bucketed per (type, day) and sorted by amount, so each
+    bank row costs a binary search per day offset rather than a scan of the
+    ledger. Bank rows are served in order and take the candidate with the
+    smallest date offset, then the closest amount. The closest free amount
+    is one of the two free neighbours of the insertion point; consumed
+    candidates are skipped with path-compressed "next free" and "previous
+    free" arrays, so a crowded bucket is never scanned.
+    
+    Args:
+        bank_rows, ssbo_rows: Row indices taking part in this pass
+        bank_keys, ssbo_keys: (day numbers, amounts, type codes) per row, as
+            floats with NaN where missing; amounts and tolerance in cents
+        
+    Returns:
+        SSBO row index for each entry of bank_rows, -1 where nothing fits
+    """
+    bank_days, bank_amounts, bank_types = bank_keys
+    ssbo_days, ssbo_amounts, ssbo_types = ssbo_keys
+    result = np.full(len(bank_rows), -1, dtype=np.int64)
+    
+    ssbo_rows = ssbo_rows[~np.isnan(ssbo_days[ssbo_rows]) & ~np.isnan(ssbo_amounts[ssbo_rows])]
+    if len(ssbo_rows) == 0:
+        return result
+    ssbo_rows = ssbo_rows[np.lexsort((ssbo_amounts[ssbo_rows], ssbo_days[ssbo_rows], ssbo_types[ssbo_rows]))]
+    days = ssbo_days[ssbo_rows].astype(np.int64)
+    amounts = ssbo_amounts[ssbo_rows]
+    types = ssbo_types[ssbo_rows]
+    
+    starts = np.flatnonzero(np.r_[True, (np.diff(types) != 0) | (np.diff(days) != 0)])
+    ends = np.r_[starts[1:], len(ssbo_rows)]
+    buckets = {(int(types[start]), int(days[start])): (start, end) for start, end in zip(starts, ends)}
+    
+    # next_free[i] leads to the first free row at or after i (len(ssbo_rows)
+    # when none is left); prev_free[i + 1] leads to the last free row at or
+    # before i, plus one (0 when none is left)
+    next_free = np.arange(len(ssbo_rows) + 1)
+    prev_free = np.arange(len(ssbo_rows) + 1)
+    
+    def find(parent, i):
+        root = i
+        while parent[root] != root:
+            root = parent[root]
+        while parent[i] != root:
+            parent[i], i = root, parent[i]
+        return root
+    
+    offsets = sorted(range(-window, window + 1), key=lambda offset: (abs(offset), offset))
+    for j, row in enumerate(bank_rows):
+        day, amount = bank_days[row], bank_amounts[row]
+        if np.isnan(day) or np.isnan(amount):
+            continue
+        allowed = max(tolerance, abs(amount) * tolerance_pct / 100) + 1e-9
+        
+        for offset in offsets:
+            bucket = buckets.get((int(bank_types[row]), int(day) + offset))
+            if bucket is None:
+                continue
+            start, end = bucket
+            insert = start + np.searchsorted(amounts[start:end], amount, 'left')
+            
+            # Nearest free candidate on each side; the lower one wins a tie
+            best, best_diff = -1, allowed
+            below = find(prev_free, insert) - 1
+            if below >= start and amount - amounts[below] <= best_diff:
+                # First free row of that amount, so equal amounts go in row order
+                same = start + np.searchsorted(amounts[start:end], amounts[below], 'left')
+                best, best_diff = find(next_free, same), amount - amounts[below]
+            above = find(next_free, insert)
+            if above < end and amounts[above] - amount < best_diff:
+                best = above
+            
+            if best >= 0:
+                next_free[best] = best + 1
+                prev_free[best + 1] = best
+                result[j] = ssbo_rows[best]
+                break
+    return result
+
+
+def _tolerance_status(day_deltas, cent_deltas) -> list:
+    """Status text naming the tolerated difference of each tolerance match"""
+    statuses = []
+    for day_delta, cent_delta in zip(day_deltas, cent_deltas):
+        parts = []
+        if day_delta:
+            parts.append(f"date {int(day_delta):+d}d")
+        if cent_delta:
+            parts.append(f"amount {int(cent_delta) / 100:+.2f}")
+        statuses.append(f"Tally ({', '.join(parts)})" if parts else "Tally")
+    return statuses
+
+
+def _key_floats(table, type_codes):
+    """(day numbers, cents, type codes) of a table as floats, NaN where missing"""
+    days = table.days.astype(np.float64)
+    days[table.days == MISSING_DAY] = np.nan
+    cents = table.cents.astype(np.float64)
+    cents[table.cents == MISSING_CENTS] = np.nan
+    return days, cents, type_codes
+
+
+def _pair(bank, ssbo, date_window_days, amount_tolerance, amount_tolerance_pct):
+    """
+    Pair the rows of two TransactionTables
+
+    Rows with a missing date or amount never pair.
+
+    Returns:
+        Tuple of (SSBO position per bank row, -1 where unmatched; Status per
+        bank row)
+    """
+    bank_types, ssbo_types, n_types = _shared_types(bank, ssbo)
+    
+    # One integer per (date, amount, type) key, shared by both sides
+    n_bank = len(bank)
+    days = np.concatenate([bank.days, ssbo.days])
+    cents = np.concatenate([bank.cents, ssbo.cents])
+    types = np.concatenate([bank_types, ssbo_types]) + 1
+    day_codes, distinct_days = pd.factorize(days)
+    cent_codes, distinct_cents = pd.factorize(cents)
+    keys, n_keys = _combine(day_codes, cent_codes, len(distinct_cents))
+    keys, n_keys = _combine(keys, types, n_types + 1)
+    # Rows missing a date or amount get keys of their own
+    missing = (days == MISSING_DAY) | (cents == MISSING_CENTS)
+    keys[missing] = n_keys + np.arange(np.count_nonzero(missing))
+    bank_keys, ssbo_keys = keys[:n_bank], keys[n_bank:]
+    
+    # Number duplicate keys so the k-th bank row pairs with the k-th SSBO row,
+    # then match (key, occurrence) pairs with a single hash lookup
+    bank_pairs = bank_keys.astype(np.int64) * (n_bank + 1) + _occurrence(bank_keys)
+    # SSBO rows past the n_bank-th of their key can never pair exactly;
+    # leaving them out keeps the (key, occurrence) index unique
+    ssbo_occurrence = _occurrence(ssbo_keys)
+    eligible = np.flatnonzero(ssbo_occurrence < n_bank)
+    ssbo_pairs = ssbo_keys[eligible].astype(np.int64) * (n_bank + 1) + ssbo_occurrence[eligible]
+    found = pd.Index(ssbo_pairs).get_indexer(bank_pairs)
+    matched = found >= 0
+    position = np.full(n_bank, -1, dtype=np.int64)
+    position[matched] = eligible[found[matched]]
+    status = np.where(matched, "Tally", "Not Tally").astype(object)
+    
+    if (date_window_days or amount_tolerance or amount_tolerance_pct) and not matched.all() and len(ssbo):
+        # Second pass: leftover bank rows against SSBO rows nobody claimed
+        free = np.ones(len(ssbo), dtype=bool)
+        free[position[matched]] = False
+        
+        pending = np.flatnonzero(~matched)
+        found = _tolerance_match(
+            pending, np.flatnonzero(free), _key_floats(bank, bank_types), _key_floats(ssbo, ssbo_types),
+            int(date_window_days), float(amount_tolerance) * 100, float(amount_tolerance_pct),
+        )
+        hit = found >= 0
+        rows, partners = pending[hit], found[hit]
+        position[rows] = partners
+        status[rows] = _tolerance_status(
+            ssbo.days[partners].astype(np.int64) - bank.days[rows],
+            ssbo.cents[partners] - bank.cents[rows],
+        )
+    return position, status
+
+
+def pair_rows(bank_data, ssbo_data, date_window_days=0, amount_tolerance=0.0, amount_tolerance_pct=0.0):
+    """
+    Match bank rows to SSBO rows without building the comparison table
+    
+    Takes the same arguments as reconcile_frames.
+    
+    Returns:
+        Tuple of (position, status): for each bank row, the 0-based position
+        of its SSBO partner (-1 when unmatched) and its Status text
+    """
+    bank = as_transactions(bank_data, 'bank')
+    ssbo = as_transactions(ssbo_data, 'ssbo')
+    if len(bank) == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=object)
+    return _pair(bank, ssbo, date_window_days, amount_tolerance, amount_tolerance_pct)
+
+
+def reconcile_frames(bank_data, ssbo_data, date_window_days=0, amount_tolerance=0.0, amount_tolerance_pct=0.0) -> pd.DataFrame:
+    """
+    Create a comparison table between bank statement and SSBO deposits
+    
+    Rows are first paired on exact (date, amount, type). When a tolerance is
+    given, bank rows left over are then matched against unclaimed SSBO rows of
+    the same type within the date window and amount tolerance; their Status
+    names the difference that was tolerated, e.g. "Tally (date +1d)".
+    
+    Args:
+        bank_data: Bank rows (TransactionTable, list of dicts or DataFrame)
+            with Event Time, Amount, Description/Remarks and Transaction Type
+        ssbo_data: SSBO rows (TransactionTable, list of dicts or DataFrame)
+            with Event Time, Amount, Remark and Transaction Type
+        date_window_days: Accept SSBO dates up to this many days either side
+        amount_tolerance: Absolute amount difference to accept
+        amount_tolerance_pct: Amount difference to accept, as a percentage of
+            the bank amount (the larger of the two tolerances applies)
+        
+    Returns:
+        DataFrame with one row per bank row, in bank order, and the
+        COMPARISON_COLUMNS schema; dates as they were read
+    """
+    bank = as_transactions(bank_data, 'bank')
+    ssbo = as_transactions(ssbo_data, 'ssbo')
+    if len(bank) == 0:
+        return pd.DataFrame(columns=COMPARISON_COLUMNS)
+    
+    position, status = _pair(bank, ssbo, date_window_days, amount_tolerance, amount_tolerance_pct)
+    return _comparison_frame(bank, ssbo, position, status)
+
+
+def comparison_frame(bank_data, ssbo_data, position, status) -> pd.DataFrame:
+    """
+    Build the comparison table for pairs found elsewhere (e.g. by pair_rows
+    over a larger SSBO set)
+    
+    Args:
+        position: 0-based SSBO position per bank row, -1 when unmatched
+        status: Status text per bank row
+    """
+    bank = as_transactions(bank_data, 'bank')
+    ssbo = as_transactions(ssbo_data, 'ssbo')
+    if len(bank) == 0:
+        return pd.DataFrame(columns=COMPARISON_COLUMNS)
+    return _comparison_frame(bank, ssbo, np.asarray(position), np.asarray(status, dtype=object))
+
+
+def _comparison_frame(bank, ssbo, position, status) -> pd.DataFrame:
+    n_bank = len(position)
+    matched = position >= 0
+    partners = position[matched]
+    
+    def ssbo_side(values):
+        column = np.full(n_bank, "No match", dtype=object)
+        column[matched] = values[partners]
+        return column
+    
+    # Object columns are passed through as is; inferring a string dtype for
+    # every column costs more than the match itself
+    return pd.DataFrame({
+        'Date_A': pd.Series(bank.date_values(), dtype=object),
+        'Description_A': pd.Series(bank.text_values(), dtype=object),
+        'Type_A': pd.Series(bank.types_display(), dtype=object),
+        'Amount_A': pd.Series(cents_to_float(bank.cents)),
+        'Date_B': pd.Series(ssbo_side(ssbo.date_values()), dtype=object),
+        'Description_B': pd.Series(ssbo_side(ssbo.text_values()), dtype=object),
+        'Type_B': pd.Series(ssbo_side(ssbo.types_display()), dtype=object),
+        'Amount_B': pd.Series(ssbo_side(cents_to_float(ssbo.cents).astype(object)), dtype=object),
+        'Status': pd.Series(status, dtype=object),
+    })
@@ -0,0 +1,207 @@
+"""
+Process-wide scheduling of model calls
+
+Every Streamlit session shares one API key, so their calls share one rate
+limit. RequestScheduler sits in front of the extraction calls and:
+
+- admits every model request, retries included, through token buckets sized
+  in requests/min and input tokens/min, so end-of-day bursts queue here
+  instead of failing upstream
+- serves waiting sessions round-robin, one request per session per turn, so
+  a long statement from one operator does not starve everyone else
+- coalesces identical in-flight extractions (same image, prompt and model):
+  the first caller makes the requests and later ones share its result
+
+Queue depth, wait times and coalesced calls are exposed through stats().
+"""
+import contextvars
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+
+from tracing import span
+
+REQUESTS_PER_MINUTE = int(os.environ.get("ANTHROPIC_REQUESTS_PER_MINUTE", "50"))
+INPUT_TOKENS_PER_MINUTE = int(os.environ.get("ANTHROPIC_INPUT_TOKENS_PER_MINUTE", "30000"))
+WAIT_SAMPLES = 500
+DEFAULT_SESSION = "default"
+
+_session = contextvars.ContextVar("scheduler_session", default=DEFAULT_SESSION)
+
+
+def current_session() -> str:
+    """Session the calling thread schedules on behalf of"""
+    return _session.get()
+
+
+def bind_session(func, session_id=None):
+    """
+    Wrap func so it runs as session_id in whatever thread calls it
+
+    Worker threads don't inherit the submitting thread's context; wrap jobs
+    before handing them to an executor. session_id defaults to the caller's
+    current session.
+    """
+    session_id = current_session() if session_id is None else session_id
+
+    def bound(*args, **kwargs):
+        token = _session.set(session_id)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _session.reset(token)
+    return bound
+
+
+class TokenBucket:
+    """Continuously refilled bucket holding up to one minute's allowance"""
+
+    def __init__(self, per_minute, clock=time.monotonic):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.level = self.capacity
+        self._clock = clock
+        self._stamp = clock()
+
+    def _refill(self):
+        now = self._clock()
+        self.level = min(self.capacity, self.level + (now - self._stamp) * self.rate)
+        self._stamp = now
+
+    def wait_time(self, amount) -> float:
+        """Seconds until amount can be taken (0 if it can be taken now)"""
+        self._refill()
+        missing = min(amount, self.capacity) - self.level
+        return max(0.0, missing / self.rate) if self.rate else float("inf")
+
+    def take(self, amount):
+        self._refill()
+        self.level -= min(amount, self.capacity)
+
+
+class RequestScheduler:
+    def __init__(self, requests_per_minute=REQUESTS_PER_MINUTE, tokens_per_minute=INPUT_TOKENS_PER_MINUTE,
+                 clock=time.monotonic):
+        """
+        Args:
+            requests_per_minute: Request budget shared by all sessions
+            tokens_per_minute: Input-token budget shared by all sessions
+            clock: Monotonic time source (seconds)
+        """
+        self.requests = TokenBucket(requests_per_minute, clock)
+        self.tokens = TokenBucket(tokens_per_minute, clock)
+        self._clock = clock
+        self._cond = threading.Condition()
+        # Sessions with waiting calls, in round-robin order
+        self._queues = OrderedDict()
+        self._inflight = {}
+        self._waits = deque(maxlen=WAIT_SAMPLES)
+        self._granted = 0
+        self._coalesced = 0
+
+    def run(self, key, func):
+        """
+        Run func(), sharing the call with identical callers
+
+        func may make several API requests (re-reads, retries); it passes
+        each one through admit(), so only the first caller's requests count
+        against the rate limit.
+
+        Args:
+            key: Identity of the call; concurrent callers with the same key
+                get the first caller's result (or exception)
+            func: Zero-argument callable making the API requests
+
+        Returns:
+            func's result
+        """
+        with self._cond:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+            else:
+                self._coalesced += 1
+        if not leader:
+            return future.result()
+
+        try:
+            result = func()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._cond:
+                del self._inflight[key]
+
+    def admit(self, tokens=0, session=None):
+        """
+        Block until it is the caller's turn and both buckets allow one request
+
+        Call once per API request, retries included.
+
+        Args:
+            tokens: Estimated input tokens for the request
+            session: Caller's session (defaults to current_session())
+        """
+        with span("scheduler.wait", tokens=tokens):
+            self._admit(session or current_session(), tokens)
+
+    def _admit(self, session, tokens):
+        ticket = object()
+        start = self._clock()
+        with self._cond:
+            self._queues.setdefault(session, deque()).append(ticket)
+            while True:
+                queue = self._queues[session]
+                if next(iter(self._queues)) == session and queue[0] is ticket:
+                    wait = max(self.requests.wait_time(1), self.tokens.wait_time(tokens))
+                    if wait <= 0:
+                        break
+                    self._cond.wait(wait)
+                else:
+                    self._cond.wait()
+
+            self.requests.take(1)
+            self.tokens.take(tokens)
+            queue.popleft()
+            if queue:
+                # Back of the line; other sessions get the next turns
+                self._queues.move_to_end(session)
+            else:
+                del self._queues[session]
+            self._granted += 1
+            self._waits.append(self._clock() - start)
+            self._cond.notify_all()
+
+    def stats(self) -> dict:
+        with self._cond:
+            waits = sorted(self._waits)
+            return {
+                'queue_depth': sum(len(q) for q in self._queues.values()),
+                'waiting_sessions': len(self._queues),
+                'in_flight': len(self._inflight),
+                'granted': self._granted,
+                'coalesced': self._coalesced,
+                'wait_mean': sum(waits) / len(waits) if waits else 0.0,
+                'wait_p95': waits[int(0.95 * (len(waits) - 1))] if waits else 0.0,
+                'wait_max': waits[-1] if waits else 0.0,
+            }
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_request_scheduler() -> RequestScheduler:
+    """Return the process-wide scheduler, shared by every Streamlit session"""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = RequestScheduler()
+        return _scheduler
@@ -0,0 +1,81 @@
+"""
+Store of finished reconciliation runs
+
+Streamlit reruns the script on every widget interaction, so results
+rendered once are gone on the next rerun. Finished runs are kept here, keyed
+by the content hashes of the bank and SSBO uploads, so any later rerun can
+re-render them without extracting or matching again.
+
+The store is process-wide, but a run holds one operator's amounts and
+remarks, so every run belongs to the Streamlit session that made it and is
+only handed back to that session. A page refresh starts a new session and
+with it an empty set of runs.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+MAX_RUNS = 32
+
+
+def run_key(bank_hash: str, ssbo_hash: str) -> str:
+    """Identity of an input pair, from the sha256 of each upload"""
+    return hashlib.sha256(f"{bank_hash}:{ssbo_hash}".encode("ascii")).hexdigest()[:32]
+
+
+class StoredRun:
+    """Everything the results view needs to redraw one run"""
+
+    def __init__(self, key, bank_result, ssbo_result, comparison, carried, tolerance, duration, trace_id=None,
+                 session=None):
+        self.key = key
+        self.session = session
+        self.bank_result = bank_result
+        self.ssbo_result = ssbo_result
+        self.comparison = comparison
+        self.carried = carried
+        self.tolerance = dict(tolerance)
+        self.duration = duration
+        self.trace_id = trace_id
+        self.created = time.time()
+
+
+class RunStore:
+    def __init__(self, max_runs=MAX_RUNS):
+        self.max_runs = max_runs
+        self.hits = 0
+        self.misses = 0
+        self._runs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, session=None):
+        """The run session stored for key, or None"""
+        with self._lock:
+            run = self._runs.get((session, key))
+            if run is None:
+                self.misses += 1
+                return None
+            self._runs.move_to_end((session, key))
+            self.hits += 1
+            return run
+
+    def put(self, run: StoredRun):
+        """Keep run, replacing any earlier run of the same input pair in its session"""
+        with self._lock:
+            self._runs[(run.session, run.key)] = run
+            self._runs.move_to_end((run.session, run.key))
+            while len(self._runs) > self.max_runs:
+                self._runs.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'runs': len(self._runs)}
+
+
+_store = RunStore()
+
+
+def get_run_store() -> RunStore:
+    """Return the process-wide run store, shared by every Streamlit session"""
+    return _store
@@ -0,0 +1,410 @@
+"""
+Structured statement ingestion
+
+Parses machine-readable bank statements (CSV, XLSX, MT940, OFX) and SSBO
+exports (CSV, XLSX) straight into the columns create_comparison_table
+consumes, so these uploads never go through OCR. Files are read in chunks of
+CHUNK_ROWS rows and only the four canonical columns are kept, which bounds
+parsing memory regardless of how wide or long the export is.
+"""
+import csv
+import io
+import itertools
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+from reconcile_engine import BANK_FIELDS, SSBO_FIELDS
+
+CHUNK_ROWS = 20_000
+HEADER_SEARCH_ROWS = 50
+
+BANK_EXTENSIONS = {
+    '.csv': 'csv', '.txt': 'csv',
+    '.xlsx': 'xlsx', '.xlsm': 'xlsx',
+    '.sta': 'mt940', '.mt940': 'mt940', '.940': 'mt940',
+    '.ofx': 'ofx', '.qfx': 'ofx',
+}
+SSBO_EXTENSIONS = {'.csv': 'csv', '.txt': 'csv', '.xlsx': 'xlsx', '.xlsm': 'xlsx'}
+STRUCTURED_UPLOAD_TYPES = sorted({ext.lstrip('.') for ext in BANK_EXTENSIONS})
+
+# Header synonyms, compared after lower-casing and dropping non-alphanumerics
+DATE_COLUMNS = ('eventtime', 'transactiondate', 'txndate', 'date', 'postingdate', 'postdate',
+                'bookingdate', 'valuedate', 'datetime', 'time')
+AMOUNT_COLUMNS = ('amount', 'transactionamount', 'amt', 'value')
+CREDIT_COLUMNS = ('credit', 'creditamount', 'deposit', 'deposits', 'moneyin', 'paidin', 'cr')
+DEBIT_COLUMNS = ('debit', 'debitamount', 'withdrawal', 'withdrawals', 'moneyout', 'paidout', 'dr')
+BANK_DESCRIPTION_COLUMNS = ('descriptionremarks', 'description', 'transactiondescription', 'remarks', 'remark',
+                            'details', 'narrative', 'particulars', 'reference', 'memo')
+SSBO_REMARK_COLUMNS = ('remark', 'remarks', 'description', 'details', 'reference', 'memo')
+TYPE_COLUMNS = ('transactiontype', 'type', 'drcr', 'crdr', 'creditdebit')
+
+DEPOSIT_TYPE_WORDS = {'deposit', 'credit', 'cr', 'c', 'moneyin', 'in'}
+
+
+def _canonical(name) -> str:
+    return re.sub(r'[^a-z0-9]', '', str(name).lower())
+
+
+def _find_column(columns, candidates):
+    """Return the first column (by candidate priority) whose header matches a synonym"""
+    by_name = {}
+    for column in columns:
+        by_name.setdefault(_canonical(column), column)
+    for candidate in candidates:
+        if candidate in by_name:
+            return by_name[candidate]
+    return None
+
+
+def _is_header(values) -> bool:
+    names = [_canonical(value) for value in values if value is not None]
+    has_date = any(name in DATE_COLUMNS for name in names)
+    has_amount = any(name in AMOUNT_COLUMNS + CREDIT_COLUMNS + DEBIT_COLUMNS for name in names)
+    return has_date and has_amount
+
+
+def detect_format(name, head: bytes, extensions=BANK_EXTENSIONS) -> str:
+    """Pick a parser from the file extension, sniffing the content when that is inconclusive"""
+    ext = os.path.splitext(name or '')[1].lower()
+    if ext in extensions:
+        return extensions[ext]
+    if head.startswith(b'PK\x03\x04'):
+        return 'xlsx'
+    text = head.decode('latin-1').lstrip()
+    if text.startswith('OFXHEADER') or '<OFX>' in text.upper():
+        return 'ofx'
+    if ':20:' in text and (':60F:' in text or ':61:' in text):
+        return 'mt940'
+    return 'csv'
+
+
+def is_structured_statement(name) -> bool:
+    """True for uploads that should be parsed rather than OCR'd"""
+    return os.path.splitext(name or '')[1].lower() in BANK_EXTENSIONS
+
+
+# -------------------------------
+# Value Parsing
+# -------------------------------
+
+def _parse_amounts(values: pd.Series) -> pd.Series:
+    """Parse amounts like '1,500.00', '(20.00)', '20.00-' or '20.00 DR' into signed floats"""
+    if pd.api.types.is_numeric_dtype(values):
+        return values.astype(np.float64)
+    text = values.astype(object).where(values.notna(), '').astype(str).str.strip()
+    upper = text.str.upper()
+    negative = (text.str.startswith('(') & text.str.endswith(')')) | text.str.endswith('-') | upper.str.endswith('DR')
+    cleaned = text.str.replace(r'[^0-9.\-]', '', regex=True).str.rstrip('-')
+    amounts = pd.to_numeric(cleaned, errors='coerce')
+    return amounts.where(~negative, -amounts.abs())
+
+
+def _parse_dates(values: pd.Series) -> pd.Series:
+    """Format dates as YYYY-MM-DD, parsing each distinct value once; unparsable values pass through"""
+    codes, uniques = pd.factorize(values.astype(object).where(values.notna(), ''))
+    uniques = pd.Series(uniques, dtype=object).astype(str)
+    parsed = pd.to_datetime(uniques, format='ISO8601', errors='coerce')
+    rest = parsed.isna()
+    if rest.any():
+        parsed[rest] = pd.to_datetime(uniques[rest], dayfirst=True, format='mixed', errors='coerce')
+    formatted = parsed.dt.strftime('%Y-%m-%d').where(parsed.notna(), uniques)
+    return pd.Series(formatted.to_numpy(dtype=object)[codes], index=values.index, dtype=object)
+
+
+def _deposit_flags(types: pd.Series) -> pd.Series:
+    return types.astype(str).map(_canonical).isin(DEPOSIT_TYPE_WORDS)
+
+
+# -------------------------------
+# Chunk Readers
+# -------------------------------
+
+def _open_binary(source):
+    if isinstance(source, (str, os.PathLike)):
+        return open(source, 'rb')
+    source.seek(0)
+    return source
+
+
+def _iter_csv_chunks(source):
+    """Yield string DataFrames of CHUNK_ROWS rows, skipping any preamble above the header"""
+    stream = _open_binary(source)
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', errors='replace', newline='')
+    try:
+        head = list(itertools.islice(csv.reader(text), HEADER_SEARCH_ROWS))
+        header_row = next((i for i, row in enumerate(head) if _is_header(row)), 0)
+
+        stream.seek(0)
+        reader = pd.read_csv(
+            stream, dtype=str, keep_default_na=False, skiprows=header_row, chunksize=CHUNK_ROWS,
+            skipinitialspace=True, encoding='utf-8-sig', encoding_errors='replace', on_bad_lines='skip'
+        )
+        for chunk in reader:
+            yield chunk
+    finally:
+        # Leave the caller's file object open
+        text.detach()
+        if isinstance(source, (str, os.PathLike)):
+            stream.close()
+
+
+def _iter_xlsx_chunks(source):
+    """Yield DataFrames of CHUNK_ROWS rows from the first worksheet, in read-only streaming mode"""
+    try:
+        import openpyxl
+    except ImportError as e:
+        raise ImportError("Reading .xlsx statements requires openpyxl (pip install openpyxl)") from e
+
+    workbook = openpyxl.load_workbook(_open_binary(source), read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        head = list(itertools.islice(rows, HEADER_SEARCH_ROWS))
+        header_row = next((i for i, row in enumerate(head) if _is_header(row)), 0)
+        if not head:
+            return
+        columns = [str(value) if value is not None else f"column_{i}" for i, value in enumerate(head[header_row])]
+
+        remaining = itertools.chain(head[header_row + 1:], rows)
+        while True:
+            batch = list(itertools.islice(remaining, CHUNK_ROWS))
+            if not batch:
+                break
+            width = len(columns)
+            padded = [tuple(row[:width]) + (None,) * (width - len(row)) for row in batch]
+            yield pd.DataFrame(padded, columns=columns, dtype=object)
+    finally:
+        workbook.close()
+
+
+def _iter_text_lines(source):
+    stream = _open_binary(source)
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', errors='replace')
+    try:
+        for line in text:
+            yield line.rstrip('\r\n')
+    finally:
+        text.detach()
+        if isinstance(source, (str, os.PathLike)):
+            stream.close()
+
+
+MT940_STATEMENT_LINE = re.compile(r'^(\d{6})(\d{4})?(R?[CD])([A-Z])?(\d+,\d*)(.*)$')
+
+
+def _iter_mt940_records(source):
+    """Yield (date, amount, description, type) for every :61: statement line"""
+    pending = None
+    description = []
+    current_tag = None
+
+    def flush():
+        date, amount, mark, reference = pending
+        text = ' '.join(part.strip() for part in description if part.strip()) or reference
+        is_deposit = mark in ('C', 'RD')
+        return date, amount, text, 'Deposit' if is_deposit else 'Transfer'
+
+    for line in _iter_text_lines(source):
+        tag = re.match(r'^:(\w+):(.*)$', line)
+        if tag:
+            current_tag, value = tag.group(1), tag.group(2)
+            if current_tag == '61':
+                if pending:
+                    yield flush()
+                match = MT940_STATEMENT_LINE.match(value.strip())
+                if match is None:
+                    pending = None
+                    continue
+                yymmdd, _, mark, _, amount, rest = match.groups()
+                date = f"20{yymmdd[:2]}-{yymmdd[2:4]}-{yymmdd[4:6]}"
+                pending = (date, float(amount.replace(',', '.')), mark, rest.strip())
+                description = []
+            elif current_tag == '86' and pending:
+                description = [value]
+            elif pending and current_tag not in ('86',):
+                yield flush()
+                pending = None
+        elif current_tag == '86' and pending:
+            description.append(line)
+    if pending:
+        yield flush()
+
+
+OFX_TOKEN = re.compile(r'<(/?)([A-Za-z0-9.]+)>([^<]*)')
+OFX_DEPOSIT_TYPES = {'CREDIT', 'DEP', 'DIRECTDEP', 'INT', 'DIV'}
+
+
+def _iter_ofx_records(source, block_size=1 << 16):
+    """Yield (date, amount, description, type) for every STMTTRN, reading the file in blocks"""
+    stream = _open_binary(source)
+    decoder = io.TextIOWrapper(stream, encoding='utf-8', errors='replace')
+    transaction = None
+    buffer = ''
+
+    def flush(fields):
+        try:
+            amount = float(fields.get('TRNAMT', '').replace(',', ''))
+        except ValueError:
+            return None
+        posted = fields.get('DTPOSTED', '')
+        date = f"{posted[:4]}-{posted[4:6]}-{posted[6:8]}" if len(posted) >= 8 else posted
+        text = ' '.join(value for value in (fields.get('NAME', ''), fields.get('MEMO', '')) if value)
+        is_deposit = fields.get('TRNTYPE', '').upper() in OFX_DEPOSIT_TYPES or amount > 0
+        return date, abs(amount), text, 'Deposit' if is_deposit else 'Transfer'
+
+    try:
+        while True:
+            block = decoder.read(block_size)
+            buffer += block
+            # Only consume complete tokens; keep the trailing partial one for the next block
+            cut = len(buffer) if not block else buffer.rfind('<')
+            for closing, tag, value in OFX_TOKEN.findall(buffer[:max(cut, 0)]):
+                tag = tag.upper()
+                if tag == 'STMTTRN':
+                    if transaction and flush(transaction):
+                        yield flush(transaction)
+                    transaction = None if closing else {}
+                elif transaction is not None and not closing:
+                    transaction[tag] = value.strip()
+            buffer = buffer[max(cut, 0):]
+            if not block:
+                break
+        if transaction and flush(transaction):
+            yield flush(transaction)
+    finally:
+        decoder.detach()
+        if isinstance(source, (str, os.PathLike)):
+            stream.close()
+
+
+def _records_to_frames(records, fields):
+    """Batch an iterator of row tuples into DataFrames of CHUNK_ROWS rows"""
+    while True:
+        batch = list(itertools.islice(records, CHUNK_ROWS))
+        if not batch:
+            break
+        yield pd.DataFrame(batch, columns=fields)
+
+
+# -------------------------------
+# Column Mapping
+# -------------------------------
+
+def _map_bank_chunk(chunk: pd.DataFrame) -> pd.DataFrame:
+    """Map one chunk of an arbitrary bank export onto BANK_FIELDS"""
+    columns = list(chunk.columns)
+    date_col = _find_column(columns, DATE_COLUMNS)
+    if date_col is None:
+        raise ValueError(f"No date column found in bank statement (columns: {columns})")
+    description_col = _find_column(columns, BANK_DESCRIPTION_COLUMNS)
+    credit_col = _find_column(columns, CREDIT_COLUMNS)
+    debit_col = _find_column(columns, DEBIT_COLUMNS)
+    amount_col = _find_column(columns, AMOUNT_COLUMNS)
+    type_col = _find_column(columns, TYPE_COLUMNS)
+
+    if credit_col is not None or debit_col is not None:
+        # Separate Credit/Debit columns: a value under Credit makes the row a Deposit
+        credit = _parse_amounts(chunk[credit_col]) if credit_col is not None else pd.Series(np.nan, index=chunk.index)
+        debit = _parse_amounts(chunk[debit_col]) if debit_col is not None else pd.Series(np.nan, index=chunk.index)
+        is_deposit = credit.notna() & (credit != 0)
+        amounts = credit.where(is_deposit, debit)
+    elif amount_col is not None:
+        amounts = _parse_amounts(chunk[amount_col])
+        if type_col is not None:
+            is_deposit = _deposit_flags(chunk[type_col])
+        else:
+            is_deposit = amounts > 0
+    else:
+        raise ValueError(f"No amount, credit or debit column found in bank statement (columns: {columns})")
+
+    keep = amounts.notna()
+    return pd.DataFrame({
+        'Event Time': _parse_dates(chunk[date_col][keep]),
+        'Amount': amounts[keep].abs(),
+        'Description/Remarks': chunk[description_col][keep].astype(str) if description_col is not None else '',
+        'Transaction Type': np.where(is_deposit[keep], 'Deposit', 'Transfer'),
+    })
+
+
+def _map_ssbo_chunk(chunk: pd.DataFrame) -> pd.DataFrame:
+    """Map one chunk of an SSBO export onto SSBO_FIELDS, keeping only Deposit/Transfer rows"""
+    columns = list(chunk.columns)
+    date_col = _find_column(columns, DATE_COLUMNS)
+    amount_col = _find_column(columns, AMOUNT_COLUMNS)
+    type_col = _find_column(columns, TYPE_COLUMNS)
+    remark_col = _find_column(columns, SSBO_REMARK_COLUMNS)
+    if date_col is None or amount_col is None or type_col is None:
+        raise ValueError(
+            f"SSBO export must include Event Time, Transaction Type and Amount columns (columns: {columns})"
+        )
+
+    types = chunk[type_col].astype(str).str.strip()
+    amounts = _parse_amounts(chunk[amount_col])
+    keep = types.str.lower().isin(('deposit', 'transfer')) & amounts.notna()
+    return pd.DataFrame({
+        'Event Time': _parse_dates(chunk[date_col][keep]),
+        'Amount': amounts[keep].abs(),
+        'Remark': chunk[remark_col][keep].astype(str) if remark_col is not None else '',
+        'Transaction Type': types[keep].str.capitalize(),
+    })
+
+
+def _concat(frames, fields) -> pd.DataFrame:
+    frames = [frame for frame in frames if len(frame)]
+    if not frames:
+        return pd.DataFrame(columns=fields)
+    return pd.concat(frames, ignore_index=True)[fields]
+
+
+def _head(source) -> bytes:
+    stream = _open_binary(source)
+    try:
+        return stream.read(4096)
+    finally:
+        if isinstance(source, (str, os.PathLike)):
+            stream.close()
+        else:
+            stream.seek(0)
+
+
+def parse_bank_statement(source, name=None) -> pd.DataFrame:
+    """
+    Parse a machine-readable bank statement
+
+    Args:
+        source: Path or binary file object (e.g. a Streamlit UploadedFile)
+        name: File name used to pick the format; defaults to source's name
+
+    Returns:
+        DataFrame with BANK_FIELDS columns, one row per transaction
+    """
+    name = name or getattr(source, 'name', None) or str(source)
+    fmt = detect_format(name, _head(source), BANK_EXTENSIONS)
+
+    if fmt == 'mt940':
+        frames = _records_to_frames(_iter_mt940_records(source), BANK_FIELDS)
+    elif fmt == 'ofx':
+        frames = _records_to_frames(_iter_ofx_records(source), BANK_FIELDS)
+    elif fmt == 'xlsx':
+        frames = (_map_bank_chunk(chunk) for chunk in _iter_xlsx_chunks(source))
+    else:
+        frames = (_map_bank_chunk(chunk) for chunk in _iter_csv_chunks(source))
+    return _concat(frames, BANK_FIELDS)
+
+
+def parse_ssbo_export(source, name=None) -> pd.DataFrame:
+    """
+    Parse an SSBO CSV/XLSX export
+
+    Returns:
+        DataFrame with SSBO_FIELDS columns, Deposit and Transfer rows only
+    """
+    name = name or getattr(source, 'name', None) or str(source)
+    fmt = detect_format(name, _head(source), SSBO_EXTENSIONS)
+    if fmt not in ('csv', 'xlsx'):
+        raise ValueError(f"Unsupported SSBO export format: {name}")
+
+    chunks = _iter_xlsx_chunks(source) if fmt == 'xlsx' else _iter_csv_chunks(source)
+    return _concat((_map_ssbo_chunk(chunk) for chunk in chunks), SSBO_FIELDS)
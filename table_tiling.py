@@ -0,0 +1,291 @@
+"""
+Row-band tiling for tall table screenshots
+
+Long statements hurt OCR accuracy and latency when sent as one image. These
+helpers find horizontal row separators with OpenCV, cut the table into
+overlapping bands that each repeat the header row, and stitch the per-band
+rows back together without the duplicates introduced by the overlaps. The
+same fingerprints stitch several screenshots of one scrolled statement.
+"""
+import io
+
+import cv2
+import numpy as np
+from PIL import Image
+
+DEFAULT_ROWS_PER_BAND = 15
+DEFAULT_OVERLAP_ROWS = 2
+MIN_ROW_HEIGHT = 8
+
+# Rows two screenshots must share before the shared rows count as an overlap
+# rather than repeated transactions; fewer when the rows carry a running
+# balance, which identical transactions never share
+MIN_SCREENSHOT_OVERLAP_ROWS = 3
+MIN_BALANCED_OVERLAP_ROWS = 2
+# Fingerprint key of the running balance column
+BALANCE_FIELD = 'balance'
+
+
+class InMemoryUpload(io.BytesIO):
+    """Bytes wrapped to look like a Streamlit UploadedFile"""
+
+    def __init__(self, data, name="upload.png", type="image/png"):
+        super().__init__(data)
+        self.name = name
+        self.type = type
+        self.size = len(data)
+
+
+def _group_runs(indices):
+    """Collapse sorted indices into (start, end) runs of consecutive values"""
+    runs = []
+    for idx in indices:
+        if runs and idx == runs[-1][1] + 1:
+            runs[-1][1] = idx
+        else:
+            runs.append([idx, idx])
+    return runs
+
+
+def find_row_separators(gray: np.ndarray) -> list:
+    """
+    Find the y coordinates of horizontal row separators
+    
+    Ruled tables are detected from long horizontal lines; if there are too few
+    of those, blank horizontal gaps between text lines are used instead.
+    
+    Args:
+        gray: 2-D uint8 grayscale image
+        
+    Returns:
+        Sorted list of separator y coordinates
+    """
+    height, width = gray.shape
+    _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    
+    # Ruled lines: keep only horizontal strokes spanning a large part of the table
+    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (max(width // 4, 1), 1))
+    lines = cv2.morphologyEx(binary, cv2.MORPH_OPEN, kernel)
+    line_rows = np.flatnonzero(np.count_nonzero(lines, axis=1) > width * 0.5)
+    separators = [(start + end) // 2 for start, end in _group_runs(line_rows)]
+    
+    if len(separators) < 3:
+        # Unruled table: split in the middle of each blank gap between text lines
+        ink = np.count_nonzero(binary, axis=1)
+        blank_rows = np.flatnonzero(ink <= max(1, width // 500))
+        separators = [
+            (start + end) // 2 for start, end in _group_runs(blank_rows)
+            if start > 0 and end < height - 1
+        ]
+    
+    # Drop separators too close together to bound a real row
+    merged = []
+    for y in separators:
+        if not merged or y - merged[-1] >= MIN_ROW_HEIGHT:
+            merged.append(y)
+    return merged
+
+
+def find_table_rows(gray: np.ndarray) -> list:
+    """Return (top, bottom) pixel spans of every non-empty table row, header first"""
+    height = gray.shape[0]
+    bounds = [0] + find_row_separators(gray) + [height]
+    
+    rows = []
+    for top, bottom in zip(bounds, bounds[1:]):
+        if bottom - top < MIN_ROW_HEIGHT:
+            continue
+        # Skip bands with no dark-on-light (or light-on-dark) contrast at all
+        if int(gray[top:bottom].max()) - int(gray[top:bottom].min()) < 32:
+            continue
+        rows.append((top, bottom))
+    return rows
+
+
+def split_into_bands(image, rows_per_band=DEFAULT_ROWS_PER_BAND, overlap_rows=DEFAULT_OVERLAP_ROWS) -> list:
+    """
+    Cut a table screenshot into overlapping row bands with the header repeated
+    
+    Args:
+        image: PIL image of the table, header row at the top, or its 2-D
+            uint8 grayscale array (bands are then cut from it without a copy
+            of the whole image)
+        rows_per_band: Maximum data rows per band
+        overlap_rows: Data rows shared by consecutive bands
+        
+    Returns:
+        List of PIL images; a single-element list holding the original image
+        when the table is short enough to send as is
+    """
+    is_array = isinstance(image, np.ndarray)
+    gray = image if is_array else np.asarray(image.convert('L'))
+    rows = find_table_rows(gray)
+    if len(rows) < 2 or len(rows) - 1 <= rows_per_band:
+        return [Image.fromarray(gray) if is_array else image]
+    
+    header, data_rows = rows[0], rows[1:]
+    
+    step = max(rows_per_band - overlap_rows, 1)
+    if not is_array:
+        header_crop = image.crop((0, header[0], image.width, header[1]))
+    
+    bands = []
+    for start in range(0, len(data_rows), step):
+        chunk = data_rows[start:start + rows_per_band]
+        if is_array:
+            bands.append(Image.fromarray(np.vstack((gray[header[0]:header[1]], gray[chunk[0][0]:chunk[-1][1]]))))
+        else:
+            body = image.crop((0, chunk[0][0], image.width, chunk[-1][1]))
+            band = Image.new(image.mode, (image.width, header_crop.height + body.height), "white")
+            band.paste(header_crop, (0, 0))
+            band.paste(body, (0, header_crop.height))
+            bands.append(band)
+        
+        if start + rows_per_band >= len(data_rows):
+            break
+    return bands
+
+
+def crop_rows(gray: np.ndarray, rows: list, indices) -> Image.Image:
+    """
+    Stack the header row and the chosen data rows of a table into one image
+    
+    Args:
+        gray: 2-D uint8 grayscale array of the table
+        rows: (top, bottom) row spans from find_table_rows, header first
+        indices: Data row indices, 0 being the first row under the header
+        
+    Returns:
+        PIL image of the header followed by those rows, in the given order
+    """
+    spans = [rows[0]] + [rows[i + 1] for i in indices]
+    return Image.fromarray(np.vstack([gray[top:bottom] for top, bottom in spans]))
+
+
+def _fingerprint_value(value) -> str:
+    if isinstance(value, float):
+        return f"{value:.2f}"
+    # Whitespace and thousands separators vary between readings of one row
+    return "".join(str(value).split()).replace(",", "").lower()
+
+
+def row_fingerprint(row: dict) -> tuple:
+    """Hashable, formatting-insensitive identity of one extracted row"""
+    return tuple(sorted((str(key).strip().lower(), _fingerprint_value(value)) for key, value in row.items()))
+
+
+def merge_band_rows(band_rows: list, overlap_rows=DEFAULT_OVERLAP_ROWS) -> list:
+    """
+    Stitch per-band extraction results back into one list of rows
+    
+    Consecutive bands share up to ``overlap_rows`` rows. Only a matching run
+    at the seam is dropped, so identical transactions elsewhere in the table
+    are kept.
+    """
+    merged, merged_prints = [], []
+    for rows in band_rows:
+        rows = list(rows)
+        prints = [row_fingerprint(row) for row in rows]
+        overlap = 0
+        for k in range(min(overlap_rows, len(merged), len(rows)), 0, -1):
+            if merged_prints[-k:] == prints[:k]:
+                overlap = k
+                break
+        merged.extend(rows[overlap:])
+        merged_prints.extend(prints[overlap:])
+    return merged
+
+
+def _seam(upper: list, lower: list) -> int:
+    """Length of the longest run ending upper that also starts lower"""
+    first = lower[0]
+    for start in range(max(len(upper) - len(lower), 0), len(upper)):
+        if upper[start] == first and upper[start:] == lower[:len(upper) - start]:
+            return len(upper) - start
+    return 0
+
+
+def _contains(outer: list, inner: list) -> bool:
+    """Whether inner occurs in outer as one contiguous run"""
+    first, size = inner[0], len(inner)
+    return any(outer[start] == first and outer[start:start + size] == inner
+               for start in range(len(outer) - size + 1))
+
+
+def _corroborated(prints: list) -> bool:
+    """Whether a run of rows found in two screenshots is long enough to be their overlap"""
+    balanced = any(value not in ("", "none", "nan") for p in prints for key, value in p if key == BALANCE_FIELD)
+    return len(prints) >= (MIN_BALANCED_OVERLAP_ROWS if balanced else MIN_SCREENSHOT_OVERLAP_ROWS)
+
+
+def merge_screenshot_rows(screenshot_rows: list) -> list:
+    """
+    Merge the rows of several screenshots of one statement
+    
+    Screenshots taken while scrolling overlap by an unknown number of rows
+    and may be uploaded in any order. Merged rows are kept as runs: a
+    screenshot whose first rows repeat the end of a run continues it, one
+    whose last rows repeat the start of a run precedes it, and one already
+    contained in a run adds nothing. Every row is fingerprinted once.
+    
+    Identical transactions look like an overlap too, so rows are only
+    dropped when the shared run is corroborated (see _corroborated); a
+    shorter match is kept and counted as unconfirmed. Identical transactions
+    inside one screenshot, or in screenshots that do not overlap, are all
+    kept.
+    
+    Args:
+        screenshot_rows: Extracted rows of each screenshot, in upload order
+        
+    Returns:
+        Tuple of (merged list of rows, runs in the order they were first
+        uploaded; report dict with the number of rows 'dropped' as overlap
+        and of 'unconfirmed' rows that looked repeated but were kept)
+    """
+    runs = []  # [first upload index, rows, fingerprints] per run of overlapping screenshots
+    report = {'dropped': 0, 'unconfirmed': 0}
+    for index, rows in enumerate(screenshot_rows):
+        rows = list(rows)
+        if not rows:
+            continue
+        prints = [row_fingerprint(row) for row in rows]
+        piece = [index, rows, prints]
+        if any(_contains(run[2], prints) for run in runs):
+            if _corroborated(prints):
+                report['dropped'] += len(rows)
+            else:
+                report['unconfirmed'] += len(rows)
+                runs.append(piece)
+            continue
+        
+        for run in [run for run in runs if _contains(prints, run[2])]:
+            if not _corroborated(run[2]):
+                report['unconfirmed'] += len(run[2])
+                continue
+            report['dropped'] += len(run[2])
+            piece[0] = min(piece[0], run[0])
+            runs.remove(run)
+        # Continue the run whose end this screenshot starts with, then join
+        # the run that starts with this screenshot's end
+        for joins_below in (True, False):
+            seams = [(_seam(run[2], piece[2]) if joins_below else _seam(piece[2], run[2]), run) for run in runs]
+            seams = [(overlap, run) for overlap, run in seams if overlap]
+            shared = [(overlap, run) for overlap, run in seams
+                      if _corroborated((piece if joins_below else run)[2][:overlap])]
+            if not shared:
+                report['unconfirmed'] += max((overlap for overlap, _ in seams), default=0)
+                continue
+            overlap, run = max(shared, key=lambda seam: seam[0])
+            upper, lower = (run, piece) if joins_below else (piece, run)
+            piece = [min(run[0], piece[0]), upper[1] + lower[1][overlap:], upper[2] + lower[2][overlap:]]
+            runs.remove(run)
+            report['dropped'] += overlap
+        runs.append(piece)
+    return [row for _, rows, _ in sorted(runs, key=lambda run: run[0]) for row in rows], report
+
+
+def encode_band(band: Image.Image, name: str) -> InMemoryUpload:
+    """Wrap a band image as an upload object AnthropicOCR can consume"""
+    buffer = io.BytesIO()
+    band.save(buffer, format='PNG')
+    return InMemoryUpload(buffer.getvalue(), name=name, type="image/png")
@@ -0,0 +1,65 @@
+from balance_verifier import verify_rows
+
+
+def statement(amounts, opening=1000.0):
+    """Rows whose running balance is consistent, oldest first"""
+    rows, balance = [], opening
+    for day, amount in enumerate(amounts, start=1):
+        balance += amount
+        rows.append({
+            'Event Time': f"2025-08-{day:02d}", 'Amount': abs(amount),
+            'Transaction Type': "Deposit" if amount > 0 else "Transfer", 'Balance': balance,
+        })
+    return rows
+
+
+AMOUNTS = [100, -50, 20, 30, -10, 5]
+
+
+def test_consistent_statement_has_no_problems():
+    assert verify_rows(statement(AMOUNTS)) == {'suspects': [], 'problems': []}
+
+
+def test_newest_first_order_is_detected():
+    assert verify_rows(statement(AMOUNTS)[::-1]) == {'suspects': [], 'problems': []}
+
+
+def test_misread_amount_blames_its_row():
+    rows = statement(AMOUNTS)
+    rows[3]['Amount'] = 300
+    result = verify_rows(rows)
+    assert result['suspects'] == [3]
+    assert result['problems'] == ["balance continuity broken at 1 of 5 links"]
+
+
+def test_misread_balance_blames_its_row():
+    rows = statement(AMOUNTS)
+    rows[2]['Balance'] = 9
+    result = verify_rows(rows)
+    assert result['suspects'] == [2]
+    assert result['problems'] == ["balance continuity broken at 2 of 5 links"]
+
+
+def test_suspects_are_reported_in_reply_order():
+    rows = statement(AMOUNTS)
+    rows[3]['Amount'] = 300
+    assert verify_rows(rows[::-1])['suspects'] == [2]
+
+
+def test_row_out_of_date_order():
+    rows = [dict(row, Balance=None) for row in statement(AMOUNTS)]
+    rows[4]['Event Time'] = "2025-07-01"
+    assert verify_rows(rows) == {'suspects': [4], 'problems': ["1 rows out of date order"]}
+
+
+def test_unreadable_amount():
+    rows = statement(AMOUNTS[:3])
+    rows[1]['Amount'] = "abc"
+    result = verify_rows(rows)
+    assert result['suspects'] == [1]
+    assert result['problems'] == ["1 rows with an unreadable date or amount"]
+
+
+def test_row_count_mismatch():
+    result = verify_rows(statement(AMOUNTS), expected_rows=7)
+    assert result['problems'] == ["6 rows read, 7 in the table"]
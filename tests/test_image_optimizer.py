@@ -0,0 +1,48 @@
+import cv2
+import numpy as np
+import pytest
+from PIL import Image
+
+from image_optimizer import MAX_LONG_EDGE, choose_scale, optimize_image
+
+
+def text_image(width, height, font_scale):
+    image = np.full((height, width), 255, dtype=np.uint8)
+    for y in range(60, height, 80):
+        cv2.putText(image, "2025-08-15 Deposit 1,500.00", (20, y), cv2.FONT_HERSHEY_SIMPLEX, font_scale, 0, 2)
+    return Image.fromarray(image)
+
+
+def test_small_image_is_left_alone():
+    assert choose_scale(800, 600) == 1.0
+
+
+def test_large_image_shrinks_to_the_ceiling():
+    assert choose_scale(4000, 1000) == pytest.approx(MAX_LONG_EDGE / 4000)
+
+
+def test_large_text_does_not_stop_the_ceiling():
+    assert choose_scale(4000, 1000, glyph_height=60) == pytest.approx(MAX_LONG_EDGE / 4000)
+
+
+def test_glyph_floor_stops_the_shrink_early():
+    assert choose_scale(4000, 1000, glyph_height=24) == pytest.approx(0.5)
+
+
+def test_text_already_under_the_floor_is_not_shrunk():
+    assert choose_scale(4000, 1000, glyph_height=8) == 1.0
+
+
+@pytest.mark.parametrize("mode", ["gray", "binary", "quantize"])
+def test_optimize_image_report(mode):
+    report = optimize_image(text_image(3200, 800, 2.0), original_bytes=1000, mode=mode)
+    assert report['original_size'] == (3200, 800)
+    assert max(report['optimized_size']) <= 3200
+    assert report['optimized_tokens'] <= report['original_tokens']
+    assert isinstance(report['glyph_floor'], bool)
+    assert report['media_type'] in ("image/png", "image/webp")
+
+
+def test_unknown_mode_is_rejected():
+    with pytest.raises(ValueError):
+        optimize_image(text_image(100, 100, 1.0), mode="sepia")
@@ -0,0 +1,70 @@
+import pytest
+
+from json_stream import RowStreamParser, strip_thousands_separators
+
+REPLY = 'Here are the rows:\n```json\n[{"Amount": 1,500.00, "Remark": "REF 1,2"}, {"Amount": 20}]\n```'
+
+
+def feed_in_chunks(text, size):
+    parser = RowStreamParser()
+    for i in range(0, len(text), size):
+        parser.feed(text[i:i + size])
+    return parser
+
+
+def test_strip_thousands_separators_leaves_strings_alone():
+    assert strip_thousands_separators('{"a": 1,234.50, "b": "1,2"}') == '{"a": 1234.50, "b": "1,2"}'
+
+
+@pytest.mark.parametrize("size", [1, 3, 7, len(REPLY)])
+def test_rows_arrive_whatever_the_chunking(size):
+    parser = feed_in_chunks(REPLY, size)
+    assert parser.rows == [{"Amount": 1500.0, "Remark": "REF 1,2"}, {"Amount": 20}]
+    assert parser.complete
+    assert parser.close() == parser.rows
+
+
+def test_feed_returns_rows_as_they_complete():
+    parser = RowStreamParser()
+    assert parser.feed('[{"a": 1}, {"a"') == [{"a": 1}]
+    assert parser.feed(': 2}]') == [{"a": 2}]
+
+
+def test_tool_input_wrapper_is_skipped():
+    parser = feed_in_chunks('{"rows": [{"a": 1}, {"a": {"b": [2]}}]}', 4)
+    assert parser.rows == [{"a": 1}, {"a": {"b": [2]}}]
+    assert parser.complete
+
+
+@pytest.mark.parametrize("size", [1, 3, 100])
+def test_bracketed_prose_before_the_array_is_skipped(size):
+    parser = feed_in_chunks('[Note] totals are in [USD]:\n[\n  {"a": 1}\n]', size)
+    assert parser.rows == [{"a": 1}]
+    assert parser.complete
+
+
+def test_empty_array():
+    parser = feed_in_chunks('{"rows": []}', 1)
+    assert parser.rows == []
+    assert parser.complete
+
+
+def test_cut_off_array_keeps_the_rows_that_arrived():
+    parser = feed_in_chunks('[{"a": 1}, {"a": 2}, {"a"', 5)
+    assert parser.rows == [{"a": 1}, {"a": 2}]
+    assert not parser.complete
+    assert parser.problems() == ["array cut off after 2 rows"]
+
+
+def test_malformed_row_is_recorded_and_skipped():
+    parser = feed_in_chunks('[{"a": 1}, {"a": oops}, {"a": 3}]', 6)
+    assert parser.rows == [{"a": 1}, {"a": 3}]
+    assert not parser.complete
+    assert parser.problems()[0].startswith("row 2:")
+
+
+def test_reply_without_an_array():
+    parser = feed_in_chunks("I could not read the table.", 4)
+    assert parser.problems() == ["no JSON array found in the reply"]
+    with pytest.raises(ValueError):
+        parser.close()
@@ -0,0 +1,172 @@
+import random
+
+import numpy as np
+import pandas as pd
+
+from reconcile_engine import COMPARISON_COLUMNS, pair_rows, reconcile_frames
+
+
+def bank_row(date, amount, tx_type="Deposit", text="bank"):
+    return {'Event Time': date, 'Amount': amount, 'Description/Remarks': text, 'Transaction Type': tx_type}
+
+
+def ssbo_row(date, amount, tx_type="Deposit", text="ssbo"):
+    return {'Event Time': date, 'Amount': amount, 'Remark': text, 'Transaction Type': tx_type}
+
+
+def test_exact_pairs_kth_duplicate_with_kth_duplicate():
+    bank = [bank_row("2025-08-01", 10), bank_row("2025-08-01", 10), bank_row("2025-08-02", 5)]
+    ssbo = [ssbo_row("2025-08-02", 5), ssbo_row("2025-08-01", 10), ssbo_row("2025-08-01", 10)]
+    position, status = pair_rows(bank, ssbo)
+    assert position.tolist() == [1, 2, 0]
+    assert status.tolist() == ["Tally"] * 3
+
+
+def test_more_ssbo_duplicates_than_bank_rows():
+    bank = [bank_row("2025-08-01", 10)]
+    ssbo = [ssbo_row("2025-08-01", 10)] * 5
+    position, status = pair_rows(bank, ssbo)
+    assert position.tolist() == [0]
+    assert status.tolist() == ["Tally"]
+
+
+def test_keys_are_normalized_before_matching():
+    bank = [bank_row("01/08/2025", "1,500.00", "deposit")]
+    ssbo = [ssbo_row("2025-08-01", 1500, "Deposit")]
+    position, _ = pair_rows(bank, ssbo)
+    assert position.tolist() == [0]
+
+
+def test_type_and_missing_values_never_pair():
+    bank = [bank_row("2025-08-01", 10, "Transfer"), bank_row("", 10), bank_row("2025-08-01", None)]
+    ssbo = [ssbo_row("2025-08-01", 10), ssbo_row("", 10), ssbo_row("2025-08-01", None)]
+    position, status = pair_rows(bank, ssbo, date_window_days=3, amount_tolerance=1)
+    assert position.tolist() == [-1, -1, -1]
+    assert status.tolist() == ["Not Tally"] * 3
+
+
+def test_no_tolerance_means_exact_only():
+    position, status = pair_rows([bank_row("2025-08-01", 10)], [ssbo_row("2025-08-02", 10)])
+    assert position.tolist() == [-1]
+    assert status.tolist() == ["Not Tally"]
+
+
+def test_date_window_prefers_the_nearest_day_then_the_earlier_one():
+    bank = [bank_row("2025-08-10", 10)]
+    ssbo = [ssbo_row("2025-08-12", 10), ssbo_row("2025-08-11", 10), ssbo_row("2025-08-09", 10)]
+    position, status = pair_rows(bank, ssbo, date_window_days=2)
+    assert position.tolist() == [2]
+    assert status.tolist() == ["Tally (date -1d)"]
+
+
+def test_date_window_bounds_are_inclusive():
+    bank = [bank_row("2025-08-10", 10), bank_row("2025-08-10", 10)]
+    ssbo = [ssbo_row("2025-08-13", 10), ssbo_row("2025-08-14", 10)]
+    position, status = pair_rows(bank, ssbo, date_window_days=3)
+    assert position.tolist() == [0, -1]
+    assert status.tolist() == ["Tally (date +3d)", "Not Tally"]
+
+
+def test_amount_tolerance_takes_the_closest_amount():
+    bank = [bank_row("2025-08-01", 100.00)]
+    ssbo = [ssbo_row("2025-08-01", 100.90), ssbo_row("2025-08-01", 99.60), ssbo_row("2025-08-01", 100.30)]
+    position, status = pair_rows(bank, ssbo, amount_tolerance=1)
+    assert position.tolist() == [2]
+    assert status.tolist() == ["Tally (amount +0.30)"]
+
+
+def test_amount_tie_goes_to_the_lower_amount_then_row_order():
+    bank = [bank_row("2025-08-01", 100.00), bank_row("2025-08-01", 100.00), bank_row("2025-08-01", 100.00)]
+    ssbo = [ssbo_row("2025-08-01", 100.50), ssbo_row("2025-08-01", 99.50), ssbo_row("2025-08-01", 99.50)]
+    position, _ = pair_rows(bank, ssbo, amount_tolerance=0.5)
+    assert position.tolist() == [1, 2, 0]
+
+
+def test_percentage_tolerance_uses_the_larger_allowance():
+    bank = [bank_row("2025-08-01", 1000), bank_row("2025-08-01", 10)]
+    ssbo = [ssbo_row("2025-08-01", 1004), ssbo_row("2025-08-01", 10.30)]
+    position, _ = pair_rows(bank, ssbo, amount_tolerance=0.1, amount_tolerance_pct=0.5)
+    assert position.tolist() == [0, -1]
+
+
+def test_exact_partners_are_not_taken_by_the_tolerance_pass():
+    bank = [bank_row("2025-08-01", 10.10), bank_row("2025-08-01", 10.00)]
+    ssbo = [ssbo_row("2025-08-01", 10.00), ssbo_row("2025-08-02", 10.10)]
+    position, status = pair_rows(bank, ssbo, date_window_days=1, amount_tolerance=0.5)
+    assert position.tolist() == [1, 0]
+    assert status.tolist() == ["Tally (date +1d)", "Tally"]
+
+
+def test_combined_date_and_amount_status():
+    position, status = pair_rows(
+        [bank_row("2025-08-01", 10)], [ssbo_row("2025-08-03", 9.75)], date_window_days=2, amount_tolerance=0.25,
+    )
+    assert position.tolist() == [0]
+    assert status.tolist() == ["Tally (date +2d, amount -0.25)"]
+
+
+def reference_pairs(bank, ssbo, window, tolerance):
+    """Row-by-row statement of the matching rules, for comparison"""
+    def key(row):
+        return row['Event Time'], round(row['Amount'] * 100), row['Transaction Type']
+
+    position = [-1] * len(bank)
+    free = [True] * len(ssbo)
+    for i, row in enumerate(bank):
+        for j, other in enumerate(ssbo):
+            if free[j] and key(row) == key(other):
+                position[i], free[j] = j, False
+                break
+    if not (window or tolerance):
+        return position
+    for i, row in enumerate(bank):
+        if position[i] >= 0:
+            continue
+        day = pd.Timestamp(row['Event Time'])
+        for offset in sorted(range(-window, window + 1), key=lambda offset: (abs(offset), offset)):
+            date = (day + pd.Timedelta(days=offset)).strftime('%Y-%m-%d')
+            candidates = [
+                (abs(round(other['Amount'] * 100) - round(row['Amount'] * 100)), other['Amount'], j)
+                for j, other in enumerate(ssbo)
+                if free[j] and other['Event Time'] == date and other['Transaction Type'] == row['Transaction Type']
+                and abs(round(other['Amount'] * 100) - round(row['Amount'] * 100)) <= tolerance * 100
+            ]
+            if candidates:
+                j = min(candidates)[2]
+                position[i], free[j] = j, False
+                break
+    return position
+
+
+def random_rows(rng, n, make):
+    return [
+        make(f"2025-08-{rng.randint(1, 4):02d}", rng.randint(95, 105) + rng.choice([0, 0.25, 0.5]),
+             rng.choice(["Deposit", "Transfer"]))
+        for _ in range(n)
+    ]
+
+
+def test_tolerance_pass_agrees_with_row_by_row_rules():
+    rng = random.Random(7)
+    for _ in range(200):
+        bank = random_rows(rng, rng.randint(1, 25), bank_row)
+        ssbo = random_rows(rng, rng.randint(1, 25), ssbo_row)
+        window, tolerance = rng.randint(0, 2), rng.choice([0, 0.25, 1, 3])
+        position, _ = pair_rows(bank, ssbo, date_window_days=window, amount_tolerance=tolerance)
+        assert position.tolist() == reference_pairs(bank, ssbo, window, tolerance)
+
+
+def test_reconcile_frames_lays_out_pairs_in_bank_order():
+    bank = pd.DataFrame([bank_row("2025-08-01", 10, text="A"), bank_row("2025-08-02", 20, text="B")])
+    ssbo = pd.DataFrame([ssbo_row("2025-08-02", 20, text="b")])
+    frame = reconcile_frames(bank, ssbo)
+    assert list(frame.columns) == COMPARISON_COLUMNS
+    assert frame['Description_A'].tolist() == ["A", "B"]
+    assert frame['Status'].tolist() == ["Not Tally", "Tally"]
+    assert frame['Description_B'].iloc[1] == "b"
+
+
+def test_empty_bank_side():
+    position, status = pair_rows([], [ssbo_row("2025-08-01", 10)])
+    assert len(position) == 0 and len(status) == 0
+    assert np.asarray(position).dtype == np.int64
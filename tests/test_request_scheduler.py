@@ -0,0 +1,130 @@
+import threading
+import time
+
+import pytest
+
+from request_scheduler import RequestScheduler, TokenBucket, bind_session, current_session
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.001)
+
+
+def test_token_bucket_refills_at_its_rate():
+    clock = FakeClock()
+    bucket = TokenBucket(60, clock)
+    assert bucket.wait_time(60) == 0
+    bucket.take(60)
+    assert bucket.wait_time(1) == 1.0
+    clock.now = 0.5
+    assert bucket.wait_time(1) == 0.5
+    clock.now = 1000
+    assert bucket.wait_time(60) == 0
+    assert bucket.level == 60
+
+
+def test_token_bucket_caps_oversized_requests():
+    bucket = TokenBucket(60, FakeClock())
+    bucket.take(500)
+    assert bucket.level == 0
+    assert bucket.wait_time(500) == 60.0
+
+
+def test_admit_takes_from_both_buckets():
+    scheduler = RequestScheduler(requests_per_minute=10, tokens_per_minute=1000, clock=FakeClock())
+    scheduler.admit(tokens=300)
+    scheduler.admit(tokens=200)
+    assert scheduler.requests.level == 8
+    assert scheduler.tokens.level == 500
+    assert scheduler.stats()['granted'] == 2
+
+
+def test_waiting_sessions_are_served_round_robin():
+    scheduler = RequestScheduler(requests_per_minute=6000, tokens_per_minute=10 ** 6)
+    scheduler.requests.level = 0
+    order = []
+
+    def request(session, name):
+        scheduler.admit(session=session)
+        order.append(name)
+
+    threads = []
+    for count, (session, name) in enumerate([("a", "a1"), ("a", "a2"), ("a", "a3"), ("b", "b1")], start=1):
+        thread = threading.Thread(target=request, args=(session, name))
+        thread.start()
+        threads.append(thread)
+        wait_until(lambda: scheduler.stats()['queue_depth'] + len(order) == count)
+    for thread in threads:
+        thread.join()
+    assert order == ["a1", "b1", "a2", "a3"]
+
+
+def test_identical_calls_are_coalesced():
+    scheduler = RequestScheduler(clock=FakeClock())
+    release = threading.Event()
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        scheduler.admit(tokens=10)
+        release.wait(5)
+        return ["row"]
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(scheduler.run("key", fetch))) for _ in range(3)]
+    threads[0].start()
+    wait_until(lambda: calls)
+    for thread in threads[1:]:
+        thread.start()
+    wait_until(lambda: scheduler.stats()['coalesced'] == 2)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert results == [["row"]] * 3
+    assert len(calls) == 1
+    assert scheduler.stats()['granted'] == 1
+    assert scheduler.stats()['in_flight'] == 0
+
+
+def test_every_request_inside_a_call_is_admitted():
+    scheduler = RequestScheduler(clock=FakeClock())
+
+    def fetch_with_retries():
+        for _ in range(3):
+            scheduler.admit(tokens=100)
+        return "done"
+
+    assert scheduler.run("key", fetch_with_retries) == "done"
+    assert scheduler.stats()['granted'] == 3
+    assert scheduler.tokens.level == scheduler.tokens.capacity - 300
+
+
+def test_failed_call_is_not_left_in_flight():
+    scheduler = RequestScheduler(clock=FakeClock())
+
+    def failing():
+        raise RuntimeError("upstream down")
+
+    with pytest.raises(RuntimeError, match="upstream down"):
+        scheduler.run("key", failing)
+    assert scheduler.stats()['in_flight'] == 0
+
+
+def test_bind_session_carries_the_session_into_worker_threads():
+    seen = []
+    thread = threading.Thread(target=bind_session(lambda: seen.append(current_session()), "operator-1"))
+    thread.start()
+    thread.join()
+    assert seen == ["operator-1"]
+    assert current_session() == "default"
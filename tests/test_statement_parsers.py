@@ -0,0 +1,148 @@
+import datetime
+import io
+
+import pytest
+
+import statement_parsers
+from statement_parsers import BANK_FIELDS, SSBO_FIELDS, detect_format, parse_bank_statement, parse_ssbo_export
+
+
+def upload(text, name):
+    data = io.BytesIO(text.encode() if isinstance(text, str) else text)
+    data.name = name
+    return data
+
+
+def records(frame):
+    return frame.to_dict('records')
+
+
+def test_csv_with_preamble_and_credit_debit_columns():
+    text = (
+        "Account Statement\n"
+        "Account,12345678\n"
+        "\n"
+        "Date,Description,Debit,Credit\n"
+        "01/08/2025,Cash deposit,,\"1,500.00\"\n"
+        "02/08/2025,Card payment,20.00,\n"
+        "03/08/2025,Balance brought forward,,\n"
+    )
+    frame = parse_bank_statement(upload(text, "statement.csv"))
+    assert list(frame.columns) == BANK_FIELDS
+    assert records(frame) == [
+        {'Event Time': "2025-08-01", 'Amount': 1500.0, 'Description/Remarks': "Cash deposit",
+         'Transaction Type': "Deposit"},
+        {'Event Time': "2025-08-02", 'Amount': 20.0, 'Description/Remarks': "Card payment",
+         'Transaction Type': "Transfer"},
+    ]
+
+
+@pytest.mark.parametrize("amount, kind", [
+    ("25.00", "Deposit"), ("(25.00)", "Transfer"), ("25.00-", "Transfer"), ("25.00 DR", "Transfer"),
+])
+def test_signed_amount_column(amount, kind):
+    frame = parse_bank_statement(upload(f"Transaction Date,Amount,Remarks\n2025-08-05,{amount},x\n", "s.csv"))
+    assert records(frame) == [
+        {'Event Time': "2025-08-05", 'Amount': 25.0, 'Description/Remarks': "x", 'Transaction Type': kind},
+    ]
+
+
+def test_type_column_decides_deposits():
+    text = "Date,Amount,Type\n2025-08-05,25.00,CR\n2025-08-06,30.00,DR\n"
+    frame = parse_bank_statement(upload(text, "s.csv"))
+    assert frame['Transaction Type'].tolist() == ["Deposit", "Transfer"]
+
+
+def test_csv_without_a_date_column():
+    with pytest.raises(ValueError, match="No date column"):
+        parse_bank_statement(upload("Amount,Remarks\n5,x\n", "s.csv"))
+
+
+MT940 = """:20:STMT
+:25:12345678
+:28C:1/1
+:60F:C250731EUR1000,00
+:61:2508010801C1500,00NTRFNONREF
+:86:Cash deposit
+ branch 12
+:61:250802D20,50NCHGNONREF
+:62F:C250802EUR2479,50
+"""
+
+
+def test_mt940_statement_lines():
+    frame = parse_bank_statement(upload(MT940, "statement.sta"))
+    assert records(frame) == [
+        {'Event Time': "2025-08-01", 'Amount': 1500.0, 'Description/Remarks': "Cash deposit branch 12",
+         'Transaction Type': "Deposit"},
+        {'Event Time': "2025-08-02", 'Amount': 20.5, 'Description/Remarks': "NCHGNONREF",
+         'Transaction Type': "Transfer"},
+    ]
+
+
+OFX = """OFXHEADER:100
+DATA:OFXSGML
+<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS><BANKTRANLIST>
+<STMTTRN><TRNTYPE>CREDIT<DTPOSTED>20250801120000<TRNAMT>1500.00<NAME>Cash deposit</STMTTRN>
+<STMTTRN><TRNTYPE>DEBIT<DTPOSTED>20250802<TRNAMT>-20.50<NAME>Card<MEMO>Shop</STMTTRN>
+</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>
+"""
+
+
+@pytest.mark.parametrize("block_size", [7, 1 << 16])
+def test_ofx_transactions(block_size, monkeypatch):
+    read = statement_parsers._iter_ofx_records
+    monkeypatch.setattr(statement_parsers, '_iter_ofx_records', lambda source: read(source, block_size))
+    frame = parse_bank_statement(upload(OFX, "statement.ofx"))
+    assert records(frame) == [
+        {'Event Time': "2025-08-01", 'Amount': 1500.0, 'Description/Remarks': "Cash deposit",
+         'Transaction Type': "Deposit"},
+        {'Event Time': "2025-08-02", 'Amount': 20.5, 'Description/Remarks': "Card Shop",
+         'Transaction Type': "Transfer"},
+    ]
+
+
+def test_xlsx_statement():
+    openpyxl = pytest.importorskip("openpyxl")
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.append(["Bank statement"])
+    sheet.append(["Posting Date", "Description", "Amount"])
+    sheet.append([datetime.datetime(2025, 8, 1), "Cash deposit", 1500])
+    sheet.append([datetime.datetime(2025, 8, 2), "Card", -20.5])
+    data = io.BytesIO()
+    workbook.save(data)
+    frame = parse_bank_statement(upload(data.getvalue(), "statement.xlsx"))
+    assert records(frame) == [
+        {'Event Time': "2025-08-01", 'Amount': 1500.0, 'Description/Remarks': "Cash deposit",
+         'Transaction Type': "Deposit"},
+        {'Event Time': "2025-08-02", 'Amount': 20.5, 'Description/Remarks': "Card",
+         'Transaction Type': "Transfer"},
+    ]
+
+
+def test_format_is_sniffed_when_the_extension_is_unknown():
+    assert detect_format("statement.dat", MT940.encode()) == 'mt940'
+    assert detect_format("statement.dat", OFX.encode()) == 'ofx'
+    assert detect_format("statement.dat", b"PK\x03\x04...") == 'xlsx'
+    assert detect_format("statement.dat", b"Date,Amount\n") == 'csv'
+
+
+def test_ssbo_export_keeps_deposits_and_transfers():
+    text = (
+        "Event Time,Transaction Type,Amount,Remark\n"
+        "2025-08-01 10:00:00,deposit,1500,A\n"
+        "2025-08-01 11:00:00,Bet,50,B\n"
+        "2025-08-02 09:30:00,TRANSFER,20.50,C\n"
+    )
+    frame = parse_ssbo_export(upload(text, "ssbo.csv"))
+    assert list(frame.columns) == SSBO_FIELDS
+    assert records(frame) == [
+        {'Event Time': "2025-08-01", 'Amount': 1500.0, 'Remark': "A", 'Transaction Type': "Deposit"},
+        {'Event Time': "2025-08-02", 'Amount': 20.5, 'Remark': "C", 'Transaction Type': "Transfer"},
+    ]
+
+
+def test_ssbo_export_needs_its_columns():
+    with pytest.raises(ValueError, match="must include"):
+        parse_ssbo_export(upload("Event Time,Amount\n2025-08-01,5\n", "ssbo.csv"))
@@ -0,0 +1,44 @@
+from table_tiling import merge_band_rows, merge_screenshot_rows
+
+
+def rows(*amounts, balance=False):
+    return [dict({'Amount': amount, 'Remark': f"r{amount}"}, **({'Balance': amount * 10} if balance else {}))
+            for amount in amounts]
+
+
+def test_band_seam_is_dropped_once():
+    assert merge_band_rows([rows(1, 2, 3), rows(2, 3, 4), rows(4, 5)]) == rows(1, 2, 3, 4, 5)
+
+
+def test_band_rows_equal_away_from_the_seam_are_kept():
+    assert merge_band_rows([rows(1, 2, 1), rows(3, 1)], overlap_rows=1) == rows(1, 2, 1, 3, 1)
+
+
+def test_screenshots_in_any_order_are_stitched():
+    merged, report = merge_screenshot_rows([rows(5, 6, 7, 8, 9), rows(1, 2, 3, 4, 5, 6, 7)])
+    assert merged == rows(1, 2, 3, 4, 5, 6, 7, 8, 9)
+    assert report == {'dropped': 3, 'unconfirmed': 0}
+
+
+def test_contained_screenshot_adds_nothing():
+    merged, report = merge_screenshot_rows([rows(1, 2, 3, 4, 5), rows(2, 3, 4)])
+    assert merged == rows(1, 2, 3, 4, 5)
+    assert report == {'dropped': 3, 'unconfirmed': 0}
+
+
+def test_short_repeat_is_kept_and_reported():
+    merged, report = merge_screenshot_rows([rows(1, 2, 3), rows(3, 4), rows(3)])
+    assert merged == rows(1, 2, 3, 3, 4, 3)
+    assert report == {'dropped': 0, 'unconfirmed': 2}
+
+
+def test_running_balance_corroborates_a_shorter_overlap():
+    merged, report = merge_screenshot_rows([rows(1, 2, 3, balance=True), rows(2, 3, 4, balance=True)])
+    assert merged == rows(1, 2, 3, 4, balance=True)
+    assert report == {'dropped': 2, 'unconfirmed': 0}
+
+
+def test_empty_screenshots_are_ignored():
+    merged, report = merge_screenshot_rows([[], rows(1, 2), []])
+    assert merged == rows(1, 2)
+    assert report == {'dropped': 0, 'unconfirmed': 0}
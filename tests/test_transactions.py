@@ -0,0 +1,28 @@
+import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from transactions import MISSING_CENTS, MISSING_DAY, parse_cents, parse_days
+
+AUG_15 = (datetime.date(2025, 8, 15) - datetime.date(1970, 1, 1)).days
+
+
+@pytest.mark.parametrize("value", [
+    "2025-08-15", "15/08/2025", "2025-08-15 22:48:08", pd.Timestamp("2025-08-15 13:45"), datetime.date(2025, 8, 15),
+    datetime.datetime(2025, 8, 15, 23, 59), np.datetime64("2025-08-15T08:00"),
+    pd.Timestamp("2025-08-15 23:30", tz="Asia/Kuala_Lumpur"),
+])
+def test_parse_days(value):
+    assert parse_days(np.array([value], dtype=object)).tolist() == [AUG_15]
+
+
+def test_parse_days_missing_and_unreadable():
+    days = parse_days(np.array([None, "", "not a date", np.nan, pd.NaT], dtype=object))
+    assert days.tolist() == [MISSING_DAY] * 5
+
+
+def test_parse_cents():
+    cents = parse_cents(np.array(["1,234.50", 20, 0.1 + 0.2, None, "abc"], dtype=object))
+    assert cents.tolist() == [123450, 2000, 30, MISSING_CENTS, MISSING_CENTS]
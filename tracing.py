@@ -0,0 +1,406 @@
+"""
+Structured timing spans for the reconcile path
+
+A trace covers one reconcile run. Spans nest inside it and record their
+duration plus whatever the stage knows about its work: bytes and tokens in
+and out, the model and the cache status. Finished traces are written as JSON
+lines (TRACE_LOG) and folded into process-wide counters, exported in the
+Prometheus text format to a file (METRICS_FILE) and, when METRICS_PORT is
+set, over HTTP.
+
+Spans follow the calling context. Worker threads don't inherit it, so wrap
+jobs with bind_trace before handing them to an executor, as with
+request_scheduler.bind_session. Outside a trace, span() does nothing.
+"""
+import contextvars
+import cProfile
+import io
+import itertools
+import json
+import logging
+import os
+import pstats
+import random
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+TRACE_DIR = os.environ.get("TRACE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".traces"))
+TRACE_LOG = os.environ.get("TRACE_LOG", os.path.join(TRACE_DIR, "spans.jsonl"))
+METRICS_FILE = os.environ.get("METRICS_FILE", os.path.join(TRACE_DIR, "metrics.prom"))
+METRICS_PORT = int(os.environ.get("METRICS_PORT") or 0)  # 0 disables the HTTP endpoint
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_current = contextvars.ContextVar("trace_span", default=None)
+logger = logging.getLogger("reconcile.trace")
+
+
+class Span:
+    """One timed stage; attributes are set while it runs"""
+
+    def __init__(self, trace, name, parent_id, attrs):
+        self.trace = trace
+        self.name = name
+        self.id = next(trace._ids)
+        self.parent_id = parent_id
+        self.thread = threading.current_thread().name
+        self.attrs = {key: value for key, value in attrs.items() if value is not None}
+        self.error = None
+        self.offset = time.perf_counter() - trace._origin
+        self.duration = None
+
+    def set(self, **attrs):
+        """Record attributes, e.g. span.set(model=..., cache="hit"); None values are skipped"""
+        self.attrs.update({key: value for key, value in attrs.items() if value is not None})
+
+    def add(self, **counts):
+        """Add to numeric attributes, e.g. span.add(tokens_out=12)"""
+        for key, value in counts.items():
+            if value is not None:
+                self.attrs[key] = self.attrs.get(key, 0) + value
+
+    def to_dict(self) -> dict:
+        return {
+            'trace': self.trace.id,
+            'trace_name': self.trace.name,
+            'span': self.name,
+            'id': self.id,
+            'parent': self.parent_id,
+            'thread': self.thread,
+            'start': round(self.trace.started + self.offset, 6),
+            'duration': round(self.duration, 6) if self.duration is not None else None,
+            'error': self.error,
+            **self.attrs,
+        }
+
+
+class _NoSpan:
+    """Stand-in yielded by span() outside a trace"""
+
+    def set(self, **attrs):
+        pass
+
+    def add(self, **counts):
+        pass
+
+
+_NO_SPAN = _NoSpan()
+
+
+class Trace:
+    """Spans of one run"""
+
+    def __init__(self, name: str, profile=False):
+        self.id = uuid.uuid4().hex[:12]
+        self.name = name
+        self.started = time.time()
+        self.spans = []
+        self.root = None
+        self._origin = time.perf_counter()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._profiles = [] if profile else None
+
+    @property
+    def profiling(self) -> bool:
+        return self._profiles is not None
+
+    def _open(self, name, parent_id, attrs) -> Span:
+        span = Span(self, name, parent_id, attrs)
+        with self._lock:
+            self.spans.append(span)
+        return span
+
+    def breakdown(self) -> list:
+        """Finished spans in start order, each with its nesting depth"""
+        with self._lock:
+            spans = sorted((s for s in self.spans if s.duration is not None), key=lambda s: s.offset)
+        depth = {None: -1}
+        rows = []
+        for s in spans:
+            depth[s.id] = depth.get(s.parent_id, -1) + 1
+            rows.append({'depth': depth[s.id], 'name': s.name, 'thread': s.thread, 'start': s.offset,
+                         'duration': s.duration, 'error': s.error, **s.attrs})
+        return rows
+
+    @contextmanager
+    def _profiled(self):
+        """Profile the calling thread into this trace, if profiling was asked for"""
+        if self._profiles is None:
+            yield
+            return
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Python 3.12+ allows one active profiler per process; the run's
+            # own profiler already sees this thread
+            yield
+            return
+        try:
+            yield
+        finally:
+            profiler.disable()
+            with self._lock:
+                self._profiles.append(profiler)
+
+    def _stats(self):
+        with self._lock:
+            profiles = list(self._profiles or ())
+        if not profiles:
+            return None
+        stats = pstats.Stats(profiles[0], stream=io.StringIO())
+        for profiler in profiles[1:]:
+            stats.add(profiler)
+        return stats
+
+    def profile_data(self):
+        """The run's cProfile data, all threads merged, in the .prof format pstats and snakeviz read"""
+        stats = self._stats()
+        if stats is None:
+            return None
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "run.prof")
+            stats.dump_stats(path)
+            with open(path, "rb") as f:
+                return f.read()
+
+    def profile_report(self, limit=25) -> str:
+        """Top functions by cumulative time, as pstats prints them"""
+        stats = self._stats()
+        if stats is None:
+            return ""
+        stats.stream = io.StringIO()
+        stats.sort_stats("cumulative").print_stats(limit)
+        return stats.stream.getvalue()
+
+
+@contextmanager
+def _timed(trace, name, parent_id, attrs):
+    current = trace._open(name, parent_id, attrs)
+    token = _current.set(current)
+    start = time.perf_counter()
+    try:
+        yield current
+    except BaseException as e:
+        current.error = type(e).__name__
+        raise
+    finally:
+        current.duration = time.perf_counter() - start
+        try:
+            _current.reset(token)
+        except ValueError:
+            # A generator holding the span was closed from another context
+            pass
+
+
+@contextmanager
+def span(name: str, **attrs):
+    """
+    Time a stage of the current trace
+
+    Args:
+        name: Stage name, e.g. "model.request"
+        attrs: Initial attributes (bytes_in, bytes_out, tokens_in,
+            tokens_out, model, cache, ...)
+
+    Yields:
+        The Span, for setting attributes known only once the stage has run
+    """
+    parent = _current.get()
+    if parent is None:
+        yield _NO_SPAN
+        return
+    with _timed(parent.trace, name, parent.id, attrs) as current:
+        yield current
+
+
+def current_span():
+    """The innermost open span, or a stand-in that ignores attributes outside a trace"""
+    return _current.get() or _NO_SPAN
+
+
+def bind_trace(func):
+    """
+    Wrap func so its spans nest under the caller's current span in whatever
+    thread calls it (and are profiled when the trace is)
+    """
+    parent = _current.get()
+    if parent is None:
+        return func
+
+    def bound(*args, **kwargs):
+        token = _current.set(parent)
+        try:
+            with parent.trace._profiled():
+                return func(*args, **kwargs)
+        finally:
+            _current.reset(token)
+    return bound
+
+
+@contextmanager
+def start_trace(name: str, profile=False, sample=1.0, **attrs):
+    """
+    Trace one run: spans opened inside (and in threads wrapped with
+    bind_trace) belong to it, and it is exported when the block exits
+
+    Args:
+        name: Root span name
+        profile: Also capture a cProfile of the run's threads
+        sample: Share of these traces to export; the others are timed
+            for the caller but never written or counted
+        attrs: Attributes of the root span
+
+    Yields:
+        The Trace
+    """
+    trace = Trace(name, profile=profile)
+    try:
+        with trace._profiled(), _timed(trace, name, None, attrs) as root:
+            trace.root = root
+            yield trace
+    finally:
+        if random.random() < sample:
+            export(trace)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class MetricsRegistry:
+    """Process-wide counters and duration histograms built from finished spans"""
+
+    def __init__(self, buckets=DURATION_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._histograms = {}  # span name -> [bucket counts..., +Inf count, sum]
+        self._counters = {}  # (metric, labels) -> value
+
+    def _count(self, metric, labels, value=1):
+        key = (metric, tuple(sorted(labels.items())))
+        self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, trace: Trace):
+        with self._lock:
+            self._count("reconcile_traces_total", {'trace': trace.name})
+            for s in trace.spans:
+                if s.duration is None:
+                    continue
+                histogram = self._histograms.setdefault(s.name, [0] * (len(self.buckets) + 1) + [0.0])
+                for i, bound in enumerate(self.buckets):
+                    if s.duration <= bound:
+                        histogram[i] += 1
+                histogram[len(self.buckets)] += 1
+                histogram[-1] += s.duration
+                for direction in ('in', 'out'):
+                    if s.attrs.get(f'bytes_{direction}'):
+                        self._count("reconcile_span_bytes_total", {'span': s.name, 'direction': direction},
+                                    s.attrs[f'bytes_{direction}'])
+                    if s.attrs.get(f'tokens_{direction}'):
+                        self._count("reconcile_model_tokens_total",
+                                    {'model': s.attrs.get('model', 'unknown'), 'direction': direction},
+                                    s.attrs[f'tokens_{direction}'])
+                if 'cache' in s.attrs:
+                    self._count("reconcile_cache_lookups_total", {'span': s.name, 'status': s.attrs['cache']})
+                if s.error:
+                    self._count("reconcile_span_errors_total", {'span': s.name, 'error': s.error})
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format"""
+        def labels(pairs):
+            return ",".join(f'{key}="{_escape(value)}"' for key, value in pairs)
+
+        lines = [
+            "# HELP reconcile_span_duration_seconds Time spent in each reconcile stage",
+            "# TYPE reconcile_span_duration_seconds histogram",
+        ]
+        with self._lock:
+            for name, histogram in sorted(self._histograms.items()):
+                for bound, count in zip(self.buckets, histogram):
+                    lines.append(f'reconcile_span_duration_seconds_bucket{{span="{name}",le="{bound}"}} {count}')
+                lines.append(f'reconcile_span_duration_seconds_bucket{{span="{name}",le="+Inf"}} '
+                             f'{histogram[len(self.buckets)]}')
+                lines.append(f'reconcile_span_duration_seconds_sum{{span="{name}"}} {histogram[-1]:.6f}')
+                lines.append(f'reconcile_span_duration_seconds_count{{span="{name}"}} '
+                             f'{histogram[len(self.buckets)]}')
+            metrics = {}
+            for (metric, pairs), value in self._counters.items():
+                metrics.setdefault(metric, []).append((pairs, value))
+        for metric, samples in sorted(metrics.items()):
+            lines.append(f"# TYPE {metric} counter")
+            for pairs, value in sorted(samples):
+                lines.append(f"{metric}{{{labels(pairs)}}} {value}")
+        return "\n".join(lines) + "\n"
+
+
+_registry = MetricsRegistry()
+_export_lock = threading.Lock()
+_server = None
+
+
+def get_metrics_registry() -> MetricsRegistry:
+    return _registry
+
+
+def _json_logger() -> logging.Logger:
+    # Configured on first use so importing the module never touches the disk
+    if not logger.handlers:
+        os.makedirs(os.path.dirname(TRACE_LOG) or ".", exist_ok=True)
+        handler = logging.FileHandler(TRACE_LOG, encoding="utf-8")
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+    return logger
+
+
+def export(trace: Trace):
+    """Write a finished trace's spans as JSON lines and refresh the metrics file and endpoint"""
+    _registry.observe(trace)
+    try:
+        with _export_lock:
+            log = _json_logger()
+            for s in sorted(trace.spans, key=lambda s: s.offset):
+                log.info(json.dumps(s.to_dict(), default=str))
+            if METRICS_FILE:
+                os.makedirs(os.path.dirname(METRICS_FILE) or ".", exist_ok=True)
+                temporary = f"{METRICS_FILE}.tmp"
+                with open(temporary, "w", encoding="utf-8") as f:
+                    f.write(_registry.render())
+                os.replace(temporary, METRICS_FILE)
+        if METRICS_PORT:
+            start_metrics_server(METRICS_PORT)
+    except OSError as e:
+        # Telemetry must never fail a reconciliation
+        print(f"Could not export trace {trace.id}: {e}")
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = _registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port=METRICS_PORT, host="127.0.0.1"):
+    """Serve GET /metrics on port from a daemon thread; later calls reuse the first server"""
+    global _server
+    with _export_lock:
+        if _server is None:
+            _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+            threading.Thread(target=_server.serve_forever, name="metrics", daemon=True).start()
+        return _server
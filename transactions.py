@@ -0,0 +1,317 @@
+"""
+Typed columnar store for one side's transactions
+
+Extracted rows arrive as lists of dicts with string keys, exports as
+DataFrames. Both are parsed once into a TransactionTable, which is what
+results, matching, the ledger and the run store hold from then on:
+
+- dates as int32 day numbers (days since 1970-01-01), for matching, and as
+  the text that was read, for display and export
+- amounts as int64 cents, so matching never compares floats
+- transaction types as int8 codes into the table's labels
+- description/remark text as Arrow-backed strings (interned Python strings
+  without pyarrow)
+
+Values that don't parse are kept as MISSING_DAY / MISSING_CENTS / type code
+-1; rows with a missing date or amount never match.
+"""
+import datetime
+import sys
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401  (backs the "string[pyarrow]" dtype)
+    TEXT_DTYPE = "string[pyarrow]"
+except ImportError:  # interned Python strings instead
+    TEXT_DTYPE = None
+
+MISSING_DAY = np.iinfo(np.int32).min
+MISSING_CENTS = np.iinfo(np.int64).min
+
+# Row field holding the free text, per side
+TEXT_FIELDS = {'bank': 'Description/Remarks', 'ssbo': 'Remark'}
+BALANCE_FIELD = 'Balance'
+
+
+def standardize_date(date_str):
+    """Convert various date formats to YYYY-MM-DD"""
+    try:
+        # Handle different date formats
+        if '/' in date_str:
+            # Format: "16/8/2025" -> "2025-08-16"
+            if len(date_str.split('/')) == 3:
+                parts = date_str.split('/')
+                if len(parts[2]) == 4:  # Year is 4 digits
+                    day, month, year = parts
+                else:  # Year is 2 digits
+                    day, month, year = parts
+                    year = '20' + year
+                return f"{year}-{month.zfill(2)}-{day.zfill(2)}"
+        elif '-' in date_str:
+            # Format: "2025-08-15 22:48:08" -> "2025-08-15"
+            if ' ' in date_str:
+                return date_str.split(' ')[0]
+            else:
+                return date_str
+        return date_str
+    except:
+        return date_str
+
+
+def normalize_amount(value):
+    """Normalize amount for reliable matching"""
+    try:
+        if isinstance(value, str):
+            value = value.replace(',', '').strip()
+        return float(value)
+    except Exception:
+        return value
+
+
+def normalize_tx_type(tx):
+    """Normalize transaction type (minimal normalization)"""
+    if tx is None:
+        return None
+    return str(tx).strip().lower()
+
+
+def _column(data, name) -> np.ndarray:
+    """
+    One input column as an object array, None where a row lacks the field
+
+    Lists of dicts are read directly, which is much cheaper than building a
+    DataFrame from them first.
+    """
+    if isinstance(data, pd.DataFrame):
+        if name not in data:
+            return np.full(len(data), None, dtype=object)
+        column = data[name]
+        values = column.to_numpy(dtype=object)
+        if column.hasnans:
+            # pandas turns missing values into NaN; the row-wise code saw None
+            values = np.where(pd.isna(values), None, values)
+        return values
+
+    values = np.empty(len(data), dtype=object)
+    values[:] = [row.get(name) for row in data]
+    return values
+
+
+def _factorize(values: np.ndarray):
+    """Codes into the distinct values, with missing values as None"""
+    codes, uniques = pd.factorize(values, use_na_sentinel=False)
+    uniques = np.asarray(uniques, dtype=object)
+    uniques[pd.isna(uniques)] = None
+    return codes, uniques
+
+
+def parse_days(values: np.ndarray) -> np.ndarray:
+    """
+    Dates in any format standardize_date knows, or already dates (datetime,
+    date, Timestamp, datetime64), as int32 day numbers
+    """
+    codes, uniques = _factorize(values)
+    standard = pd.Series([standardize_date(value) if isinstance(value, str) else None for value in uniques],
+                         dtype=object)
+    parsed = pd.to_datetime(standard, format='%Y-%m-%d', errors='coerce')
+    # Exports, Excel sheets and Parquet round trips hand over dates, not text;
+    # time zones are dropped so a date stays the one on the statement
+    dated = np.flatnonzero([isinstance(value, (datetime.date, np.datetime64)) for value in uniques])
+    if len(dated):
+        stamps = [pd.Timestamp(value) for value in uniques[dated]]
+        parsed[dated] = pd.to_datetime(pd.Series([stamp.tz_localize(None) if stamp.tzinfo else stamp
+                                                  for stamp in stamps], dtype=object), errors='coerce').to_numpy()
+    days = np.full(len(uniques), MISSING_DAY, dtype=np.int32)
+    ok = parsed.notna().to_numpy()
+    days[ok] = parsed[ok].to_numpy(dtype='datetime64[D]').astype(np.int64)
+    return days[codes]
+
+
+def parse_cents(values: np.ndarray) -> np.ndarray:
+    """Amounts (numbers or "1,234.50" text) as int64 cents"""
+    codes, uniques = _factorize(values)
+    cleaned = pd.Series(uniques, dtype=object)
+    is_text = cleaned.map(type).eq(str).to_numpy()
+    if is_text.any():
+        cleaned[is_text] = cleaned[is_text].str.replace(',', '', regex=False).str.strip()
+    numeric = pd.to_numeric(cleaned, errors='coerce').to_numpy(dtype=np.float64)
+    # Anything pandas could not parse gets the exact scalar treatment
+    for i in np.flatnonzero(np.isnan(numeric)):
+        value = normalize_amount(uniques[i])
+        if isinstance(value, float):
+            numeric[i] = value
+    cents = np.full(len(uniques), MISSING_CENTS, dtype=np.int64)
+    ok = np.isfinite(numeric) & (np.abs(numeric) < 2 ** 53 / 100)
+    cents[ok] = np.rint(numeric[ok] * 100).astype(np.int64)
+    return cents[codes]
+
+
+def parse_types(values: np.ndarray):
+    """
+    Transaction types as int8 codes
+
+    Returns:
+        Tuple of (codes, -1 where missing; normalized label per code; display
+        label per code, the first spelling seen)
+    """
+    codes, uniques = _factorize(values)
+    labels, display, index = [], [], {}
+    mapping = np.full(len(uniques), -1, dtype=np.int8)
+    for i, value in enumerate(uniques):
+        label = normalize_tx_type(value)
+        if not label:
+            continue
+        if label not in index:
+            if len(labels) == np.iinfo(np.int8).max:
+                raise ValueError("too many distinct transaction types")
+            index[label] = len(labels)
+            labels.append(label)
+            display.append(str(value))
+        mapping[i] = index[label]
+    return mapping[codes], tuple(labels), tuple(display)
+
+
+def text_array(values):
+    """Free text as a compact string array; None stays missing"""
+    if TEXT_DTYPE is not None:
+        return pd.array(np.asarray(values, dtype=object), dtype=TEXT_DTYPE)
+    strings = [None if value is None or value != value else str(value) for value in values]
+    array = np.empty(len(strings), dtype=object)
+    array[:] = [None if value is None else sys.intern(value) for value in strings]
+    return array
+
+
+def cents_to_float(cents: np.ndarray) -> np.ndarray:
+    """Cents as float amounts for display, NaN where missing"""
+    amounts = cents.astype(np.float64) / 100
+    amounts[cents == MISSING_CENTS] = np.nan
+    return amounts
+
+
+class TransactionTable:
+    """One side's transactions, as typed columns of equal length"""
+
+    def __init__(self, side, days, date_text, cents, type_codes, type_labels, type_display, text, balances=None):
+        self.side = side
+        self.days = days
+        self.date_text = date_text
+        self.cents = cents
+        self.type_codes = type_codes
+        self.type_labels = type_labels
+        self.type_display = type_display
+        self.text = text
+        self.balances = balances
+
+    @classmethod
+    def from_rows(cls, data, side: str) -> 'TransactionTable':
+        """
+        Parse extracted rows (list of dicts or DataFrame) of one side
+
+        Args:
+            data: Rows with Event Time, Amount, Transaction Type and the
+                side's text field (Description/Remarks or Remark); bank rows
+                may carry a Balance
+            side: 'bank' or 'ssbo'
+        """
+        if data is None:
+            data = []
+        elif not isinstance(data, (list, pd.DataFrame)):
+            data = list(data)
+        type_codes, type_labels, type_display = parse_types(_column(data, 'Transaction Type'))
+        dates = _column(data, 'Event Time')
+        balances = None
+        if side == 'bank':
+            raw = _column(data, BALANCE_FIELD)
+            if any(value is not None for value in raw):
+                balances = parse_cents(raw)
+        return cls(
+            side,
+            parse_days(dates),
+            text_array(dates),
+            parse_cents(_column(data, 'Amount')),
+            type_codes, type_labels, type_display,
+            text_array(_column(data, TEXT_FIELDS[side])),
+            balances,
+        )
+
+    def __len__(self):
+        return len(self.days)
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes held by the columns"""
+        total = self.days.nbytes + self.cents.nbytes + self.type_codes.nbytes
+        if self.balances is not None:
+            total += self.balances.nbytes
+        for strings in (self.text, self.date_text):
+            if isinstance(strings, np.ndarray):
+                # Interned strings are shared; count each distinct one once
+                total += strings.nbytes + sum(sys.getsizeof(value) for value in set(strings) if value is not None)
+            else:
+                total += strings.nbytes
+        return total
+
+    def types_display(self) -> np.ndarray:
+        """Display label of every row's type, 'Unknown' where missing"""
+        labels = np.array(self.type_display + ('Unknown',), dtype=object)
+        return labels[self.type_codes]
+
+    def text_values(self) -> np.ndarray:
+        """The text column as an object array, None where missing"""
+        return _object_values(self.text)
+
+    def date_values(self) -> np.ndarray:
+        """Dates as they were read, as an object array, None where missing"""
+        return _object_values(self.date_text)
+
+    def take(self, indices) -> 'TransactionTable':
+        """The rows at indices, in that order"""
+        indices = np.asarray(indices, dtype=np.int64)
+        return TransactionTable(
+            self.side, self.days[indices], self.date_text[indices], self.cents[indices], self.type_codes[indices],
+            self.type_labels, self.type_display, self.text[indices],
+            None if self.balances is None else self.balances[indices],
+        )
+
+    def to_frame(self) -> pd.DataFrame:
+        """The rows as a DataFrame with the side's field names, for display and export"""
+        columns = {
+            'Event Time': self.date_text,
+            'Amount': cents_to_float(self.cents),
+            TEXT_FIELDS[self.side]: self.text,
+            'Transaction Type': pd.Categorical.from_codes(
+                self.type_codes, categories=list(self.type_display)
+            ) if self.type_display else pd.Categorical([None] * len(self)),
+        }
+        if self.balances is not None:
+            columns[BALANCE_FIELD] = cents_to_float(self.balances)
+        return pd.DataFrame(columns)
+
+    def to_records(self) -> list:
+        """The rows as dicts, as the model returns them"""
+        frame = self.to_frame().astype(object)
+        return frame.where(frame.notna(), None).to_dict('records')
+
+    def equals(self, other) -> bool:
+        """Same rows in the same order, comparing types by their normalized label"""
+        if not isinstance(other, TransactionTable) or len(self) != len(other) or self.side != other.side:
+            return False
+        labels = np.array(self.type_labels + (None,), dtype=object)
+        other_labels = np.array(other.type_labels + (None,), dtype=object)
+        return (np.array_equal(self.days, other.days) and np.array_equal(self.cents, other.cents)
+                and np.array_equal(labels[self.type_codes], other_labels[other.type_codes])
+                and np.array_equal(self.text_values(), other.text_values()))
+
+
+def _object_values(strings) -> np.ndarray:
+    values = np.asarray(strings, dtype=object)
+    return np.where(pd.isna(values), None, values)
+
+
+def as_transactions(data, side: str) -> TransactionTable:
+    """data as a TransactionTable, parsing rows or a DataFrame if needed"""
+    if isinstance(data, TransactionTable):
+        return data
+    return TransactionTable.from_rows(data, side)
@@ -0,0 +1,230 @@
+"""
+Per-upload artifact cache
+
+Streamlit reruns the whole script on every widget interaction, and each rerun
+used to decode the upload for the preview, then decode it again and redo the
+grayscale/optimize/base64 work on every reconcile click. Artifacts are kept
+here, keyed by the sha256 of the file content, so every rerun after the first
+does no image work.
+
+The store is process-wide rather than in st.session_state because extraction
+runs on worker threads, where session state is not available; entries are
+content-addressed, so sharing them between sessions is safe.
+
+Each upload is decoded once, straight from its buffer: the preview is cut
+from the decoded image and the image itself is kept only as a grayscale
+array (one byte per pixel), which is all the OCR path reads. The colour
+image is dropped as soon as both exist.
+"""
+import hashlib
+import io
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from PIL import Image
+
+PREVIEW_MAX_WIDTH = 900
+MAX_ENTRIES = 32
+
+# Leading bytes of each image format, checked against the header only
+MAGIC_BYTES = [
+    (b'\xff\xd8\xff', "image/jpeg"),
+    (b'\x89PNG\r\n\x1a\n', "image/png"),
+    (b'GIF87a', "image/gif"),
+    (b'GIF89a', "image/gif"),
+]
+HEADER_BYTES = 12
+
+
+def content_hash(uploaded_file) -> str:
+    """sha256 of an upload's bytes, hashed straight from its buffer without copying"""
+    buffer = uploaded_file.getbuffer()
+    try:
+        return hashlib.sha256(buffer).hexdigest()
+    finally:
+        buffer.release()
+
+
+def sniff_media_type(content) -> str:
+    """
+    Media type from an upload's magic bytes, PNG when unrecognised
+    
+    Only the first HEADER_BYTES are copied out of content (bytes, a
+    memoryview or anything else exposing a buffer).
+    """
+    with memoryview(content) as view:
+        header = view[:HEADER_BYTES].tobytes()
+    for magic, media_type in MAGIC_BYTES:
+        if header.startswith(magic):
+            return media_type
+    if header.startswith(b'RIFF') and header[8:12] == b'WEBP':
+        return "image/webp"
+    return "image/png"
+
+
+class BufferReader(io.RawIOBase):
+    """Read-only file over a memoryview, so PIL decodes without a copy of the upload"""
+
+    def __init__(self, view: memoryview):
+        self._view = view.cast('B')
+        self._position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        chunk = self._view[self._position:self._position + len(buffer)]
+        buffer[:len(chunk)] = chunk
+        self._position += len(chunk)
+        return len(chunk)
+
+    def seek(self, offset, whence=io.SEEK_SET) -> int:
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self._position, io.SEEK_END: len(self._view)}[whence]
+        self._position = max(base + offset, 0)
+        return self._position
+
+    def tell(self) -> int:
+        return self._position
+
+
+def uploads_hash(uploaded_files) -> str:
+    """
+    Identity of a list of uploads, in order; a single upload keeps its own
+    content hash so one-screenshot runs are found under the same key as before
+    """
+    hashes = [content_hash(uploaded_file) for uploaded_file in uploaded_files]
+    if len(hashes) == 1:
+        return hashes[0]
+    return hashlib.sha256("\x1f".join(hashes).encode("ascii")).hexdigest()
+
+
+def distinct_uploads(uploaded_files) -> list:
+    """Uploads with the same bytes as an earlier one removed, in order"""
+    seen = set()
+    distinct = []
+    for uploaded_file in uploaded_files:
+        digest = content_hash(uploaded_file)
+        if digest not in seen:
+            seen.add(digest)
+            distinct.append(uploaded_file)
+    return distinct
+
+
+def _encode_preview(image: Image.Image) -> bytes:
+    """Downscale once and pre-encode so st.image only ships bytes on reruns"""
+    # Palette images resample poorly; everything else is shrunk before any
+    # mode conversion so no full-size converted copy is made
+    preview = image.convert('RGB') if image.mode not in ('RGB', 'RGBA', 'L', 'LA') else image
+    if preview.width > PREVIEW_MAX_WIDTH:
+        height = max(1, round(preview.height * PREVIEW_MAX_WIDTH / preview.width))
+        preview = preview.resize((PREVIEW_MAX_WIDTH, height), Image.LANCZOS, reducing_gap=1.0)
+    if preview.mode not in ('RGB', 'L'):
+        preview = preview.convert('RGB')
+    buffer = io.BytesIO()
+    preview.save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def decode_upload(uploaded_file):
+    """
+    Decode an upload once, reading straight from its buffer
+    
+    Returns:
+        Tuple of (read-only 2-D uint8 grayscale array, preview PNG bytes)
+    """
+    with uploaded_file.getbuffer() as view:
+        image = Image.open(BufferReader(view))
+        image.load()
+    preview = _encode_preview(image)
+    gray = image if image.mode == 'L' else image.convert('L')
+    del image
+    array = np.asarray(gray)
+    array.flags.writeable = False
+    return array, preview
+
+
+class UploadArtifacts:
+    """Everything derived from one uploaded file"""
+
+    def __init__(self, digest: str, gray: np.ndarray, preview: bytes, size: int):
+        self.hash = digest
+        self.gray = gray
+        self.preview = preview
+        self.size = size
+        self._payloads = {}
+        self._lock = threading.Lock()
+
+    def payload(self, key, build):
+        """
+        Return the encoded model payload for ``key``, building it once
+        
+        Args:
+            key: Identifies the encoding variant (e.g. the optimizer mode)
+            build: Callable taking the grayscale array and returning the payload
+        """
+        with self._lock:
+            if key not in self._payloads:
+                self._payloads[key] = build(self.gray)
+            return self._payloads[key]
+
+
+class ArtifactStore:
+    def __init__(self, max_entries=MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._hash_by_file_id = {}
+        self._lock = threading.Lock()
+
+    def _digest(self, uploaded_file) -> str:
+        # Streamlit keeps the same file_id for an upload across reruns, so the
+        # content is hashed only the first time it is seen
+        file_id = getattr(uploaded_file, 'file_id', None)
+        if file_id is not None and file_id in self._hash_by_file_id:
+            return self._hash_by_file_id[file_id]
+        digest = content_hash(uploaded_file)
+        if file_id is not None:
+            self._hash_by_file_id[file_id] = digest
+        return digest
+
+    def get(self, uploaded_file) -> UploadArtifacts:
+        """Return the artifacts for an upload, decoding it on first sight only"""
+        with self._lock:
+            digest = self._digest(uploaded_file)
+            artifacts = self._entries.get(digest)
+            if artifacts is not None:
+                self._entries.move_to_end(digest)
+                self.hits += 1
+                return artifacts
+            self.misses += 1
+        
+        # Decode outside the lock so concurrent uploads don't serialize
+        gray, preview = decode_upload(uploaded_file)
+        artifacts = UploadArtifacts(digest, gray, preview, uploaded_file.size)
+        
+        with self._lock:
+            artifacts = self._entries.setdefault(digest, artifacts)
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.max_entries:
+                evicted, _ = self._entries.popitem(last=False)
+                self._hash_by_file_id = {
+                    file_id: digest for file_id, digest in self._hash_by_file_id.items() if digest != evicted
+                }
+        return artifacts
+
+
+_store = ArtifactStore()
+
+
+def get_upload_artifacts(uploaded_file) -> UploadArtifacts:
+    """Look up (or build) the artifacts for an upload in the process-wide store"""
+    return _store.get(uploaded_file)
+
+
+def get_artifact_store() -> ArtifactStore:
+    return _store